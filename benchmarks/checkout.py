@@ -0,0 +1,118 @@
+"""Checkout (place_order) latency by cart size.
+
+    python -m benchmarks.checkout --sizes 1 10 50 --iterations 50
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.checkout
+
+Uses a throwaway SQLite file unless DATABASE_URL is set. Carts are filled
+directly through the ORM (not timed); only place_order() is measured, together
+with the number of SQL statements it issues.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+_tmpdir = None
+if "DATABASE_URL" not in os.environ:
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir.name}/checkout_bench.db"
+os.environ.setdefault("DEBUG", "false")
+
+from sqlalchemy import event  # noqa: E402
+
+from benchmarks.harness import RunResult, format_row  # noqa: E402
+from database.db import Base, SessionLocal, engine  # noqa: E402
+from database.models import Cart, CartItem, Extra, FoodItem, Protein, User  # noqa: E402
+from handlers.catalog import item_snapshot  # noqa: E402
+from handlers.food import place_order  # noqa: E402
+
+
+class _StatementCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def seed_menu(db):
+    foods = [FoodItem(name=f"Food {n}", price=1500 + n * 10, available=True) for n in range(50)]
+    proteins = [Protein(name=f"Protein {n}", price=500 + n * 50, is_available=True) for n in range(5)]
+    extras = [Extra(name=f"Extra {n}", price=200 + n * 25) for n in range(6)]
+    db.add_all(foods + proteins + extras)
+    db.commit()
+    return foods, proteins, extras
+
+
+def fill_cart(db, user, foods, proteins, extras, size: int) -> None:
+    cart = db.query(Cart).filter_by(user_id=user.id).first()
+    if not cart:
+        cart = Cart(user_id=user.id, is_active=True)
+        db.add(cart)
+        db.flush()
+    for n in range(size):
+        food = foods[n % len(foods)]
+        protein = proteins[n % len(proteins)] if n % 2 else None
+        item_extras = extras[: n % 3]
+        unit_price = food.price + (protein.price if protein else 0) + sum(e.price for e in item_extras)
+        item = CartItem(
+            cart_id=cart.id,
+            food_item_id=food.id,
+            protein_id=protein.id if protein else None,
+            quantity=1 + n % 2,
+            unit_price=unit_price,
+            subtotal=unit_price * (1 + n % 2),
+            snapshot=item_snapshot(
+                [food.name, food.price],
+                [protein.name, protein.price] if protein else None,
+                [[extra.name, extra.price] for extra in item_extras],
+            ),
+        )
+        item.extras = list(item_extras)
+        db.add(item)
+    db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50], help="cart sizes to measure")
+    parser.add_argument("--iterations", type=int, default=50, help="checkouts per cart size")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    Base.metadata.create_all(bind=engine)
+    counter = _StatementCounter()
+
+    db = SessionLocal()
+    try:
+        foods, proteins, extras = seed_menu(db)
+        # No email address, so place_order() doesn't try to send a confirmation
+        user = User(phone_number=f"+23480{int(time.time()) % 10**8:08d}", hashed_password="x", is_active=True)
+        db.add(user)
+        db.commit()
+
+        print(f"database={engine.url.get_backend_name()} iterations={args.iterations}")
+        for size in args.sizes:
+            result = RunResult(name=f"place_order items={size}")
+            statements = 0
+            for _ in range(args.iterations):
+                fill_cart(db, user, foods, proteins, extras, size)
+                db.expire_all()
+                before = counter.count
+                started = time.perf_counter()
+                place_order(db, user)
+                result.latencies.append(time.perf_counter() - started)
+                result.elapsed += result.latencies[-1]
+                statements += counter.count - before
+            print(format_row(result, f"statements={statements / args.iterations:.1f}"))
+    finally:
+        db.close()
+        if _tmpdir is not None:
+            engine.dispose()
+            _tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
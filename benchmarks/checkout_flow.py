@@ -0,0 +1,292 @@
+"""End-to-end checkout load test.
+
+Runs the API in-process (uvicorn on a local port) against the Paystack
+simulator and an SMTP sink, and drives complete customer journeys over HTTP:
+
+    signup -> otp_email -> verify_email -> login -> add_to_cart -> place_order
+        -> initiate_payment -> checkout -> webhook -> verify_payment
+
+    python -m benchmarks.checkout_flow --users 200 --concurrency 20
+    python -m benchmarks.checkout_flow --users 500 --rate 10 --paystack-latency-ms 300 \\
+        --webhook-failure-rate 0.1 --webhook-duplicate-rate 0.2
+    DATABASE_URL=postgresql+psycopg2://... REDIS_URL=redis://localhost:6379/1 \\
+        python -m benchmarks.checkout_flow
+
+Uses a throwaway SQLite file unless DATABASE_URL is set (SQLite serialises
+writers, so use PostgreSQL for concurrency numbers) and needs Redis at
+REDIS_URL. Celery tasks run on an in-process worker using that Redis as the
+broker, or inline with --eager.
+
+Steps:
+    otp_email   signup until the OTP email reaches the sink (worker queue + SMTP)
+    checkout    the customer paying on the authorization_url page
+    webhook     checkout until the order reads as paid (webhook ack + inbox
+                processing); times out if the simulator dropped the webhook
+    verify_payment  GET /payments/{reference}/verify afterwards
+"""
+import argparse
+import email
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+
+_tmpdir = None
+if "DATABASE_URL" not in os.environ:
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir.name}/checkout_flow.db"
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("PAYSTACK_SECRET_KEY", "sk_test_checkout_flow")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from benchmarks.harness import RunResult, format_row, run_at_rate  # noqa: E402
+from benchmarks.paystack_sim import PaystackSimulator  # noqa: E402
+from benchmarks.stubs import SMTPSink  # noqa: E402
+from config import settings  # noqa: E402
+from database.db import Base, SessionLocal, engine  # noqa: E402
+from database.models import Extra, FoodItem, Protein  # noqa: E402
+
+STEPS = (
+    "signup", "otp_email", "verify_email", "login", "add_to_cart", "place_order",
+    "initiate_payment", "checkout", "webhook", "verify_payment",
+)
+OTP_PATTERN = re.compile(r'class="otp-code">\s*(\d{4,8})\s*<')
+PASSWORD = "loadtest-password"
+
+
+class StepFailed(Exception):
+    pass
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_menu() -> tuple[list[int], list[int], list[int]]:
+    db = SessionLocal()
+    try:
+        foods = [FoodItem(name=f"Food {n}", price=1500 + n * 10, available=True) for n in range(20)]
+        proteins = [Protein(name=f"Protein {n}", price=500 + n * 50, is_available=True) for n in range(3)]
+        extras = [Extra(name=f"Extra {n}", price=200 + n * 25) for n in range(4)]
+        db.add_all(foods + proteins + extras)
+        db.commit()
+        return [f.id for f in foods], [p.id for p in proteins], [e.id for e in extras]
+    finally:
+        db.close()
+
+
+def find_otp(sink: SMTPSink, address: str, timeout: float) -> str:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for rcpt, data in reversed(list(sink.messages)):
+            if address not in rcpt:
+                continue
+            for part in email.message_from_bytes(data).walk():
+                if part.get_content_type() == "text/html":
+                    match = OTP_PATTERN.search(part.get_payload(decode=True).decode("utf-8", "replace"))
+                    if match:
+                        return match.group(1)
+        time.sleep(0.02)
+    raise StepFailed(f"no OTP email for {address}")
+
+
+class Journey:
+    # One customer from signup to a verified payment; every step is timed into
+    # its own RunResult
+
+    def __init__(self, client: httpx.Client, sink: SMTPSink, sim: PaystackSimulator, menu, args):
+        self.client = client
+        self.sink = sink
+        self.sim = sim
+        self.menu = menu
+        self.args = args
+        self.run_id = int(time.time())
+        self.results = {step: RunResult(name=step) for step in STEPS}
+        self.first_error: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _timed(self, step: str, fn):
+        started = time.perf_counter()
+        try:
+            return fn()
+        except Exception as e:
+            with self._lock:
+                self.results[step].errors += 1
+                self.first_error.setdefault(step, repr(e)[:300])
+            raise
+        finally:
+            with self._lock:
+                self.results[step].latencies.append(time.perf_counter() - started)
+
+    def _call(self, method: str, url: str, expect: int = 200, **kwargs) -> dict:
+        response = self.client.request(method, url, **kwargs)
+        if response.status_code != expect:
+            raise StepFailed(f"{method} {url} -> {response.status_code} {response.text[:200]}")
+        return response.json()
+
+    def _wait_paid(self, order_id: int, headers: dict) -> None:
+        deadline = time.monotonic() + self.args.webhook_timeout
+        while time.monotonic() < deadline:
+            if self._call("GET", f"/orders/{order_id}", headers=headers)["payment_status"] == "paid":
+                return
+            time.sleep(0.05)
+        raise StepFailed(f"order {order_id} not paid after {self.args.webhook_timeout}s")
+
+    def __call__(self, i: int) -> bool:
+        address = f"user{i}.{self.run_id}@loadtest.oredelight.com"
+        foods, proteins, extras = self.menu
+        credentials = {"email": address, "password": PASSWORD}
+
+        self._timed("signup", lambda: self._call("POST", "/auth/signup", 201, json=credentials))
+        otp = self._timed("otp_email", lambda: find_otp(self.sink, address, self.args.otp_timeout))
+        self._timed("verify_email", lambda: self._call("POST", "/auth/verify", json={"email": address, "otp": otp}))
+        token = self._timed("login", lambda: self._call("POST", "/auth/login", json=credentials))["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for n in range(self.args.items):
+            self._timed("add_to_cart", lambda: self._call("POST", "/cart/add", headers=headers, json={
+                "food_item_id": foods[(i + n) % len(foods)],
+                "quantity": 1 + n % 2,
+                "protein_id": proteins[n % len(proteins)] if n % 2 else None,
+                "extras_id": extras[: n % 3],
+            }))
+        order = self._timed("place_order", lambda: self._call("POST", "/orders", headers=headers, json={}))
+        payment = self._timed("initiate_payment", lambda: self._call(
+            "POST", "/payments/initiate", json={"order_id": order["order_id"]},
+            headers={**headers, "Idempotency-Key": f"checkout-{address}"},
+        ))
+
+        outcome = "failed" if i % 100 < self.args.decline_percent else "success"
+        self._timed("checkout", lambda: self._call("GET", f"{payment['authorization_url']}?outcome={outcome}"))
+        if outcome == "success":
+            try:
+                self._timed("webhook", lambda: self._wait_paid(order["order_id"], headers))
+            except StepFailed:
+                pass  # verify below still settles the payment
+        result = self._timed("verify_payment", lambda: self._call(
+            "GET", f"/payments/{payment['reference']}/verify", headers=headers,
+        ))
+        return result["status"] == outcome
+
+
+def start_api(port: int) -> uvicorn.Server:
+    import main as api
+
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("API did not start")
+        time.sleep(0.05)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="customer journeys to run")
+    parser.add_argument("--rate", type=float, default=0.0, help="journeys started per second, 0 = unthrottled")
+    parser.add_argument("--concurrency", type=int, default=10, help="journeys in flight")
+    parser.add_argument("--items", type=int, default=2, help="cart lines per order")
+    parser.add_argument("--decline-percent", type=int, default=0, help="share of payments the customer fails")
+    parser.add_argument("--paystack-latency-ms", type=float, default=100.0)
+    parser.add_argument("--paystack-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--paystack-error-rate", type=float, default=0.0, help="gateway 503 probability")
+    parser.add_argument("--webhook-delay-ms", type=float, default=200.0)
+    parser.add_argument("--webhook-failure-rate", type=float, default=0.0, help="webhooks never delivered")
+    parser.add_argument("--webhook-duplicate-rate", type=float, default=0.0, help="webhooks delivered twice")
+    parser.add_argument("--smtp-latency-ms", type=float, default=10.0)
+    parser.add_argument("--otp-timeout", type=float, default=30.0)
+    parser.add_argument("--webhook-timeout", type=float, default=10.0)
+    parser.add_argument("--worker-concurrency", type=int, default=8)
+    parser.add_argument("--eager", action="store_true", help="run Celery tasks inline instead of on a worker")
+    parser.add_argument("--verbose", action="store_true", help="keep application logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    port = _free_port()
+    sink = SMTPSink(args.smtp_latency_ms, keep=max(1000, args.users * 4)).start()
+    sim = PaystackSimulator(
+        settings.PAYSTACK_SECRET_KEY,
+        webhook_url=f"http://127.0.0.1:{port}/payments/webhook",
+        latency_ms=args.paystack_latency_ms,
+        jitter_ms=args.paystack_jitter_ms,
+        error_rate=args.paystack_error_rate,
+        webhook_delay_ms=args.webhook_delay_ms,
+        webhook_failure_rate=args.webhook_failure_rate,
+        webhook_duplicate_rate=args.webhook_duplicate_rate,
+    ).start()
+
+    settings.SMTP_HOST = "127.0.0.1"
+    settings.SMTP_PORT = sink.port
+    settings.SMTP_USE_TLS = False
+    settings.SMTP_USERNAME = None
+    settings.SMTP_PASSWORD = None
+    settings.EMAIL_PROVIDER = "smtp"
+    settings.PAYSTACK_BASE_URL = sim.url
+    settings.FRONTEND_URL = sim.url
+
+    from workers.celery_app import celery_app
+    if args.eager:
+        celery_app.conf.task_always_eager = True
+        worker = nullcontext()
+    else:
+        from celery.contrib.testing.worker import start_worker
+        worker = start_worker(
+            celery_app, pool="threads", concurrency=args.worker_concurrency,
+            perform_ping_check=False, loglevel="WARNING",
+        )
+
+    Base.metadata.create_all(bind=engine)
+    menu = seed_menu()
+    server = start_api(port)
+    client = httpx.Client(
+        base_url=f"http://127.0.0.1:{port}",
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2),
+    )
+
+    print(
+        f"database={engine.url.get_backend_name()} users={args.users} rate={args.rate or 'max'}/s "
+        f"concurrency={args.concurrency} celery={'eager' if args.eager else f'worker x{args.worker_concurrency}'} "
+        f"paystack={args.paystack_latency_ms}±{args.paystack_jitter_ms}ms webhook_delay={args.webhook_delay_ms}ms "
+        f"webhook_failure={args.webhook_failure_rate} webhook_duplicate={args.webhook_duplicate_rate}"
+    )
+    try:
+        with worker:
+            journey = Journey(client, sink, sim, menu, args)
+            total = run_at_rate("journey", journey, args.users, args.rate, args.concurrency)
+        for step in STEPS:
+            result = journey.results[step]
+            result.elapsed = total.elapsed
+            print(format_row(result))
+        print(format_row(total))
+        for step, error in journey.first_error.items():
+            print(f"first {step} error: {error}")
+        print(
+            f"gateway_requests={sim.faults.requests} gateway_errors={sim.faults.errors} "
+            f"webhooks sent={sim.webhooks_sent} dropped={sim.webhooks_dropped} rejected={sim.webhooks_rejected} "
+            f"emails={len(sink.messages)}"
+        )
+    finally:
+        client.close()
+        server.should_exit = True
+        sim.stop()
+        sink.stop()
+        if _tmpdir is not None:
+            engine.dispose()
+            _tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
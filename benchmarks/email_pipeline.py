@@ -0,0 +1,160 @@
+"""Email pipeline load test.
+
+Starts an in-process SMTP sink and a fake SendGrid endpoint, points the app
+settings at them and drives the email path at a controlled rate:
+
+    python -m benchmarks.email_pipeline --rate 100 --count 1000 --provider sendgrid \\
+        --latency-ms 40 --error-rate 0.05
+
+Scenarios (select with --scenario, default: all):
+    render      ORDER_CONFIRMATION_TEMPLATE rendering only (no I/O)
+    send_email  utils.email.send_email
+    order       utils.email.send_order_confirmation (render + send)
+    tasks       the Celery tasks in workers/tasks.py, executed in-process via Task.apply()
+
+"amp" is retry amplification: provider requests (SMTP + SendGrid, including the
+SendGrid -> SMTP fallback) plus task retries, per logical email.
+"""
+import argparse
+import logging
+import threading
+from datetime import datetime
+
+from celery import signals
+
+from benchmarks.harness import format_row, run_at_rate
+from benchmarks.stubs import FakeSendGrid, SMTPSink
+from config import settings
+
+
+def sample_order(order_id: int, items: int) -> dict:
+    lines = [
+        {
+            "food": f"Jollof Rice #{n}",
+            "protein": "Grilled Chicken" if n % 2 else None,
+            "extras": ["Plantain", "Coleslaw"][: n % 3],
+            "quantity": 1 + n % 3,
+            "item_total": 2500.0 + n * 150,
+        }
+        for n in range(items)
+    ]
+    subtotal = sum(line["item_total"] for line in lines)
+    return {
+        "order_id": order_id,
+        "status": "Pending",
+        "items": lines,
+        "subtotal": subtotal,
+        "delivery_fee": settings.DELIVERY_FEE_NGN,
+        "service_fee": subtotal * settings.SERVICE_FEE_PERCENT,
+        "tax": subtotal * settings.TAX_PERCENT,
+        "total": subtotal * (1 + settings.SERVICE_FEE_PERCENT + settings.TAX_PERCENT) + settings.DELIVERY_FEE_NGN,
+        "instructions": "Extra pepper",
+    }
+
+
+class _RetryCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        signals.task_retry.connect(self._on_retry, weak=False)
+
+    def _on_retry(self, **kwargs):
+        with self._lock:
+            self.count += 1
+
+
+def configure_app(smtp: SMTPSink, sendgrid: FakeSendGrid, provider: str) -> None:
+    settings.SMTP_HOST = "127.0.0.1"
+    settings.SMTP_PORT = smtp.port
+    settings.SMTP_USE_TLS = False
+    settings.SMTP_USERNAME = None
+    settings.SMTP_PASSWORD = None
+    settings.EMAIL_PROVIDER = provider
+    settings.SENDGRID_API_KEY = "SG.benchmark"
+    settings.SENDGRID_API_HOST = sendgrid.url
+
+
+def build_scenarios(items: int) -> dict:
+    from utils import email
+    from workers import tasks
+
+    order = sample_order(1, items)
+
+    def render(i):
+        return bool(email.ORDER_CONFIRMATION_TEMPLATE.render(
+            style=email._BASE_STYLE, app_name=settings.APP_NAME, year=datetime.utcnow().year, **order
+        ))
+
+    def send_email(i):
+        return email.send_email(f"user{i}@bench.local", "Benchmark", "<p>hello</p>")
+
+    def send_order(i):
+        return email.send_order_confirmation(f"user{i}@bench.local", {**order, "order_id": i})
+
+    task_calls = [
+        lambda i: tasks.send_otp_task.apply(args=(f"user{i}@bench.local", "123456")),
+        lambda i: tasks.send_order_confirmation_task.apply(args=(f"user{i}@bench.local", {**order, "order_id": i})),
+        lambda i: tasks.send_status_update_task.apply(args=(f"user{i}@bench.local", i, "Shipped")),
+    ]
+
+    def run_task(i):
+        return task_calls[i % len(task_calls)](i).successful()
+
+    return {
+        "render": (render, False),
+        "send_email": (send_email, True),
+        "order": (send_order, True),
+        "tasks": (run_task, True),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["all", "render", "send_email", "order", "tasks"], default="all")
+    parser.add_argument("--provider", choices=["smtp", "sendgrid"], default="smtp")
+    parser.add_argument("--count", type=int, default=500, help="emails per scenario")
+    parser.add_argument("--rate", type=float, default=100.0, help="offered emails/second, 0 = unthrottled")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="provider latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="provider failure probability")
+    parser.add_argument("--items", type=int, default=5, help="line items in the sample order")
+    parser.add_argument("--verbose", action="store_true", help="keep application logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    smtp = SMTPSink(args.latency_ms, args.jitter_ms, args.error_rate).start()
+    sendgrid = FakeSendGrid(args.latency_ms, args.jitter_ms, args.error_rate).start()
+    configure_app(smtp, sendgrid, args.provider)
+
+    from workers.celery_app import celery_app
+    celery_app.conf.task_always_eager = True
+    retries = _RetryCounter()
+
+    scenarios = build_scenarios(args.items)
+    selected = scenarios if args.scenario == "all" else {args.scenario: scenarios[args.scenario]}
+
+    print(
+        f"provider={args.provider} rate={args.rate or 'max'}/s concurrency={args.concurrency} "
+        f"latency={args.latency_ms}±{args.jitter_ms}ms error_rate={args.error_rate}"
+    )
+    try:
+        for name, (fn, does_io) in selected.items():
+            before = (smtp.faults.requests, sendgrid.faults.requests, retries.count)
+            # Rendering is CPU-bound; measure it closed-loop so the rate limit doesn't hide its cost
+            result = run_at_rate(name, fn, args.count, 0 if not does_io else args.rate, args.concurrency)
+            extra = ""
+            if does_io:
+                provider_calls = (smtp.faults.requests - before[0]) + (sendgrid.faults.requests - before[1])
+                task_retries = retries.count - before[2]
+                extra = f"amp={(provider_calls + task_retries) / max(result.count, 1):.2f}x retries={task_retries}"
+            print(format_row(result, extra))
+    finally:
+        smtp.stop()
+        sendgrid.stop()
+
+
+if __name__ == "__main__":
+    main()
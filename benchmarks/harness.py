@@ -0,0 +1,75 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+@dataclass
+class RunResult:
+    name: str
+    latencies: list[float] = field(default_factory=list)   # seconds, successful + failed calls
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def run_at_rate(name: str, fn: Callable[[int], bool], count: int, rate: float, concurrency: int) -> RunResult:
+    # Open-loop load: call i is *scheduled* at start + i / rate and its latency is
+    # measured from that moment, so a slow backend shows up as queueing delay
+    # instead of silently lowering the offered rate. rate <= 0 means "as fast as
+    # possible" (closed loop): latency is then measured from the start of each call.
+    result = RunResult(name=name)
+    lock = threading.Lock()
+
+    def _call(i: int, scheduled: float | None) -> None:
+        if scheduled is None:
+            scheduled = time.perf_counter()
+        try:
+            ok = fn(i)
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - scheduled
+        with lock:
+            result.latencies.append(latency)
+            if not ok:
+                result.errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(count):
+            scheduled = started + (i / rate if rate > 0 else 0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_call, i, scheduled if rate > 0 else None)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def format_row(result: RunResult, extra: str = "") -> str:
+    ms = [v * 1000 for v in result.latencies]
+    mean = statistics.fmean(ms) if ms else 0.0
+    return (
+        f"{result.name:<28} n={result.count:<6} err={result.errors:<5} "
+        f"thr={result.throughput:8.1f}/s  mean={mean:8.2f}ms  "
+        f"p50={percentile(ms, 50):8.2f}ms  p95={percentile(ms, 95):8.2f}ms  "
+        f"p99={percentile(ms, 99):8.2f}ms  max={max(ms, default=0):8.2f}ms"
+        + (f"  {extra}" if extra else "")
+    )
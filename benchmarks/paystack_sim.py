@@ -0,0 +1,166 @@
+"""Offline Paystack simulator.
+
+FakePaystack plus per-transaction state and webhook callbacks: when the
+customer "pays" (GET on the authorization_url, optionally ?outcome=failed) the
+transaction settles and a charge.success / charge.failed event is POSTed to
+the webhook URL, signed with HMAC-SHA512 of the body under the secret key,
+exactly as Paystack does. Used by benchmarks.checkout_flow, or standalone:
+
+    python -m benchmarks.paystack_sim --port 8089 --secret-key sk_test_local \\
+        --webhook-url http://127.0.0.1:8000/payments/webhook --latency-ms 150
+
+then start the API with PAYSTACK_BASE_URL=http://127.0.0.1:8089 and the same
+PAYSTACK_SECRET_KEY.
+"""
+import argparse
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks.stubs import FakePaystack
+
+
+class PaystackSimulator(FakePaystack):
+    # Transactions verify as "ongoing" until checkout() settles them.
+    # Webhooks go out after webhook_delay_ms; webhook_failure_rate drops some
+    # (the app has to recover through verify or reconciliation) and
+    # webhook_duplicate_rate delivers some twice, like Paystack's retries.
+
+    def __init__(
+        self,
+        secret_key: str,
+        webhook_url: str = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        outcome: str = "success",
+        webhook_delay_ms: float = 0.0,
+        webhook_failure_rate: float = 0.0,
+        webhook_duplicate_rate: float = 0.0,
+        webhook_workers: int = 16,
+        port: int = 0,
+    ):
+        super().__init__(latency_ms, jitter_ms, error_rate, outcome, port)
+        self.secret_key = secret_key
+        self.webhook_url = webhook_url
+        self.webhook_delay_ms = webhook_delay_ms
+        self.webhook_failure_rate = webhook_failure_rate
+        self.webhook_duplicate_rate = webhook_duplicate_rate
+        self.webhooks_sent = 0
+        self.webhooks_dropped = 0
+        self.webhooks_rejected = 0
+        self._ids = itertools.count(1)
+        self._webhooks = ThreadPoolExecutor(max_workers=webhook_workers)
+        self._http = httpx.Client(timeout=10.0)
+
+    def sign(self, body: bytes) -> str:
+        return hmac.new(self.secret_key.encode("utf-8"), body, hashlib.sha512).hexdigest()
+
+    def transaction_status(self, reference: str) -> str:
+        return self.transactions[reference].get("sim_status", "ongoing")
+
+    def checkout(self, reference: str, outcome: str = None) -> bool:
+        outcome = outcome or self.outcome
+        with self.faults._lock:
+            transaction = self.transactions.get(reference)
+            if transaction is None:
+                return False
+            if "sim_status" in transaction:
+                return True
+            transaction.update({
+                "sim_status": outcome,
+                "sim_id": next(self._ids),
+                "sim_paid_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            })
+        if self.webhook_url:
+            self._webhooks.submit(self._deliver, reference)
+        return True
+
+    def event_for(self, reference: str) -> dict:
+        transaction = self.transactions[reference]
+        status = transaction["sim_status"]
+        return {
+            "event": "charge.success" if status == "success" else "charge.failed",
+            "data": {
+                "id": transaction["sim_id"],
+                "reference": reference,
+                "status": status,
+                "amount": transaction["amount"],
+                "currency": transaction.get("currency", "NGN"),
+                "channel": "card",
+                "paid_at": transaction["sim_paid_at"] if status == "success" else None,
+                "metadata": transaction.get("metadata", {}),
+            },
+        }
+
+    def _deliver(self, reference: str) -> None:
+        if self.webhook_delay_ms:
+            time.sleep(self.webhook_delay_ms / 1000)
+        if random.random() < self.webhook_failure_rate:
+            with self.faults._lock:
+                self.webhooks_dropped += 1
+            return
+
+        body = json.dumps(self.event_for(reference)).encode()
+        copies = 2 if random.random() < self.webhook_duplicate_rate else 1
+        for _ in range(copies):
+            try:
+                response = self._http.post(
+                    self.webhook_url,
+                    content=body,
+                    headers={"Content-Type": "application/json", "x-paystack-signature": self.sign(body)},
+                )
+                accepted = response.status_code == 200
+            except httpx.HTTPError:
+                accepted = False
+            with self.faults._lock:
+                self.webhooks_sent += 1
+                if not accepted:
+                    self.webhooks_rejected += 1
+
+    def stop(self) -> None:
+        super().stop()
+        self._webhooks.shutdown(wait=False, cancel_futures=True)
+        self._http.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--secret-key", required=True, help="must match the API's PAYSTACK_SECRET_KEY")
+    parser.add_argument("--webhook-url", help="e.g. http://127.0.0.1:8000/payments/webhook")
+    parser.add_argument("--outcome", choices=["success", "failed"], default="success")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="API latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="API 503 probability")
+    parser.add_argument("--webhook-delay-ms", type=float, default=0.0)
+    parser.add_argument("--webhook-failure-rate", type=float, default=0.0, help="webhooks never delivered")
+    parser.add_argument("--webhook-duplicate-rate", type=float, default=0.0, help="webhooks delivered twice")
+    args = parser.parse_args()
+
+    sim = PaystackSimulator(
+        args.secret_key, args.webhook_url, args.latency_ms, args.jitter_ms, args.error_rate, args.outcome,
+        args.webhook_delay_ms, args.webhook_failure_rate, args.webhook_duplicate_rate, port=args.port,
+    ).start()
+    print(f"Paystack simulator on {sim.url} (webhooks -> {args.webhook_url or 'disabled'}), Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+        print(
+            f"transactions={len(sim.transactions)} api_requests={sim.faults.requests} "
+            f"webhooks sent={sim.webhooks_sent} dropped={sim.webhooks_dropped} rejected={sim.webhooks_rejected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
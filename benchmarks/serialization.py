@@ -0,0 +1,116 @@
+"""Response encoding cost for the menu and order list payloads.
+
+    python -m benchmarks.serialization --foods 200 --orders 100 --items 4 --iterations 500
+
+Nothing touches a database: the menu is built from transient FoodItem objects
+and the orders have the same shape as GET /users/me/orders. Each scenario
+times what happens after the endpoint returns, up to the response body:
+
+    json          jsonable_encoder + JSONResponse (the old default)
+    fast          jsonable_encoder + FastJSONResponse (the app default now)
+    fast-direct   FastJSONResponse returned by the endpoint (no jsonable_encoder)
+    cached        pre-encoded bytes in an EncodedJSONResponse (GET /foods)
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DEBUG", "false")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from sqlalchemy import inspect  # noqa: E402
+
+from benchmarks.harness import RunResult, format_row  # noqa: E402
+from database.models import FoodItem, OrderStatus  # noqa: E402
+from utils.serialization import EncodedJSONResponse, FastJSONResponse, dumps  # noqa: E402
+
+
+def build_menu(count: int) -> list[FoodItem]:
+    now = datetime.utcnow()
+    return [
+        FoodItem(
+            id=n + 1, name=f"Food {n}", quantity=100, price=1500.0 + n * 10,
+            description=f"Freshly made food number {n}, served hot", image_url=f"https://cdn.example.com/foods/{n}.jpg",
+            available=True, owner_id=1, created_at=now - timedelta(days=n), updated_at=now,
+        )
+        for n in range(count)
+    ]
+
+
+def build_orders(count: int, items: int) -> list[dict]:
+    now = datetime.utcnow()
+    statuses = list(OrderStatus)
+    return [
+        {
+            "order_id": n + 1,
+            "status": statuses[n % len(statuses)].value,
+            "payment_status": "paid",
+            "subtotal": 4500.0, "delivery_fee": 500.0, "service_fee": 50.0, "tax": 337.5, "total": 5387.5,
+            "instructions": None,
+            "items": [
+                {
+                    "food": f"Food {i}", "protein": "Chicken" if i % 2 else None, "extras": ["Plantain"] * (i % 3),
+                    "unit_price": 1500.0, "quantity": 1 + i % 2, "item_total": 1500.0 * (1 + i % 2),
+                }
+                for i in range(items)
+            ],
+            "created_at": now - timedelta(minutes=n),
+        }
+        for n in range(count)
+    ]
+
+
+def _time(name: str, fn, iterations: int) -> tuple[RunResult, int]:
+    result = RunResult(name=name)
+    size = len(fn())
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        result.latencies.append(time.perf_counter() - started)
+        result.elapsed += result.latencies[-1]
+    return result, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--foods", type=int, default=200, help="menu size")
+    parser.add_argument("--orders", type=int, default=100, help="orders in the order list")
+    parser.add_argument("--items", type=int, default=4, help="items per order")
+    parser.add_argument("--iterations", type=int, default=500, help="encodes per scenario")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    menu = build_menu(args.foods)
+    columns = [attr.key for attr in inspect(FoodItem).column_attrs]
+    menu_rows = [{key: getattr(food, key) for key in columns} for food in menu]
+    menu_body = dumps(menu_rows)
+    orders = build_orders(args.orders, args.items)
+
+    scenarios = [
+        ("menu", {
+            "json": lambda: JSONResponse(jsonable_encoder(menu)).body,
+            "fast": lambda: FastJSONResponse(jsonable_encoder(menu)).body,
+            "fast-direct": lambda: FastJSONResponse(
+                [{key: getattr(food, key) for key in columns} for food in menu]
+            ).body,
+            "cached": lambda: EncodedJSONResponse(menu_body).body,
+        }),
+        ("orders", {
+            "json": lambda: JSONResponse(jsonable_encoder(orders)).body,
+            "fast": lambda: FastJSONResponse(jsonable_encoder(orders)).body,
+            "fast-direct": lambda: FastJSONResponse(orders).body,
+        }),
+    ]
+
+    print(f"foods={args.foods} orders={args.orders} items={args.items} iterations={args.iterations}")
+    for payload, encoders in scenarios:
+        for name, fn in encoders.items():
+            result, size = _time(f"{payload} {name}", fn, args.iterations)
+            print(format_row(result, f"bytes={size}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import json
+import random
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# In-process stand-ins for the external services the app talks to, so the
+# benchmarks run offline. Every stub has a fixed latency (plus optional jitter)
+# and an error rate, and counts the requests it receives.
+
+
+class _FaultProfile:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def apply(self) -> bool:
+        # Sleep for the configured latency; return False when this request should fail
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        failed = random.random() < self.error_rate
+        with self._lock:
+            self.requests += 1
+            if failed:
+                self.errors += 1
+        return not failed
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough of RFC 5321 for smtplib.sendmail(); no STARTTLS or AUTH
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink: SMTPSink = self.server.sink
+        self._reply("220 delifoods-sink ESMTP")
+        rcpt = []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode(errors="replace").strip()
+            verb = command[:4].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 delifoods-sink")
+            elif verb == "MAIL":
+                rcpt = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                rcpt.append(command.split(":", 1)[-1].strip(" <>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                    lines.append(line)
+                if sink.faults.apply():
+                    sink.deliver(rcpt, b"".join(lines))
+                    self._reply("250 OK: queued")
+                else:
+                    self._reply("451 Temporary failure (injected)")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    # Accepts mail on 127.0.0.1 and keeps the most recent messages in memory
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, keep: int = 1000):
+        self.faults = _FaultProfile(latency_ms, jitter_ms, error_rate)
+        self.messages: deque = deque(maxlen=keep)
+        self._server = _ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+        self._server.sink = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def deliver(self, rcpt: list[str], data: bytes) -> None:
+        self.messages.append((rcpt, data))
+
+    def start(self) -> "SMTPSink":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _SendGridHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        stub: FakeSendGrid = self.server.stub
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+
+        if self.path != "/v3/mail/send":
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        if stub.faults.apply():
+            self.send_response(202)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            body = json.dumps({"errors": [{"message": "injected failure"}]}).encode()
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+class FakeSendGrid:
+    # Serves POST /v3/mail/send like the SendGrid v3 API (202 on success)
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.faults = _FaultProfile(latency_ms, jitter_ms, error_rate)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _SendGridHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeSendGrid":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _PaystackHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.stub.faults._lock:
+            self.server.stub.connections += 1
+
+    def _send_json(self, status_code: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stub: FakePaystack = self.server.stub
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path != "/transaction/initialize":
+            return self._send_json(404, {"status": False, "message": "Not found"})
+        if not stub.faults.apply():
+            return self._send_json(503, {"status": False, "message": "injected failure"})
+
+        reference = payload["reference"]
+        with stub.faults._lock:
+            if reference in stub.transactions:
+                return self._send_json(400, {"status": False, "message": "Duplicate Transaction Reference"})
+            stub.transactions[reference] = payload
+        self._send_json(200, {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"{stub.url}/checkout/{reference}",
+                "access_code": reference,
+                "reference": reference,
+            },
+        })
+
+    def do_GET(self):
+        stub: FakePaystack = self.server.stub
+        path, _, query = self.path.partition("?")
+        if path.startswith("/checkout/"):
+            # The customer completing payment on the authorization_url page
+            outcome = parse_qs(query).get("outcome", [None])[0]
+            if not stub.checkout(path.rsplit("/", 1)[-1], outcome):
+                return self._send_json(404, {"status": False, "message": "Transaction reference not found"})
+            return self._send_json(200, {"status": True, "message": "Payment completed"})
+        if not path.startswith("/transaction/verify/"):
+            return self._send_json(404, {"status": False, "message": "Not found"})
+        if not stub.faults.apply():
+            return self._send_json(503, {"status": False, "message": "injected failure"})
+
+        reference = path.rsplit("/", 1)[-1]
+        transaction = stub.transactions.get(reference)
+        if transaction is None:
+            return self._send_json(400, {"status": False, "message": "Transaction reference not found"})
+        self._send_json(200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": {
+                "status": stub.transaction_status(reference),
+                "reference": reference,
+                "amount": transaction["amount"],
+                "currency": transaction.get("currency", "NGN"),
+                "channel": "card",
+                "paid_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            },
+        })
+
+
+class FakePaystack:
+    # Serves POST /transaction/initialize and GET /transaction/verify/{reference}
+    # like the Paystack API. Every initialized transaction verifies as `outcome`;
+    # GET /checkout/{reference} (the authorization_url) stands in for the
+    # customer's payment page.
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        outcome: str = "success",
+        port: int = 0,
+    ):
+        self.faults = _FaultProfile(latency_ms, jitter_ms, error_rate)
+        self.outcome = outcome
+        self.transactions: dict[str, dict] = {}
+        self.connections = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _PaystackHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakePaystack":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def transaction_status(self, reference: str) -> str:
+        return self.outcome
+
+    def checkout(self, reference: str, outcome: str = None) -> bool:
+        # Subclasses record the payment here; returns False for an unknown reference
+        return reference in self.transactions
@@ -0,0 +1,5 @@
+import time
+
+# Imported first by main.py, so the [INIT] log line can report how long
+# importing the app took. Keep this module free of other imports.
+IMPORT_STARTED = time.perf_counter()
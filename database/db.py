@@ -1,25 +1,138 @@
-from sqlalchemy import create_engine
+import logging
+from typing import Optional
+
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from config import settings
+from database.instrumentation import TimedQueuePool, instrument_engine
+
+logger = logging.getLogger(__name__)
 
 engine = create_engine(
     settings.DATABASE_URL,
     # For SQLite local dev fallback only
     connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    poolclass=TimedQueuePool,
+    pool_logging_name="primary",
     pool_pre_ping=True,      # verify connections before use
     pool_size=10,            # connection pool size
     max_overflow=20,         # additional connections under load
-    echo=settings.DEBUG,     # log SQL in development
+    echo=settings.SQL_ECHO,  # statement timings come from instrument_engine
 )
+instrument_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional read replica with its own pool, used through get_read_db
+replica_engine = None
+ReplicaSessionLocal = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(
+        settings.DATABASE_REPLICA_URL,
+        connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_REPLICA_URL else {},
+        poolclass=TimedQueuePool,
+        pool_logging_name="replica",
+        pool_pre_ping=True,
+        pool_size=settings.REPLICA_POOL_SIZE,
+        max_overflow=settings.REPLICA_MAX_OVERFLOW,
+        echo=settings.SQL_ECHO,
+    )
+    instrument_engine(replica_engine)
+    ReplicaSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=replica_engine, info={"replica": True},
+    )
+
 
 class Base(DeclarativeBase):
     pass
 
-def get_db():
+def dialect_insert(db):
+    # ON CONFLICT is spelled the same on both supported backends, but
+    # SQLAlchemy exposes it through each dialect's own insert()
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT is not supported on {dialect}")
+    return insert
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flag_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _flag_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+def _token_subject(request: Optional[Request]) -> Optional[str]:
+    # The signed-in user's email, without a database lookup
+    if request is None:
+        return None
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+
+def _recent_write_key(subject: str) -> str:
+    return f"db:recent_write:{subject}"
+
+
+def _mark_recent_write(request: Optional[Request]) -> None:
+    # Read-your-writes: keeps the user's reads on the primary until the
+    # replica has had READ_YOUR_WRITES_SECONDS to catch up
+    subject = _token_subject(request)
+    if subject is None:
+        return
+    from handlers.user import redis_client
+    try:
+        redis_client.set(_recent_write_key(subject), 1, ex=settings.READ_YOUR_WRITES_SECONDS)
+    except Exception as e:
+        logger.warning(f"[DB] Could not record recent write for read routing: {e}")
+
+
+def _wrote_recently(request: Request) -> bool:
+    subject = _token_subject(request)
+    if subject is None:
+        return False
+    from handlers.user import redis_client
+    try:
+        return bool(redis_client.exists(_recent_write_key(subject)))
+    except Exception as e:
+        logger.warning(f"[DB] Could not check recent writes, reading from the primary: {e}")
+        return True
+
+
+def get_db(request: Request = None):
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        wrote = db.info.get("wrote", False)
+        db.close()
+        if wrote and ReplicaSessionLocal is not None:
+            _mark_recent_write(request)
+
+
+def get_read_db(request: Request):
+    # For read-only routes: the replica when one is configured, unless the
+    # caller wrote something in the last READ_YOUR_WRITES_SECONDS
+    if ReplicaSessionLocal is None or _wrote_recently(request):
+        yield from get_db(request)
+        return
+
+    db = ReplicaSessionLocal()
     try:
         yield db
     finally:
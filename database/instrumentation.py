@@ -0,0 +1,116 @@
+import logging
+import re
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from config import settings
+from utils.metrics import (
+    DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, DB_POOL_WAIT, DB_REQUEST_QUERIES, DB_REQUEST_TIME,
+    DB_STATEMENT_DURATION,
+)
+from utils.tracing import Trace, current_trace
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = {"select", "insert", "update", "delete", "with"}
+_VERB = re.compile(r"\s*(\w+)")
+_START_TIMES = "instrumentation_started"
+
+
+def record_request_stats(trace: Trace) -> None:
+    # Per-request query count and DB time, from the trace's "db" phase
+    if settings.METRICS_ENABLED:
+        DB_REQUEST_QUERIES.labels(trace.route).observe(trace.phase_count("db"))
+        DB_REQUEST_TIME.labels(trace.route).observe(trace.phase_seconds("db"))
+
+
+def _operation(statement: str) -> str:
+    match = _VERB.match(statement)
+    verb = match.group(1).lower() if match else ""
+    return verb if verb in OPERATIONS else "other"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START_TIMES, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _finish(conn, statement, executemany, cursor.rowcount, failed=False)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and exception_context.statement is not None:
+        _finish(conn, exception_context.statement, False, -1, failed=True)
+
+
+def _finish(conn, statement: str, executemany: bool, rowcount: int, failed: bool) -> None:
+    started = conn.info.get(_START_TIMES)
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    operation = _operation(statement)
+
+    if settings.METRICS_ENABLED:
+        DB_STATEMENT_DURATION.labels(operation).observe(elapsed)
+
+    trace = current_trace()
+    if trace is not None:
+        trace.add("db", elapsed)
+
+    if elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        # Parameters are left out on purpose: they carry emails, tokens and OTPs
+        logger.warning(
+            f"[SLOW_QUERY] {operation} took {elapsed * 1000:.1f}ms",
+            extra={
+                "duration_ms": round(elapsed * 1000, 1),
+                "operation": operation,
+                "statement": " ".join(statement.split())[:2000],
+                "rowcount": rowcount,
+                "executemany": executemany,
+                "failed": failed,
+                "request_id": trace.trace_id if trace else None,
+                "method": trace.method if trace else None,
+                "route": trace.route if trace else None,
+            },
+        )
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long checkouts wait for a free connection and
+    # keeps the checked-out/overflow gauges current. The pool's logging_name
+    # ("primary", "replica") is the metric label.
+
+    def _metrics_name(self) -> str:
+        return getattr(self, "logging_name", None) or "default"
+
+    def _update_gauges(self) -> None:
+        DB_POOL_CHECKED_OUT.labels(self._metrics_name()).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(self._metrics_name()).set(max(self.overflow(), 0))
+
+    def _do_get(self):
+        if not settings.METRICS_ENABLED:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self._metrics_name()).observe(time.perf_counter() - started)
+            self._update_gauges()
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        if settings.METRICS_ENABLED:
+            self._update_gauges()
+
+
+def instrument_engine(engine: Engine) -> None:
+    # Timings come from the DBAPI cursor calls, so ORM and Core statements are
+    # both covered; the cost per statement is two perf_counter() calls and one
+    # histogram observation
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -1,8 +1,8 @@
 from datetime import datetime
 from utils.referral import generate_referral_code
 from sqlalchemy import (
-    Boolean, Column, DateTime, Enum as SAEnum, ForeignKey,
-    Integer, String, Float, Table, Text
+    Boolean, Column, Date, DateTime, Enum as SAEnum, ForeignKey, Index,
+    Integer, JSON, String, Float, Table, Text
 )
 from sqlalchemy.orm import relationship
 from database.db import Base
@@ -131,6 +131,9 @@ class CartItem(Base):
     unit_price = Column(Float, nullable=False)
     subtotal = Column(Float, nullable=False)
     instructions = Column(Text, nullable=True)
+    # Names and prices when the item was added, in the order_items.snapshot
+    # format; copied onto the order item at checkout
+    snapshot = Column(JSON, nullable=False)
 
     cart = relationship("Cart", back_populates="cart_items")
     food_item = relationship("FoodItem", back_populates="cart_items")
@@ -161,6 +164,11 @@ class Order(Base):
     payments = relationship("Payment", back_populates="order")
     delivery_address = relationship("Address", back_populates="orders")
 
+    __table_args__ = (
+        # Drives the admin change feed, which pages through orders by (updated_at, id)
+        Index("ix_orders_updated_at_id", "updated_at", "id"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -173,6 +181,10 @@ class OrderItem(Base):
     unit_price = Column(Float, nullable=False)
     subtotal = Column(Float, nullable=False)
     instructions = Column(Text, nullable=True)
+    # Names and prices the item was charged at (taken from the cart line):
+    # {"food": [name, price], "protein": [name, price] | null, "extras": [[name, price], ...]}.
+    # Receipts read this, never the live menu rows.
+    snapshot = Column(JSON, nullable=False)
 
     order = relationship("Order", back_populates="order_items")
     food_item = relationship("FoodItem", back_populates="order_items")
@@ -196,4 +208,116 @@ class Payment(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    order = relationship("Order", back_populates="payments")
\ No newline at end of file
+    order = relationship("Order", back_populates="payments")
+
+    __table_args__ = (
+        Index("ix_payments_status_created_at", "status", "created_at"),
+    )
+
+
+class WebhookEvent(Base):
+    __tablename__ = "webhook_events"
+
+    # Inbox for Paystack webhooks (see handlers/webhooks.py). The endpoint only
+    # verifies the signature and stores the event; a worker applies it later.
+    # status: pending -> processing -> processed, or failed after
+    # WEBHOOK_MAX_ATTEMPTS. A failed attempt puts the event back in pending
+    # with next_attempt_at pushed out (NULL: claimable right away).
+    id = Column(Integer, primary_key=True)
+    dedupe_key = Column(String(255), unique=True, nullable=False)
+    event = Column(String(64), nullable=False)
+    reference = Column(String(100), nullable=True, index=True)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_webhook_events_status_id", "status", "id"),
+    )
+
+
+class ArchivedOrder(Base):
+    __tablename__ = "orders_archive"
+
+    # Cold storage for delivered and cancelled orders (see handlers/archive.py).
+    # One row per order; items and payments are kept as JSON since order items
+    # already carry their own snapshot. On PostgreSQL the table is partitioned
+    # by month of created_at, so the partition key is part of the primary key.
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, primary_key=True)
+    user_id = Column(Integer, nullable=True)
+    delivery_address_id = Column(Integer, nullable=True)
+
+    subtotal = Column(Float, nullable=False)
+    delivery_fee = Column(Float, nullable=False)
+    service_fee = Column(Float, nullable=False)
+    tax = Column(Float, nullable=False)
+    total = Column(Float, nullable=False)
+
+    special_instructions = Column(Text, nullable=True)
+    payment_status = Column(String(20), nullable=True)
+    current_status = Column(String(20), nullable=False)
+    updated_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    items = Column(JSON, nullable=False)
+    payments = Column(JSON, nullable=False)
+
+    __table_args__ = (
+        Index("ix_orders_archive_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class ArchivedOrderKey(Base):
+    __tablename__ = "orders_archive_keys"
+
+    # Unpartitioned id -> created_at map for orders_archive, so a lookup by
+    # order id can filter on the partition key instead of probing every month
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+# Sales rollups. Maintained incrementally in the same transaction as the order
+# change (see handlers/analytics.py) and recomputed by rebuild_rollups.py.
+# Buckets are UTC and follow the order's created_at.
+
+class DailySales(Base):
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True)
+    orders_placed = Column(Integer, nullable=False, default=0)
+    orders_paid = Column(Integer, nullable=False, default=0)
+    orders_cancelled = Column(Integer, nullable=False, default=0)
+    placed_total = Column(Float, nullable=False, default=0)
+    paid_total = Column(Float, nullable=False, default=0)
+    cancelled_total = Column(Float, nullable=False, default=0)
+
+
+class HourlySales(Base):
+    __tablename__ = "sales_hourly"
+
+    hour = Column(DateTime, primary_key=True)
+    orders_placed = Column(Integer, nullable=False, default=0)
+    orders_paid = Column(Integer, nullable=False, default=0)
+    orders_cancelled = Column(Integer, nullable=False, default=0)
+    placed_total = Column(Float, nullable=False, default=0)
+    paid_total = Column(Float, nullable=False, default=0)
+    cancelled_total = Column(Float, nullable=False, default=0)
+
+
+class ItemDailySales(Base):
+    __tablename__ = "sales_items_daily"
+
+    # Items of orders that were not cancelled. No foreign key, so the history
+    # survives menu items being deleted.
+    day = Column(Date, primary_key=True)
+    food_item_id = Column(Integer, primary_key=True)
+    food_name = Column(String(200), nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
+    sales = Column(Float, nullable=False, default=0)
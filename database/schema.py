@@ -0,0 +1,80 @@
+import ast
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = Path(__file__).resolve().parent.parent / "migrations" / "versions"
+_ASSIGNMENT = re.compile(r"^(revision|down_revision)\b[^=\n]*=\s*(.+?)\s*$", re.MULTILINE)
+
+SCHEMA_CHECK_MODES = ("error", "warn", "create", "off")
+
+
+class SchemaMismatch(RuntimeError):
+    pass
+
+
+@lru_cache(maxsize=1)
+def migration_heads() -> tuple[str, ...]:
+    # Read from the revision files directly: alembic's ScriptDirectory imports
+    # alembic and every migration module, which is most of the cost of a check
+    revisions, parents = set(), set()
+    for path in VERSIONS_DIR.glob("*.py"):
+        values = dict(_ASSIGNMENT.findall(path.read_text(encoding="utf-8")))
+        if "revision" not in values:
+            continue
+        revisions.add(ast.literal_eval(values["revision"]))
+        down = ast.literal_eval(values.get("down_revision", "None"))
+        if isinstance(down, str):
+            parents.add(down)
+        elif down:
+            parents.update(down)
+    return tuple(sorted(revisions - parents))
+
+
+def database_revisions(engine: Engine) -> tuple[str, ...]:
+    # The one query a check costs; an empty tuple means the database was never
+    # stamped (or alembic_version doesn't exist)
+    try:
+        with engine.connect() as conn:
+            return tuple(sorted(conn.execute(text("SELECT version_num FROM alembic_version")).scalars()))
+    except SQLAlchemyError as e:
+        logger.debug(f"[SCHEMA] Could not read alembic_version: {e}")
+        return ()
+
+
+def check_schema(engine: Engine, mode: str) -> None:
+    # error:  refuse to start unless the database is at the migration head
+    # warn:   log the mismatch and start anyway
+    # create: Base.metadata.create_all, for a throwaway local database
+    # off:    skip
+    if mode not in SCHEMA_CHECK_MODES:
+        raise ValueError(f"SCHEMA_CHECK_MODE must be one of {', '.join(SCHEMA_CHECK_MODES)}, not {mode!r}")
+    if mode == "off":
+        return
+    if mode == "create":
+        from database.db import Base
+        import database.models  # noqa: F401  (registers the tables)
+        Base.metadata.create_all(bind=engine)
+        logger.info("[SCHEMA] Database tables verified/created")
+        return
+
+    expected = migration_heads()
+    current = database_revisions(engine)
+    if current == expected:
+        logger.info(f"[SCHEMA] Database at migration head {', '.join(expected)}")
+        return
+
+    message = (
+        f"Database schema is at {', '.join(current) or 'no revision'} but the code expects "
+        f"{', '.join(expected)}; run `alembic upgrade head`"
+    )
+    if mode == "error":
+        raise SchemaMismatch(message)
+    logger.warning(f"[SCHEMA] {message}")
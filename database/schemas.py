@@ -2,7 +2,7 @@ import re
 from enum import Enum
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, Field, model_validator
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class UserRole(str, Enum):
     ADMIN = "admin"
@@ -153,6 +153,33 @@ class CartItemCreate(BaseModel):
     instructions: Optional[str] = None
 
 
+class CartOperation(BaseModel):
+    op: Literal["add", "update_quantity", "remove"]
+    cart_item_id: Optional[int] = None      # update_quantity, remove
+    food_item_id: Optional[int] = None      # add
+    quantity: Optional[int] = Field(default=None, ge=1)
+    protein_id: Optional[int] = None
+    extras_id: Optional[List[int]] = []
+    instructions: Optional[str] = None
+
+    @model_validator(mode="before")
+    def validate_operation_fields(values: any) -> any:
+        if isinstance(values, dict):
+            op = values.get("op")
+            if op == "add" and (values.get("food_item_id") is None or values.get("quantity") is None):
+                raise ValueError("'add' requires food_item_id and quantity.")
+            if op == "update_quantity" and (values.get("cart_item_id") is None or values.get("quantity") is None):
+                raise ValueError("'update_quantity' requires cart_item_id and quantity.")
+            if op == "remove" and values.get("cart_item_id") is None:
+                raise ValueError("'remove' requires cart_item_id.")
+
+        return values
+
+
+class CartBatchRequest(BaseModel):
+    operations: List[CartOperation] = Field(min_length=1, max_length=50)
+
+
 class OrderItemResponse(BaseModel):
     food: str
     protein: Optional[str] = None
@@ -180,6 +207,11 @@ class UpdateOrderStatusRequest(BaseModel):
     new_status: str
 
 
+class BulkOrderStatusRequest(BaseModel):
+    order_ids: List[int] = Field(min_length=1, max_length=200)
+    new_status: str
+
+
 class PaymentInitiateRequest(BaseModel):
     order_id: int
 
@@ -19,6 +19,8 @@ export const foodApi = {
 export const cartApi = {
   getCart: () => api.get('/cart'),
   addToCart: (data) => api.post('/cart/add', data),
+  // operations: [{ op: 'add' | 'update_quantity' | 'remove', ... }] — returns the updated cart
+  batch: (operations) => api.post('/cart/batch', { operations }),
   removeItem: (id) => api.delete(`/cart/items/${id}`),
   clearCart: () => api.delete('/cart/clear'),
 }
@@ -52,8 +54,12 @@ export const adminApi = {
   addExtra: (data) => api.post('/admin/extras', data),
   // Orders
   getAllOrders: () => api.get('/admin/orders'),
+  getOrderChanges: (cursor) =>
+    api.get('/admin/orders/changes', { params: cursor ? { cursor } : {} }),
   updateOrderStatus: (id, new_status) =>
     api.patch(`/admin/orders/${id}/status`, { new_status }),
+  bulkUpdateOrderStatus: (order_ids, new_status) =>
+    api.patch('/admin/orders/status', { order_ids, new_status }),
   // Users
   getAllUsers: () => api.get('/admin/users'),
 }
@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { motion } from 'framer-motion'
 import { Clock, ChevronDown } from 'lucide-react'
 import { adminApi } from '../../api'
@@ -7,6 +7,14 @@ import StatusBadge from '../../components/StatusBadge'
 import toast from 'react-hot-toast'
 
 const STATUSES = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
+const REFRESH_MS = 10000
+
+// Replace changed orders in place and keep the list newest first
+const mergeOrders = (current, changed) => {
+  const byId = new Map(current.map(o => [o.order_id, o]))
+  changed.forEach(o => byId.set(o.order_id, o))
+  return [...byId.values()].sort((a, b) => new Date(b.created_at) - new Date(a.created_at))
+}
 
 export default function AdminOrdersPage() {
   const [orders, setOrders] = useState([])
@@ -14,10 +22,38 @@ export default function AdminOrdersPage() {
   const [filter, setFilter] = useState('all')
   const [updatingId, setUpdatingId] = useState(null)
 
+  const cursor = useRef(null)
+
   useEffect(() => {
-    adminApi.getAllOrders()
-      .then(r => setOrders(r.data))
-      .finally(() => setLoading(false))
+    let active = true
+    let timer
+
+    // Follow the change feed: the first pass pages through every order, later
+    // passes only fetch orders created or updated since the last cursor
+    const sync = async () => {
+      try {
+        let more = true
+        while (more && active) {
+          const { data } = await adminApi.getOrderChanges(cursor.current)
+          cursor.current = data.cursor
+          more = data.has_more
+          if (data.orders.length) setOrders(o => mergeOrders(o, data.orders))
+        }
+      } catch (err) {
+        // Keep the current list and try again on the next tick
+      } finally {
+        if (active) {
+          setLoading(false)
+          timer = setTimeout(sync, REFRESH_MS)
+        }
+      }
+    }
+
+    sync()
+    return () => {
+      active = false
+      clearTimeout(timer)
+    }
   }, [])
 
   const handleStatusChange = async (orderId, newStatus) => {
@@ -1,9 +1,23 @@
+import base64
+import binascii
+import json
 import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
 from fastapi import Depends, HTTPException
-from sqlalchemy.orm import Session
-from database.models import FoodItem, Order, User, Protein, Extra
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from config import settings
+from database.models import FoodItem, Order, OrderItem, User, Protein, Extra
 from database.schemas import OrderStatus, UserRole
-from handlers.user import get_active_user
+from handlers.analytics import apply_order_deltas, record_status_change
+from handlers.archive import get_archived_orders
+from handlers.catalog import bump_catalog_version
+from handlers.food import format_archived_order, order_item_names
+from handlers.user import get_active_reader, get_active_user
+from utils.events import publish_order_event, publish_order_events
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +28,10 @@ def require_admin(current_user: User = Depends(get_active_user)):
     return current_user
 
 
+def admin_reader(current_user: User = Depends(get_active_reader)):
+    return require_admin(current_user)
+
+
 def add_food_item(db: Session, name: str, description: str, price: float, owner_id: int = None, image_url: str = None):
     food_item = FoodItem(
         name=name,
@@ -26,6 +44,7 @@ def add_food_item(db: Session, name: str, description: str, price: float, owner_
     db.add(food_item)
     db.commit()
     db.refresh(food_item)
+    bump_catalog_version()
     return food_item
 
 
@@ -34,6 +53,7 @@ def add_protein(db: Session, name: str, price: float, owner_id: int = None):
     db.add(protein_item)
     db.commit()
     db.refresh(protein_item)
+    bump_catalog_version()
     return protein_item
 
 
@@ -42,6 +62,7 @@ def add_extras(db: Session, name: str, price: float):
     db.add(extras_item)
     db.commit()
     db.refresh(extras_item)
+    bump_catalog_version()
     return extras_item
 
 
@@ -71,6 +92,7 @@ def update_food_item(
 
     db.commit()
     db.refresh(food_item)
+    bump_catalog_version()
     return food_item
 
 
@@ -82,12 +104,83 @@ def mark_food_item_availability(db: Session, food_item_id: int, available: bool)
     food_item.available = available
     db.commit()
     db.refresh(food_item)
+    bump_catalog_version()
     return food_item
 
 
 def get_all_orders(db: Session):
-    orders = db.query(Order).order_by(Order.created_at.desc()).all()
-    return [_format_order(order) for order in orders]
+    orders = (
+        db.query(Order)
+        .options(joinedload(Order.user), selectinload(Order.order_items))
+        .order_by(Order.created_at.desc())
+        .all()
+    )
+    formatted = [_format_order(order) for order in orders]
+
+    archived = get_archived_orders(db)
+    user_ids = {order.user_id for order in archived if order.user_id is not None}
+    emails = dict(db.query(User.id, User.email).filter(User.id.in_(user_ids))) if user_ids else {}
+    formatted += [
+        {
+            **format_archived_order(order),
+            "user_id": order.user_id,
+            "user_email": emails.get(order.user_id),
+            "updated_at": order.updated_at,
+        } for order in archived
+    ]
+    return sorted(formatted, key=lambda order: order["created_at"] or datetime.min, reverse=True)
+
+
+def _encode_cursor(updated_at: datetime, order_id: int) -> str:
+    raw = json.dumps([updated_at.isoformat(), order_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        updated_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(updated_at), int(order_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def get_orders_changed_since(db: Session, cursor: Optional[str] = None, limit: int = None):
+    # Orders created or updated after the cursor, oldest change first. Without a
+    # cursor this pages through every order, so a client can build its initial
+    # copy and then keep it current with the returned cursor.
+    limit = min(limit or settings.ORDER_FEED_PAGE_SIZE, settings.ORDER_FEED_PAGE_SIZE)
+
+    # updated_at is stamped by the app before commit, so a slow transaction can
+    # land with a timestamp older than rows already handed out. Holding back the
+    # last few seconds keeps the cursor from skipping over it.
+    settled = datetime.utcnow() - timedelta(seconds=settings.ORDER_FEED_SETTLE_SECONDS)
+
+    query = (
+        db.query(Order)
+        .options(
+            joinedload(Order.user),
+            selectinload(Order.order_items),
+        )
+        .filter(Order.updated_at <= settled)
+    )
+    if cursor:
+        after_ts, after_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            Order.updated_at > after_ts,
+            and_(Order.updated_at == after_ts, Order.id > after_id),
+        ))
+
+    orders = query.order_by(Order.updated_at, Order.id).limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+
+    if orders:
+        cursor = _encode_cursor(orders[-1].updated_at, orders[-1].id)
+    return {
+        "orders": [_format_order(order) for order in orders],
+        "cursor": cursor,
+        "has_more": has_more,
+    }
 
 
 def get_all_users(db: Session):
@@ -107,7 +200,21 @@ def update_order_status(db: Session, order_id: int, new_status: str):
         valid = [s.value for s in OrderStatus]
         raise HTTPException(status_code=400, detail=f"Invalid status. Valid values: {valid}")
 
-    order.current_status = status_enum
+    # Only written if the status is still the one read above, like the bulk
+    # update, so a concurrent change (e.g. a bulk cancel) can't be counted in
+    # the rollups twice
+    changed = db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.current_status == order.current_status)
+        .values(current_status=status_enum, updated_at=datetime.utcnow())
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if changed is None:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Order status was changed by another request, reload and try again")
+
+    record_status_change(db, order, order.current_status, status_enum)
     db.commit()
     db.refresh(order)
 
@@ -120,6 +227,7 @@ def update_order_status(db: Session, order_id: int, new_status: str):
         except Exception as e:
             logger.error(f"[ADMIN] Failed to dispatch status update email: {e}")
 
+    publish_order_event(order.id, order.user_id, "status", order.current_status.value, order.payment_status)
     logger.info(f"[ADMIN] Order #{order_id} status: {old_status} → {new_status}")
     return {
         "order_id": order.id,
@@ -128,6 +236,102 @@ def update_order_status(db: Session, order_id: int, new_status: str):
     }
 
 
+# Transitions accepted by the bulk endpoint. Delivered and Cancelled are final.
+ALLOWED_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PROCESSING, OrderStatus.CANCELLED},
+    OrderStatus.PROCESSING: {OrderStatus.SHIPPED, OrderStatus.CANCELLED},
+    OrderStatus.SHIPPED: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+
+def bulk_update_order_status(db: Session, order_ids: list[int], new_status: str):
+    try:
+        status_enum = OrderStatus(new_status)
+    except ValueError:
+        valid = [s.value for s in OrderStatus]
+        raise HTTPException(status_code=400, detail=f"Invalid status. Valid values: {valid}")
+
+    order_ids = list(dict.fromkeys(order_ids))
+    sources = [source for source, targets in ALLOWED_TRANSITIONS.items() if status_enum in targets]
+
+    # One conditional UPDATE: an order is only moved if its current status
+    # allows it at the moment the row is written, so concurrent changes can't
+    # slip an invalid transition through.
+    updated = []
+    if sources:
+        updated = db.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids), Order.current_status.in_(sources))
+            .values(current_status=status_enum, updated_at=datetime.utcnow())
+            .returning(Order.id, Order.user_id, Order.created_at, Order.total, Order.payment_status)
+            .execution_options(synchronize_session=False)
+        ).all()
+    updated_ids = [row.id for row in updated]
+    moved = set(updated_ids)
+
+    if status_enum == OrderStatus.CANCELLED and updated:
+        items: dict[int, list] = {}
+        for line in db.execute(
+            select(OrderItem.order_id, OrderItem.food_item_id, OrderItem.snapshot, OrderItem.quantity, OrderItem.subtotal)
+            .where(OrderItem.order_id.in_(updated_ids))
+        ):
+            items.setdefault(line.order_id, []).append((line.food_item_id, line.snapshot["food"][0], line.quantity, line.subtotal))
+        apply_order_deltas(db, [
+            {"created_at": row.created_at, "total": row.total, "cancelled": 1, "items": items.get(row.id, [])}
+            for row in updated if row.created_at
+        ])
+    db.commit()
+
+    rejected = []
+    remaining = [order_id for order_id in order_ids if order_id not in moved]
+    if remaining:
+        current = dict(db.execute(select(Order.id, Order.current_status).where(Order.id.in_(remaining))).all())
+        for order_id in remaining:
+            if order_id not in current:
+                rejected.append({"order_id": order_id, "status": None, "reason": "Order not found"})
+            else:
+                old = current[order_id].value
+                rejected.append({
+                    "order_id": order_id,
+                    "status": old,
+                    "reason": f"Cannot change status from {old} to {status_enum.value}",
+                })
+
+    if updated:
+        _queue_status_notifications(db, updated, status_enum.value)
+        publish_order_events([
+            (row.id, row.user_id, "status", status_enum.value, row.payment_status) for row in updated
+        ])
+
+    logger.info(f"[ADMIN] Bulk status → {status_enum.value}: updated={len(updated_ids)} rejected={len(rejected)}")
+    return {
+        "new_status": status_enum.value,
+        "updated": updated_ids,
+        "rejected": rejected,
+    }
+
+
+def _queue_status_notifications(db: Session, updated: list, new_status: str) -> None:
+    # One Celery task for the whole batch instead of one inline email per order
+    user_ids = {row.user_id for row in updated if row.user_id is not None}
+    if not user_ids:
+        return
+    emails = dict(db.query(User.id, User.email).filter(User.id.in_(user_ids), User.email.is_not(None)))
+    notifications = [
+        {"email": emails[row.user_id], "order_id": row.id, "new_status": new_status}
+        for row in updated if row.user_id in emails
+    ]
+    if not notifications:
+        return
+    try:
+        from workers.tasks import send_status_updates_task
+        send_status_updates_task.delay(notifications)
+    except Exception as e:
+        logger.error(f"[ADMIN] Failed to queue {len(notifications)} status update email(s): {e}")
+
+
 def _format_order(order: Order) -> dict:
     return {
         "order_id": order.id,
@@ -143,13 +347,12 @@ def _format_order(order: Order) -> dict:
         "instructions": order.special_instructions,
         "items": [
             {
-                "food": item.food_item.name,
-                "protein": item.protein.name if item.protein else None,
-                "extras": [e.name for e in item.extras],
+                **order_item_names(item),
                 "unit_price": item.unit_price,
                 "quantity": item.quantity,
                 "item_total": item.subtotal
             } for item in order.order_items
         ],
         "created_at": order.created_at,
+        "updated_at": order.updated_at,
     }
@@ -0,0 +1,309 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database.db import dialect_insert
+from database.models import ArchivedOrder, DailySales, HourlySales, ItemDailySales, Order, OrderItem
+from database.schemas import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("orders_placed", "orders_paid", "orders_cancelled", "placed_total", "paid_total", "cancelled_total")
+
+# (food_item_id, food_name, quantity, sales) for one order line
+RollupItem = tuple[int, str, int, float]
+
+
+def _increment(db: Session, model, keys: list[str], rows: list[dict], replace: tuple[str, ...] = ()) -> None:
+    # Adds each row's counters to the existing bucket, creating it if needed
+    table = model.__table__
+    stmt = dialect_insert(db)(table)
+    updates = {
+        column: table.c[column] + stmt.excluded[column]
+        for column in rows[0] if column not in keys and column not in replace
+    }
+    updates.update({column: stmt.excluded[column] for column in replace})
+    db.execute(stmt.on_conflict_do_update(index_elements=keys, set_=updates), rows)
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def apply_order_delta(
+    db: Session,
+    created_at: datetime,
+    total: float,
+    placed: int = 0,
+    paid: int = 0,
+    cancelled: int = 0,
+    items: Iterable[RollupItem] = (),
+) -> None:
+    # Call inside the transaction that changes the order, before it commits.
+    # Pass -1 to undo a change (e.g. an order moved out of Cancelled).
+    apply_order_deltas(db, [
+        {"created_at": created_at, "total": total, "placed": placed, "paid": paid, "cancelled": cancelled, "items": items},
+    ])
+
+
+def apply_order_deltas(db: Session, deltas: list[dict]) -> None:
+    # Several apply_order_delta() calls merged into one upsert per rollup table.
+    # Each bucket appears once per statement (an upsert may not touch a row
+    # twice) and rows are sorted, so concurrent transactions lock them in the
+    # same order.
+    daily: dict[date, dict] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    hourly: dict[datetime, dict] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    item_rows: dict[tuple[date, int], dict] = {}
+
+    for delta in deltas:
+        created_at, total = delta["created_at"], delta["total"]
+        placed, paid, cancelled = delta.get("placed", 0), delta.get("paid", 0), delta.get("cancelled", 0)
+        for bucket in (daily[created_at.date()], hourly[_hour(created_at)]):
+            bucket["orders_placed"] += placed
+            bucket["orders_paid"] += paid
+            bucket["orders_cancelled"] += cancelled
+            bucket["placed_total"] += placed * total
+            bucket["paid_total"] += paid * total
+            bucket["cancelled_total"] += cancelled * total
+
+        # The item rollup only counts orders that are not cancelled
+        sign = placed - cancelled
+        if not sign:
+            continue
+        day = created_at.date()
+        for food_item_id, food_name, quantity, sales in delta.get("items", ()):
+            row = item_rows.setdefault((day, food_item_id), {"day": day, "food_item_id": food_item_id, "food_name": food_name, "quantity": 0, "sales": 0.0})
+            row["quantity"] += sign * quantity
+            row["sales"] += sign * sales
+
+    if daily:
+        _increment(db, DailySales, ["day"], [{"day": day, **daily[day]} for day in sorted(daily)])
+        _increment(db, HourlySales, ["hour"], [{"hour": hour, **hourly[hour]} for hour in sorted(hourly)])
+    if item_rows:
+        _increment(
+            db, ItemDailySales, ["day", "food_item_id"],
+            [item_rows[key] for key in sorted(item_rows)],
+            replace=("food_name",),
+        )
+
+
+def rollup_items(order: Order) -> list[RollupItem]:
+    return [
+        (item.food_item_id, item.snapshot["food"][0], item.quantity, item.subtotal)
+        for item in order.order_items
+    ]
+
+
+def record_status_change(db: Session, order: Order, old_status: OrderStatus, new_status: OrderStatus) -> None:
+    if old_status == new_status:
+        return
+    if new_status == OrderStatus.CANCELLED:
+        apply_order_delta(db, order.created_at, order.total, cancelled=1, items=rollup_items(order))
+    elif old_status == OrderStatus.CANCELLED:
+        apply_order_delta(db, order.created_at, order.total, cancelled=-1, items=rollup_items(order))
+
+
+def _bucket_row(row) -> dict:
+    return {column: getattr(row, column) if row else 0 for column in COUNTERS}
+
+
+def get_sales_analytics(db: Session, days: int = 7, hours: int = 24, top: int = 10) -> dict:
+    # Reads only the rollup tables; buckets without orders are filled with zeros
+    now = datetime.utcnow()
+    today = now.date()
+    first_day = today - timedelta(days=days - 1)
+    first_hour = _hour(now) - timedelta(hours=hours - 1)
+
+    daily = {row.day: row for row in db.query(DailySales).filter(DailySales.day >= first_day)}
+    hourly = {row.hour: row for row in db.query(HourlySales).filter(HourlySales.hour >= first_hour)}
+
+    quantity = func.sum(ItemDailySales.quantity).label("quantity")
+    top_items = db.execute(
+        select(
+            ItemDailySales.food_item_id,
+            func.max(ItemDailySales.food_name).label("food_name"),
+            quantity,
+            func.sum(ItemDailySales.sales).label("sales"),
+        )
+        .where(ItemDailySales.day >= first_day)
+        .group_by(ItemDailySales.food_item_id)
+        .having(func.sum(ItemDailySales.quantity) > 0)
+        .order_by(quantity.desc())
+        .limit(top)
+    ).all()
+
+    day_buckets = [first_day + timedelta(days=n) for n in range(days)]
+    hour_buckets = [first_hour + timedelta(hours=n) for n in range(hours)]
+    return {
+        "today": {"day": today, **_bucket_row(daily.get(today))},
+        "daily": [{"day": day, **_bucket_row(daily.get(day))} for day in day_buckets],
+        "hourly": [{"hour": hour, **_bucket_row(hourly.get(hour))} for hour in hour_buckets],
+        "top_items": [
+            {"food_item_id": row.food_item_id, "food": row.food_name, "quantity": row.quantity, "sales": row.sales}
+            for row in top_items
+        ],
+    }
+
+
+def _hot_order_batches(db: Session, since_at: Optional[datetime], batch_size: int):
+    # Yields lists of (created_at, total, paid, cancelled, items) from the hot tables
+    last_id = 0
+    while True:
+        query = (
+            select(Order.id, Order.created_at, Order.total, Order.payment_status, Order.current_status)
+            .where(Order.id > last_id, Order.created_at.is_not(None))
+            .order_by(Order.id)
+            .limit(batch_size)
+        )
+        if since_at:
+            query = query.where(Order.created_at >= since_at)
+        orders = db.execute(query).all()
+        if not orders:
+            return
+        last_id = orders[-1].id
+
+        kept = {order.id: [] for order in orders if order.current_status != OrderStatus.CANCELLED}
+        if kept:
+            for line in db.execute(
+                select(OrderItem.order_id, OrderItem.food_item_id, OrderItem.snapshot, OrderItem.quantity, OrderItem.subtotal)
+                .where(OrderItem.order_id.in_(kept))
+            ):
+                kept[line.order_id].append((line.food_item_id, line.snapshot["food"][0], line.quantity, line.subtotal))
+
+        yield [
+            (order.created_at, order.total, order.payment_status == "paid", order.id not in kept, kept.get(order.id, []))
+            for order in orders
+        ]
+
+
+def _archived_order_batches(db: Session, since_at: Optional[datetime], batch_size: int):
+    # Same as _hot_order_batches for orders_archive. Filtering on created_at
+    # lets PostgreSQL skip the monthly partitions before `since`.
+    last_id = 0
+    while True:
+        query = (
+            select(
+                ArchivedOrder.id, ArchivedOrder.created_at, ArchivedOrder.total,
+                ArchivedOrder.payment_status, ArchivedOrder.current_status, ArchivedOrder.items,
+            )
+            .where(ArchivedOrder.id > last_id)
+            .order_by(ArchivedOrder.id)
+            .limit(batch_size)
+        )
+        if since_at:
+            query = query.where(ArchivedOrder.created_at >= since_at)
+        orders = db.execute(query).all()
+        if not orders:
+            return
+        last_id = orders[-1].id
+
+        batch = []
+        for order in orders:
+            cancelled = order.current_status == OrderStatus.CANCELLED.value
+            items = [] if cancelled else [
+                (item["food_item_id"], item["snapshot"]["food"][0], item["quantity"], item["subtotal"])
+                for item in order.items
+            ]
+            batch.append((order.created_at, order.total, order.payment_status == "paid", cancelled, items))
+        yield batch
+
+
+def _snapshot_rollups(db: Session, since: Optional[date], since_at: Optional[datetime]) -> tuple[dict, dict, dict]:
+    # The rollup rows a rebuild will correct, keyed like the rebuilt buckets
+    daily_query, hourly_query, items_query = db.query(DailySales), db.query(HourlySales), db.query(ItemDailySales)
+    if since:
+        daily_query = daily_query.filter(DailySales.day >= since)
+        hourly_query = hourly_query.filter(HourlySales.hour >= since_at)
+        items_query = items_query.filter(ItemDailySales.day >= since)
+    daily = {row.day: {"day": row.day, **_bucket_row(row)} for row in daily_query}
+    hourly = {row.hour: {"hour": row.hour, **_bucket_row(row)} for row in hourly_query}
+    items = {
+        (row.day, row.food_item_id): {
+            "day": row.day, "food_item_id": row.food_item_id, "food_name": row.food_name,
+            "quantity": row.quantity, "sales": row.sales,
+        }
+        for row in items_query
+    }
+    return daily, hourly, items
+
+
+def _corrections(rebuilt: dict, current: dict, counters: tuple[str, ...]) -> list[dict]:
+    # rebuilt - current for every bucket in either, skipping buckets that are
+    # already right. Sorted like apply_order_deltas() so row locks are taken in
+    # the same order.
+    rows = []
+    for key in sorted(rebuilt.keys() | current.keys()):
+        new, old = rebuilt.get(key, {}), current.get(key, {})
+        row = {column: new.get(column, 0) - old.get(column, 0) for column in counters}
+        if any(row.values()):
+            rows.append({**old, **new, **row})
+    return rows
+
+
+def _apply_corrections(db: Session, model, keys: list[str], rows: list[dict], batch_size: int, replace: tuple[str, ...] = ()) -> None:
+    for start in range(0, len(rows), batch_size):
+        _increment(db, model, keys, rows[start:start + batch_size], replace=replace)
+
+
+def rebuild_rollups(db: Session, since: Optional[date] = None, batch_size: int = 1000) -> int:
+    # Recomputes the rollups from the hot order tables and orders_archive,
+    # scanning orders in id batches. With `since`, only buckets from that day on
+    # are corrected. Pass a session that hasn't started a transaction yet.
+    # Returns the number of orders scanned.
+    #
+    # Nothing is locked, so checkouts and payments carry on during the scan.
+    # The current rollup rows and the orders are read in one REPEATABLE READ
+    # snapshot; as every delta is written in its order's own transaction, the
+    # two agree at that moment. Only the difference is then added to the live
+    # rows, with the same upserts live changes use, so deltas committed while
+    # the scan ran are kept. Archival can't make an order show up twice either,
+    # the snapshot sees it in exactly one of the two tables.
+    if db.get_bind().dialect.name == "postgresql":
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+    since_at = datetime.combine(since, datetime.min.time()) if since else None
+    current_daily, current_hourly, current_items = _snapshot_rollups(db, since, since_at)
+
+    daily: dict[date, dict] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    hourly: dict[datetime, dict] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    items: dict[tuple[date, int], dict] = {}
+
+    scanned = 0
+    for batches in (_hot_order_batches(db, since_at, batch_size), _archived_order_batches(db, since_at, batch_size)):
+        for batch in batches:
+            scanned += len(batch)
+            for created_at, total, paid, cancelled, lines in batch:
+                for bucket in (daily[created_at.date()], hourly[_hour(created_at)]):
+                    bucket["orders_placed"] += 1
+                    bucket["placed_total"] += total
+                    bucket["orders_paid"] += paid
+                    bucket["paid_total"] += total if paid else 0
+                    bucket["orders_cancelled"] += cancelled
+                    bucket["cancelled_total"] += total if cancelled else 0
+
+                day = created_at.date()
+                for food_item_id, food_name, quantity, sales in lines:
+                    row = items.setdefault((day, food_item_id), {"day": day, "food_item_id": food_item_id, "quantity": 0, "sales": 0.0})
+                    row["food_name"] = food_name
+                    row["quantity"] += quantity
+                    row["sales"] += sales
+    # End the snapshot; the corrections must add to the latest committed rows
+    db.rollback()
+
+    daily_rows = _corrections({day: {"day": day, **counters} for day, counters in daily.items()}, current_daily, COUNTERS)
+    hourly_rows = _corrections({hour: {"hour": hour, **counters} for hour, counters in hourly.items()}, current_hourly, COUNTERS)
+    item_rows = _corrections(items, current_items, ("quantity", "sales"))
+    _apply_corrections(db, DailySales, ["day"], daily_rows, batch_size)
+    _apply_corrections(db, HourlySales, ["hour"], hourly_rows, batch_size)
+    _apply_corrections(db, ItemDailySales, ["day", "food_item_id"], item_rows, batch_size, replace=("food_name",))
+    db.commit()
+
+    logger.info(
+        f"[ANALYTICS] Rebuilt rollups from {scanned} orders: corrected days={len(daily_rows)} "
+        f"hours={len(hourly_rows)} item_days={len(item_rows)}"
+    )
+    return scanned
@@ -0,0 +1,170 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.orm import Session, selectinload
+
+from config import settings
+from database.models import ArchivedOrder, ArchivedOrderKey, Order, OrderItem, Payment, order_item_extras
+from database.schemas import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+# Orders in these states never change again, so they can leave the hot tables
+ARCHIVABLE_STATUSES = (OrderStatus.DELIVERED, OrderStatus.CANCELLED)
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def ensure_archive_partitions(db: Session, created_at: list[datetime]) -> None:
+    # orders_archive is partitioned by month on PostgreSQL; create the monthly
+    # partitions the next insert needs. Other databases use a plain table.
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for month in sorted({_month_start(moment.date()) for moment in created_at}):
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS orders_archive_y{month:%Y}m{month:%m} "
+            f"PARTITION OF orders_archive FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        ))
+
+
+def _archive_row(order: Order, extras_ids: dict[int, list[int]], archived_at: datetime) -> dict:
+    return {
+        "id": order.id,
+        "created_at": order.created_at,
+        "user_id": order.user_id,
+        "delivery_address_id": order.delivery_address_id,
+        "subtotal": order.subtotal,
+        "delivery_fee": order.delivery_fee,
+        "service_fee": order.service_fee,
+        "tax": order.tax,
+        "total": order.total,
+        "special_instructions": order.special_instructions,
+        "payment_status": order.payment_status,
+        "current_status": order.current_status.value,
+        "updated_at": order.updated_at,
+        "archived_at": archived_at,
+        "items": [
+            {
+                "id": item.id,
+                "food_item_id": item.food_item_id,
+                "protein_id": item.protein_id,
+                "extras_ids": extras_ids.get(item.id, []),
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "subtotal": item.subtotal,
+                "instructions": item.instructions,
+                "snapshot": item.snapshot,
+            } for item in order.order_items
+        ],
+        "payments": [
+            {
+                "id": payment.id,
+                "reference": payment.reference,
+                "amount": payment.amount,
+                "amount_kobo": payment.amount_kobo,
+                "currency": payment.currency,
+                "status": payment.status.value if payment.status else None,
+                "gateway": payment.gateway,
+                "gateway_response": payment.gateway_response,
+                "channel": payment.channel,
+                "paid_at": _isoformat(payment.paid_at),
+                "created_at": _isoformat(payment.created_at),
+                "updated_at": _isoformat(payment.updated_at),
+            } for payment in order.payments
+        ],
+    }
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    # Moves up to batch_size finished orders last changed before cutoff into
+    # orders_archive, in one transaction. Returns the number of orders moved.
+    orders = (
+        db.query(Order)
+        .options(selectinload(Order.order_items), selectinload(Order.payments))
+        .filter(
+            Order.current_status.in_(ARCHIVABLE_STATUSES),
+            Order.updated_at < cutoff,
+            Order.created_at.is_not(None),
+        )
+        .order_by(Order.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True, of=Order)
+        .all()
+    )
+    if not orders:
+        return 0
+
+    order_ids = [order.id for order in orders]
+    item_ids = [item.id for order in orders for item in order.order_items]
+    extras_ids: dict[int, list[int]] = {}
+    if item_ids:
+        for order_item_id, extra_id in db.execute(
+            select(order_item_extras.c.order_item_id, order_item_extras.c.extra_id)
+            .where(order_item_extras.c.order_item_id.in_(item_ids))
+        ):
+            extras_ids.setdefault(order_item_id, []).append(extra_id)
+
+    archived_at = datetime.utcnow()
+    ensure_archive_partitions(db, [order.created_at for order in orders])
+    db.execute(insert(ArchivedOrder), [_archive_row(order, extras_ids, archived_at) for order in orders])
+    db.execute(insert(ArchivedOrderKey), [{"id": order.id, "created_at": order.created_at} for order in orders])
+
+    if item_ids:
+        db.execute(delete(order_item_extras).where(order_item_extras.c.order_item_id.in_(item_ids)))
+        db.execute(delete(OrderItem).where(OrderItem.id.in_(item_ids)))
+    db.execute(delete(Payment).where(Payment.order_id.in_(order_ids)))
+    db.execute(delete(Order).where(Order.id.in_(order_ids)))
+    db.commit()
+    db.expunge_all()
+    return len(orders)
+
+
+def archive_orders(db: Session, older_than_days: int = None, batch_size: int = None, max_batches: int = None) -> int:
+    # Bounded amount of work per call; the next scheduled run picks up the rest
+    older_than_days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    max_batches = max_batches or settings.ARCHIVE_MAX_BATCHES
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    moved = 0
+    for _ in range(max_batches):
+        count = archive_batch(db, cutoff, batch_size)
+        moved += count
+        if count < batch_size:
+            break
+
+    logger.info(f"[ARCHIVE] Moved {moved} order(s) finished before {cutoff:%Y-%m-%d} to cold storage")
+    return moved
+
+
+def get_archived_orders(db: Session, user_id: int = None, days: int = None, limit: int = None) -> list[ArchivedOrder]:
+    # Newest first, bounded by created_at (so only the matching partitions are
+    # read) and by row count; the archive itself keeps growing
+    days = settings.ARCHIVE_LIST_DAYS if days is None else days
+    limit = limit or settings.ARCHIVE_LIST_LIMIT
+    query = db.query(ArchivedOrder).filter(ArchivedOrder.created_at >= datetime.utcnow() - timedelta(days=days))
+    if user_id is not None:
+        query = query.filter(ArchivedOrder.user_id == user_id)
+    return query.order_by(ArchivedOrder.created_at.desc()).limit(limit).all()
+
+
+def get_archived_order(db: Session, order_id: int, user_id: int = None) -> Optional[ArchivedOrder]:
+    # created_at comes from orders_archive_keys in the same statement; PostgreSQL
+    # prunes to that one partition at execution time
+    created_at = select(ArchivedOrderKey.created_at).where(ArchivedOrderKey.id == order_id).scalar_subquery()
+    query = db.query(ArchivedOrder).filter(ArchivedOrder.id == order_id, ArchivedOrder.created_at == created_at)
+    if user_id is not None:
+        query = query.filter(ArchivedOrder.user_id == user_id)
+    return query.first()
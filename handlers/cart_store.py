@@ -0,0 +1,86 @@
+import json
+from typing import Optional
+
+from config import settings
+from handlers.user import redis_client
+
+# Hot cart storage used when CART_STORE=redis. Each cart is one hash:
+#   cart:{user_id}  ->  { "<item id>": <line JSON>, "__seq__": <last item id> }
+# Lines already carry the names and prices resolved when they were added, so
+# reading a cart never touches the database. The hash expires CART_TTL_SECONDS
+# after the last change; it is only written to relational rows at checkout.
+
+_SEQ_FIELD = "__seq__"
+
+
+def _key(user_id: int) -> str:
+    return f"cart:{user_id}"
+
+
+def uses_redis() -> bool:
+    return settings.CART_STORE == "redis"
+
+
+def get_lines(user_id: int) -> list[dict]:
+    raw = redis_client.hgetall(_key(user_id))
+    lines = [
+        {**json.loads(value), "cart_item_id": int(field)}
+        for field, value in raw.items()
+        if field != _SEQ_FIELD
+    ]
+    return sorted(lines, key=lambda line: line["cart_item_id"])
+
+
+def add_line(user_id: int, line: dict) -> int:
+    key = _key(user_id)
+    item_id = redis_client.hincrby(key, _SEQ_FIELD, 1)
+
+    pipe = redis_client.pipeline()
+    pipe.hset(key, str(item_id), json.dumps(line))
+    pipe.expire(key, settings.CART_TTL_SECONDS)
+    pipe.execute()
+    return item_id
+
+
+def remove_line(user_id: int, item_id: int) -> Optional[bool]:
+    # None: no cart at all, False: no such item, True: removed
+    key = _key(user_id)
+    pipe = redis_client.pipeline()
+    pipe.exists(key)
+    pipe.hdel(key, str(item_id))
+    pipe.expire(key, settings.CART_TTL_SECONDS)
+    exists, removed, _ = pipe.execute()
+    if not exists:
+        return None
+    return bool(removed)
+
+
+def clear(user_id: int) -> bool:
+    return bool(redis_client.delete(_key(user_id)))
+
+
+def remove_lines(user_id: int, item_ids: list[int]) -> int:
+    # Drops only the given lines, so anything added since they were read (from
+    # another tab or device) stays in the cart. __seq__ is kept so item ids are
+    # never reused.
+    if not item_ids:
+        return 0
+    return redis_client.hdel(_key(user_id), *(str(item_id) for item_id in item_ids))
+
+
+def apply_changes(user_id: int, updated: dict[int, dict], removed: set[int], added: list[dict]) -> None:
+    # Apply a batch of cart mutations in one MULTI/EXEC
+    key = _key(user_id)
+    records = {str(item_id): json.dumps(line) for item_id, line in updated.items()}
+    if added:
+        last_id = redis_client.hincrby(key, _SEQ_FIELD, len(added))
+        first_id = last_id - len(added) + 1
+        records.update({str(first_id + n): json.dumps(line) for n, line in enumerate(added)})
+
+    pipe = redis_client.pipeline(transaction=True)
+    if removed:
+        pipe.hdel(key, *(str(item_id) for item_id in removed))
+    if records:
+        pipe.hset(key, mapping=records)
+    pipe.expire(key, settings.CART_TTL_SECONDS)
+    pipe.execute()
@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import redis
+from fastapi import HTTPException
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database.db import SessionLocal
+from database.models import Extra, FoodItem, Protein, food_proteins
+from handlers.user import redis_client
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Bumped by every admin change to foods, proteins or extras. Each process keeps
+# its own PriceCatalog and rebuilds it when the version it was built from is stale.
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def item_snapshot(food: list, protein: list = None, extras: list = None) -> dict:
+    # Stored on cart_items.snapshot and order_items.snapshot; each entry is [name, price]
+    return {"food": food, "protein": protein, "extras": extras or []}
+
+
+@dataclass(frozen=True)
+class CatalogLine:
+    food_id: int
+    food: str
+    protein_id: Optional[int]
+    protein: Optional[str]
+    extras_ids: list[int]
+    extras: list[str]
+    unit_price: float
+    snapshot: dict          # item_snapshot() of the component names and prices
+
+
+@dataclass(frozen=True)
+class PriceCatalog:
+    version: Optional[str]
+    checked_at: float
+    foods: dict[int, tuple[str, float]]        # available food items: id -> (name, price)
+    proteins: dict[int, tuple[str, float]]     # available proteins
+    extras: dict[int, tuple[str, float]]
+    food_proteins: dict[int, frozenset[int]]   # food id -> proteins it can be served with
+
+    def price_line(self, food_id: int, protein_id: int = None, extras_ids: list[int] = None) -> CatalogLine:
+        # Same validation (and error messages) add_to_cart used to do with queries
+        food = self.foods.get(food_id)
+        if not food:
+            raise HTTPException(status_code=404, detail="Food item not found or unavailable")
+
+        protein = None
+        if protein_id:
+            protein = self.proteins.get(protein_id)
+            if not protein:
+                raise HTTPException(status_code=404, detail="Protein not found or unavailable")
+            # Foods without any linked protein accept every available protein
+            allowed = self.food_proteins.get(food_id)
+            if allowed and protein_id not in allowed:
+                raise HTTPException(status_code=400, detail="Protein is not offered with this food item")
+
+        extras_ids = extras_ids or []
+        found = [extra_id for extra_id in dict.fromkeys(extras_ids) if extra_id in self.extras]
+        if len(found) != len(extras_ids):
+            raise HTTPException(status_code=404, detail="One or more extras not found")
+
+        extras = [self.extras[extra_id] for extra_id in found]
+        unit_price = food[1] + (protein[1] if protein else 0) + sum(price for _, price in extras)
+
+        return CatalogLine(
+            food_id=food_id,
+            food=food[0],
+            protein_id=protein_id if protein else None,
+            protein=protein[0] if protein else None,
+            extras_ids=found,
+            extras=[name for name, _ in extras],
+            unit_price=unit_price,
+            snapshot=item_snapshot(list(food), list(protein) if protein else None, [list(extra) for extra in extras]),
+        )
+
+
+@dataclass(frozen=True)
+class EncodedMenu:
+    version: str
+    checked_at: float
+    body: bytes
+
+
+_catalog: Optional[PriceCatalog] = None
+_menu: Optional[EncodedMenu] = None
+_rebuild_lock = threading.Lock()
+
+
+def _current_version() -> Optional[str]:
+    try:
+        return redis_client.get(CATALOG_VERSION_KEY) or "0"
+    except redis.RedisError as e:
+        logger.warning(f"[CATALOG] Could not read catalog version: {e}")
+        return None
+
+
+def bump_catalog_version() -> None:
+    # Call after committing any change to foods, proteins, extras or their links
+    global _catalog, _menu
+    _catalog = None
+    _menu = None
+    try:
+        redis_client.incr(CATALOG_VERSION_KEY)
+    except redis.RedisError as e:
+        logger.error(f"[CATALOG] Could not bump catalog version: {e}")
+
+
+def build_catalog(db: Session, version: Optional[str]) -> PriceCatalog:
+    foods = {
+        row.id: (row.name, row.price)
+        for row in db.execute(select(FoodItem.id, FoodItem.name, FoodItem.price).where(FoodItem.available == True))  # noqa: E712
+    }
+    proteins = {
+        row.id: (row.name, row.price)
+        for row in db.execute(select(Protein.id, Protein.name, Protein.price).where(Protein.is_available == True))  # noqa: E712
+    }
+    extras = {row.id: (row.name, row.price) for row in db.execute(select(Extra.id, Extra.name, Extra.price))}
+
+    links: dict[int, set[int]] = {}
+    for food_id, protein_id in db.execute(select(food_proteins.c.food_id, food_proteins.c.protein_id)):
+        links.setdefault(food_id, set()).add(protein_id)
+
+    logger.info(f"[CATALOG] Built price catalog version={version} foods={len(foods)} proteins={len(proteins)} extras={len(extras)}")
+    return PriceCatalog(
+        version=version,
+        checked_at=time.monotonic(),
+        foods=foods,
+        proteins=proteins,
+        extras=extras,
+        food_proteins={food_id: frozenset(ids) for food_id, ids in links.items()},
+    )
+
+
+def get_catalog(db: Session) -> PriceCatalog:
+    global _catalog
+    catalog = _catalog
+    if catalog and time.monotonic() - catalog.checked_at < settings.CATALOG_VERSION_CHECK_SECONDS:
+        return catalog
+
+    version = _current_version()
+    if catalog and version is not None and catalog.version == version:
+        # Still current: restart the check interval without rebuilding
+        _catalog = replace(catalog, checked_at=time.monotonic())
+        return _catalog
+
+    with _rebuild_lock:
+        if _catalog is not catalog and _catalog is not None:
+            return _catalog
+        _catalog = build_catalog(db, version)
+        return _catalog
+
+
+def _encode_menu(db: Session) -> bytes:
+    columns = [attr.key for attr in inspect(FoodItem).column_attrs]
+    foods = db.query(FoodItem).filter_by(available=True).all()
+    return dumps([{key: getattr(food, key) for key in columns} for food in foods])
+
+
+def get_menu_body(db: Session) -> bytes:
+    # The GET /foods body, encoded once per catalog version and re-checked on
+    # the same interval as the price catalog. Same fields as the ORM objects
+    # the endpoint used to return.
+    global _menu
+    menu = _menu
+    if menu and time.monotonic() - menu.checked_at < settings.CATALOG_VERSION_CHECK_SECONDS:
+        return menu.body
+
+    version = _current_version()
+    if menu and version is not None and menu.version == version:
+        _menu = replace(menu, checked_at=time.monotonic())
+        return menu.body
+
+    if version is None or not db.info.get("replica"):
+        body = _encode_menu(db)
+    else:
+        # The body is kept until the version changes again, so it is read from
+        # the primary: a lagging replica could still have the previous menu
+        primary = SessionLocal()
+        try:
+            body = _encode_menu(primary)
+        finally:
+            primary.close()
+    if version is not None:
+        _menu = EncodedMenu(version=version, checked_at=time.monotonic(), body=body)
+    return body
@@ -1,15 +1,63 @@
 import logging
-from sqlalchemy.orm import Session
-from database.models import Extra, FoodItem, Cart, CartItem, OrderItem, Protein, Order, User
+from datetime import datetime
+
+import redis
+from sqlalchemy import DateTime, Float, Integer, String, Text, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+from database.models import (
+    ArchivedOrder, Extra, Cart, CartItem, OrderItem, Protein, Order, User,
+    cart_item_extras, order_item_extras,
+)
 from fastapi import HTTPException
 from database.schemas import OrderStatus
 from config import settings
+from handlers import cart_store
+from handlers.analytics import apply_order_delta
+from handlers.archive import get_archived_order, get_archived_orders
+from handlers.catalog import CatalogLine, get_catalog, item_snapshot
+from utils.events import publish_order_event
 
 logger = logging.getLogger(__name__)
 
 
-def fetch_food_items(db: Session):
-    return db.query(FoodItem).filter_by(available=True).all()
+def _get_or_create_cart_id(db: Session, user_id: int) -> int:
+    cart_id = db.query(Cart.id).filter_by(user_id=user_id, is_active=True).scalar()
+    if cart_id:
+        return cart_id
+
+    cart = Cart(user_id=user_id)
+    db.add(cart)
+    db.flush()
+    return cart.id
+
+
+def _cart_line(line: CatalogLine, quantity: int, instructions: str = None) -> dict:
+    # Everything needed to show a cart line and to write it to cart_items later
+    return {
+        "food_item_id": line.food_id,
+        "food": line.food,
+        "protein_id": line.protein_id,
+        "protein": line.protein,
+        "extras_ids": line.extras_ids,
+        "extras": line.extras,
+        "quantity": quantity,
+        "unit_price": line.unit_price,
+        "subtotal": line.unit_price * quantity,
+        "instructions": instructions,
+        "snapshot": line.snapshot,
+    }
+
+
+def _line_snapshot(line: dict) -> dict:
+    # Redis cart lines stored before lines carried a snapshot only know their
+    # total unit price, so all of it is recorded against the food
+    if "snapshot" in line:
+        return line["snapshot"]
+    return item_snapshot(
+        [line["food"], line["unit_price"]],
+        [line["protein"], 0] if line["protein"] else None,
+        [[name, 0] for name in line["extras"]],
+    )
 
 
 def add_to_cart(
@@ -21,57 +69,53 @@ def add_to_cart(
     extras_ids: list[int] = None,
     instructions: str = None
 ):
-    cart = db.query(Cart).filter_by(user_id=user_id, is_active=True).first()
-
-    if not cart:
-        cart = Cart(user_id=user_id)
-        db.add(cart)
-        db.commit()
-        db.refresh(cart)
-
-    food = db.query(FoodItem).filter_by(id=food_id, available=True).first()
-    if not food:
-        raise HTTPException(status_code=404, detail="Food item not found or unavailable")
-
-    base_price = food.price
-    protein_price = 0
-    protein = None
-
-    if protein_id:
-        protein = db.query(Protein).filter_by(id=protein_id, is_available=True).first()
-        if not protein:
-            raise HTTPException(status_code=404, detail="Protein not found or unavailable")
-        protein_price = protein.price
-
-    extras_price = 0
-    extras_objects = []
-
-    if extras_ids:
-        extras_objects = db.query(Extra).filter(Extra.id.in_(extras_ids)).all()
-        if len(extras_objects) != len(extras_ids):
-            raise HTTPException(status_code=404, detail="One or more extras not found")
-        extras_price = sum(extra.price for extra in extras_objects)
-
-    unit_price = base_price + protein_price + extras_price
-    subtotal = unit_price * quantity
+    # Prices and availability come from the in-memory catalog, so the only
+    # database work left is the cart write itself.
+    line = get_catalog(db).price_line(food_id, protein_id, extras_ids)
+    subtotal = line.unit_price * quantity
+
+    if cart_store.uses_redis():
+        cart_item_id = cart_store.add_line(user_id, _cart_line(line, quantity, instructions))
+        return {
+            "cart_item_id": cart_item_id,
+            "food": line.food,
+            "protein": line.protein,
+            "extras": line.extras,
+            "quantity": quantity,
+            "unit_price": line.unit_price,
+            "subtotal": subtotal,
+        }
 
     cart_item = CartItem(
-        cart_id=cart.id,
-        food_item_id=food.id,
-        protein_id=protein.id if protein else None,
+        cart_id=_get_or_create_cart_id(db, user_id),
+        food_item_id=line.food_id,
+        protein_id=line.protein_id,
         quantity=quantity,
-        unit_price=unit_price,
+        unit_price=line.unit_price,
         subtotal=subtotal,
-        instructions=instructions
+        instructions=instructions,
+        snapshot=line.snapshot,
     )
-
-    cart_item.extras = extras_objects
-
     db.add(cart_item)
+    db.flush()
+    cart_item_id = cart_item.id
+
+    if line.extras_ids:
+        db.execute(
+            insert(cart_item_extras),
+            [{"cart_item_id": cart_item_id, "extra_id": extra_id} for extra_id in line.extras_ids],
+        )
     db.commit()
-    db.refresh(cart_item)
 
-    return cart_item
+    return {
+        "cart_item_id": cart_item_id,
+        "food": line.food,
+        "protein": line.protein,
+        "extras": line.extras,
+        "quantity": quantity,
+        "unit_price": line.unit_price,
+        "subtotal": subtotal,
+    }
 
 
 def fetch_proteins(db: Session):
@@ -82,15 +126,50 @@ def fetch_extras(db: Session):
     return db.query(Extra).all()
 
 
-def get_cart(db: Session, user_id: int):
-    cart = db.query(Cart).filter_by(user_id=user_id, is_active=True).first()
-    if not cart or not cart.cart_items:
+def _cart_summary(items: list[dict]) -> dict:
+    if not items:
         return {"items": [], "total_items": 0, "subtotal": 0}
 
-    items = []
-    subtotal = 0
-    for item in cart.cart_items:
-        item_data = {
+    subtotal = sum(item["subtotal"] for item in items)
+    return {
+        "items": items,
+        "total_items": len(items),
+        "subtotal": subtotal,
+        "delivery_fee": settings.DELIVERY_FEE_NGN,
+        "estimated_total": subtotal + settings.DELIVERY_FEE_NGN,
+    }
+
+
+def get_cart(db: Session, user_id: int):
+    if cart_store.uses_redis():
+        return _cart_summary([
+            {
+                "cart_item_id": line["cart_item_id"],
+                "food": line["food"],
+                "protein": line["protein"],
+                "extras": line["extras"],
+                "quantity": line["quantity"],
+                "unit_price": line["unit_price"],
+                "subtotal": line["subtotal"],
+                "instructions": line["instructions"],
+            } for line in cart_store.get_lines(user_id)
+        ])
+
+    cart = (
+        db.query(Cart)
+        .options(
+            selectinload(Cart.cart_items).joinedload(CartItem.food_item),
+            selectinload(Cart.cart_items).joinedload(CartItem.protein),
+            selectinload(Cart.cart_items).selectinload(CartItem.extras),
+        )
+        .filter_by(user_id=user_id, is_active=True)
+        .first()
+    )
+    if not cart:
+        return _cart_summary([])
+
+    return _cart_summary([
+        {
             "cart_item_id": item.id,
             "food": item.food_item.name,
             "protein": item.protein.name if item.protein else None,
@@ -99,20 +178,17 @@ def get_cart(db: Session, user_id: int):
             "unit_price": item.unit_price,
             "subtotal": item.subtotal,
             "instructions": item.instructions,
-        }
-        items.append(item_data)
-        subtotal += item.subtotal
-
-    return {
-        "items": items,
-        "total_items": len(items),
-        "subtotal": subtotal,
-        "delivery_fee": settings.DELIVERY_FEE_NGN,
-        "estimated_total": subtotal + settings.DELIVERY_FEE_NGN,
-    }
+        } for item in cart.cart_items
+    ])
 
 
 def clear_cart(db: Session, user_id: int):
+    if cart_store.uses_redis():
+        if not cart_store.get_lines(user_id):
+            return {"message": "Cart is already empty"}
+        cart_store.clear(user_id)
+        return {"message": "Cart cleared successfully"}
+
     cart = db.query(Cart).filter_by(user_id=user_id).first()
 
     if not cart or not cart.cart_items:
@@ -124,6 +200,14 @@ def clear_cart(db: Session, user_id: int):
 
 
 def remove_cart_item(db: Session, user_id: int, cart_item_id: int):
+    if cart_store.uses_redis():
+        removed = cart_store.remove_line(user_id, cart_item_id)
+        if removed is None:
+            raise HTTPException(status_code=404, detail="Cart not found")
+        if not removed:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+        return {"message": "Item removed from cart"}
+
     cart = db.query(Cart).filter_by(user_id=user_id, is_active=True).first()
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
@@ -137,53 +221,220 @@ def remove_cart_item(db: Session, user_id: int, cart_item_id: int):
     return {"message": "Item removed from cart"}
 
 
+def _insert_cart_lines(db: Session, cart_id: int, lines: list[dict]) -> None:
+    item_ids = db.execute(
+        insert(CartItem).returning(CartItem.id, sort_by_parameter_order=True),
+        [
+            {
+                "cart_id": cart_id,
+                "food_item_id": line["food_item_id"],
+                "protein_id": line["protein_id"],
+                "quantity": line["quantity"],
+                "unit_price": line["unit_price"],
+                "subtotal": line["subtotal"],
+                "instructions": line["instructions"],
+                "snapshot": _line_snapshot(line),
+            } for line in lines
+        ],
+    ).scalars().all()
+
+    links = [
+        {"cart_item_id": item_id, "extra_id": extra_id}
+        for item_id, line in zip(item_ids, lines)
+        for extra_id in line["extras_ids"]
+    ]
+    if links:
+        db.execute(insert(cart_item_extras), links)
+
+
+def apply_cart_operations(db: Session, user_id: int, operations: list) -> dict:
+    # Validate every operation against one catalog snapshot first, so a bad
+    # operation rejects the whole batch, then apply them in one write.
+    catalog = get_catalog(db)
+    added = [
+        _cart_line(
+            catalog.price_line(op.food_item_id, op.protein_id, op.extras_id),
+            op.quantity,
+            op.instructions,
+        )
+        for op in operations if op.op == "add"
+    ]
+
+    if cart_store.uses_redis():
+        current = {line.pop("cart_item_id"): line for line in cart_store.get_lines(user_id)}
+    else:
+        cart_id = _get_or_create_cart_id(db, user_id)
+        current = {
+            row.id: {"unit_price": row.unit_price, "quantity": row.quantity}
+            for row in db.query(CartItem.id, CartItem.unit_price, CartItem.quantity).filter_by(cart_id=cart_id)
+        }
+
+    quantities: dict[int, int] = {}
+    removed: set[int] = set()
+    for op in operations:
+        if op.op == "add":
+            continue
+        if op.cart_item_id not in current or op.cart_item_id in removed:
+            raise HTTPException(status_code=404, detail=f"Cart item {op.cart_item_id} not found")
+        if op.op == "remove":
+            removed.add(op.cart_item_id)
+            quantities.pop(op.cart_item_id, None)
+        else:
+            quantities[op.cart_item_id] = op.quantity
+
+    updated = {
+        item_id: {**current[item_id], "quantity": quantity, "subtotal": current[item_id]["unit_price"] * quantity}
+        for item_id, quantity in quantities.items()
+    }
+
+    if cart_store.uses_redis():
+        cart_store.apply_changes(user_id, updated, removed, added)
+        return get_cart(db, user_id)
+
+    if removed:
+        db.execute(delete(cart_item_extras).where(cart_item_extras.c.cart_item_id.in_(removed)))
+        db.execute(delete(CartItem).where(CartItem.id.in_(removed)))
+    if updated:
+        db.execute(
+            update(CartItem),
+            [{"id": item_id, "quantity": line["quantity"], "subtotal": line["subtotal"]} for item_id, line in updated.items()],
+        )
+    if added:
+        _insert_cart_lines(db, cart_id, added)
+    db.commit()
+
+    logger.info(f"[CART] Applied {len(operations)} operation(s) for user={user_id}")
+    return get_cart(db, user_id)
+
+
+def _materialize_redis_cart(db: Session, user_id: int, lines: list[dict]) -> int:
+    # Write a Redis cart into cart_items / cart_item_extras inside the caller's
+    # transaction so checkout can copy it with the same set-based statements.
+    cart_id = _get_or_create_cart_id(db, user_id)
+    stale_item_ids = select(CartItem.id).where(CartItem.cart_id == cart_id)
+    db.execute(delete(cart_item_extras).where(cart_item_extras.c.cart_item_id.in_(stale_item_ids)))
+    db.execute(delete(CartItem).where(CartItem.cart_id == cart_id))
+    _insert_cart_lines(db, cart_id, lines)
+    return cart_id
+
+
 def place_order(db: Session, user: User, instructions: str = None, delivery_address_id: int = None):
-    cart = db.query(Cart).filter_by(user_id=user.id, is_active=True).first()
-    if not cart or not cart.cart_items:
+    redis_lines = None
+    if cart_store.uses_redis():
+        redis_lines = cart_store.get_lines(user.id)
+        if not redis_lines:
+            raise HTTPException(status_code=400, detail="Cart is empty")
+        cart_id = _materialize_redis_cart(db, user.id, redis_lines)
+    else:
+        cart_id = db.query(Cart.id).filter_by(user_id=user.id, is_active=True).scalar()
+    if not cart_id:
         raise HTTPException(status_code=400, detail="Cart is empty")
 
-    subtotal = sum(item.unit_price * item.quantity for item in cart.cart_items)
+    # Everything below runs in a single transaction with set-based statements:
+    # the order row (totals aggregated from the cart in the same INSERT ... SELECT),
+    # its items, the extras links, and the cart cleanup.
+    now = datetime.utcnow()
     delivery_fee = settings.DELIVERY_FEE_NGN
+    subtotal = func.sum(CartItem.unit_price * CartItem.quantity)
     service_fee = subtotal * settings.SERVICE_FEE_PERCENT
     tax = subtotal * settings.TAX_PERCENT
-    total = subtotal + delivery_fee + service_fee + tax
 
-    order = Order(
-        user_id=user.id,
-        subtotal=subtotal,
-        current_status=OrderStatus.PENDING,
-        delivery_fee=delivery_fee,
-        service_fee=service_fee,
-        tax=tax,
-        total=total,
-        special_instructions=instructions,
-        delivery_address_id=delivery_address_id,
-        payment_status="unpaid",
+    order_columns = [
+        "user_id", "delivery_address_id", "subtotal", "delivery_fee", "service_fee", "tax", "total",
+        "special_instructions", "payment_status", "current_status", "created_at", "updated_at",
+    ]
+    order_rows = (
+        select(
+            literal(user.id, Integer),
+            literal(delivery_address_id, Integer),
+            subtotal,
+            literal(delivery_fee, Float),
+            service_fee,
+            tax,
+            subtotal + delivery_fee + service_fee + tax,
+            literal(instructions, Text),
+            literal("unpaid", String),
+            literal(OrderStatus.PENDING, Order.__table__.c.current_status.type),
+            literal(now, DateTime),
+            literal(now, DateTime),
+        )
+        .where(CartItem.cart_id == cart_id)
+        .having(func.count(CartItem.id) > 0)
     )
-    db.add(order)
-    db.commit()
-    db.refresh(order)
-
-    # Convert cart items → order items
-    for item in cart.cart_items:
-        order_item = OrderItem(
-            order_id=order.id,
-            food_item_id=item.food_item_id,
-            protein_id=item.protein_id,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            subtotal=item.subtotal,
-            instructions=item.instructions
+    created = db.execute(
+        insert(Order).from_select(order_columns, order_rows).returning(Order.id, Order.total)
+    ).first()
+    if created is None:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    order_id = created.id
+
+    # Items are copied from the cart, snapshot included, so a receipt shows the
+    # prices each line was charged at. They are inserted in cart_item id order,
+    # so within this single statement the generated order_item ids follow the
+    # same order. That lets the extras links be copied by matching each side's
+    # row position.
+    db.execute(
+        insert(OrderItem).from_select(
+            ["order_id", "food_item_id", "protein_id", "quantity", "unit_price", "subtotal", "instructions", "snapshot"],
+            select(
+                literal(order_id, Integer),
+                CartItem.food_item_id,
+                CartItem.protein_id,
+                CartItem.quantity,
+                CartItem.unit_price,
+                CartItem.subtotal,
+                CartItem.instructions,
+                CartItem.snapshot,
+            )
+            .where(CartItem.cart_id == cart_id)
+            .order_by(CartItem.id),
         )
-        order_item.extras = list(item.extras)
-        db.add(order_item)
+    )
 
-    db.commit()
+    cart_positions = (
+        select(CartItem.id.label("item_id"), func.row_number().over(order_by=CartItem.id).label("position"))
+        .where(CartItem.cart_id == cart_id)
+        .subquery()
+    )
+    order_positions = (
+        select(OrderItem.id.label("item_id"), func.row_number().over(order_by=OrderItem.id).label("position"))
+        .where(OrderItem.order_id == order_id)
+        .subquery()
+    )
+    db.execute(
+        insert(order_item_extras).from_select(
+            ["order_item_id", "extra_id"],
+            select(order_positions.c.item_id, cart_item_extras.c.extra_id)
+            .select_from(cart_item_extras)
+            .join(cart_positions, cart_positions.c.item_id == cart_item_extras.c.cart_item_id)
+            .join(order_positions, order_positions.c.position == cart_positions.c.position),
+        )
+    )
+
+    items = db.execute(
+        select(OrderItem.food_item_id, OrderItem.snapshot, OrderItem.quantity, OrderItem.subtotal)
+        .where(OrderItem.order_id == order_id)
+    ).all()
+    apply_order_delta(
+        db, now, created.total, placed=1,
+        items=[(item.food_item_id, item.snapshot["food"][0], item.quantity, item.subtotal) for item in items],
+    )
 
     # Clear the cart
-    db.query(CartItem).filter_by(cart_id=cart.id).delete(synchronize_session=False)
+    cart_item_ids = select(CartItem.id).where(CartItem.cart_id == cart_id)
+    db.execute(delete(cart_item_extras).where(cart_item_extras.c.cart_item_id.in_(cart_item_ids)))
+    db.execute(delete(CartItem).where(CartItem.cart_id == cart_id))
     db.commit()
-    db.refresh(order)
+
+    if redis_lines is not None:
+        # The order is committed at this point; a Redis failure only leaves the
+        # checked-out lines in the cart, it must not fail the request
+        try:
+            cart_store.remove_lines(user.id, [line["cart_item_id"] for line in redis_lines])
+        except redis.RedisError as e:
+            logger.warning(f"[CART] Could not clear checked-out lines for user={user.id} after order #{order_id}: {e}")
+
+    order = db.query(Order).options(selectinload(Order.order_items)).filter_by(id=order_id).one()
 
     # Build order summary for email
     order_data = {
@@ -191,9 +442,7 @@ def place_order(db: Session, user: User, instructions: str = None, delivery_addr
         "status": order.current_status.value,
         "items": [
             {
-                "food": item.food_item.name,
-                "protein": item.protein.name if item.protein else None,
-                "extras": [e.name for e in item.extras],
+                **order_item_names(item),
                 "quantity": item.quantity,
                 "item_total": item.subtotal,
             } for item in order.order_items
@@ -214,21 +463,63 @@ def place_order(db: Session, user: User, instructions: str = None, delivery_addr
         except Exception as e:
             logger.error(f"[ORDER] Failed to dispatch order confirmation email: {e}")
 
-    logger.info(f"[ORDER] Order #{order.id} placed by user={user.id} total=₦{total:.2f}")
+    publish_order_event(order.id, user.id, "created", order.current_status.value, order.payment_status)
+    logger.info(f"[ORDER] Order #{order.id} placed by user={user.id} total=₦{order.total:.2f}")
     return order
 
 
+def order_item_names(item: OrderItem) -> dict:
+    return snapshot_names(item.snapshot)
+
+
+def snapshot_names(snapshot: dict) -> dict:
+    return {
+        "food": snapshot["food"][0],
+        "protein": snapshot["protein"][0] if snapshot["protein"] else None,
+        "extras": [name for name, _ in snapshot["extras"]],
+    }
+
+
 def get_user_orders(db: Session, user_id: int):
     #Fetch all orders for a user (newest first)
-    orders = db.query(Order).filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
-    return [_format_order(order) for order in orders]
+    orders = (
+        db.query(Order)
+        .options(selectinload(Order.order_items))
+        .filter_by(user_id=user_id)
+        .order_by(Order.created_at.desc())
+        .all()
+    )
+    formatted = [_format_order(order) for order in orders]
+    formatted += [format_archived_order(order) for order in get_archived_orders(db, user_id=user_id)]
+    return sorted(formatted, key=lambda order: order["created_at"] or datetime.min, reverse=True)
 
 
 def get_order_by_id(db: Session, user_id: int, order_id: int):
-    order = db.query(Order).filter_by(id=order_id, user_id=user_id).first()
-    if not order:
+    order = db.query(Order).options(selectinload(Order.order_items)).filter_by(id=order_id, user_id=user_id).first()
+    if order:
+        return _format_order(order)
+
+    archived = get_archived_order(db, order_id, user_id=user_id)
+    if not archived:
         raise HTTPException(status_code=404, detail="Order not found")
-    return _format_order(order)
+    return format_archived_order(archived)
+
+
+def get_order_status(db: Session, user_id: int, order_id: int) -> dict:
+    row = db.query(Order.current_status, Order.payment_status).filter_by(id=order_id, user_id=user_id).first()
+    if row:
+        status, payment_status = row.current_status.value, row.payment_status
+    else:
+        archived = get_archived_order(db, order_id, user_id=user_id)
+        if not archived:
+            raise HTTPException(status_code=404, detail="Order not found")
+        status, payment_status = archived.current_status, archived.payment_status
+    return {
+        "event": "snapshot",
+        "order_id": order_id,
+        "status": status,
+        "payment_status": payment_status,
+    }
 
 
 def _format_order(order: Order) -> dict:
@@ -244,9 +535,7 @@ def _format_order(order: Order) -> dict:
         "instructions": order.special_instructions,
         "items": [
             {
-                "food": item.food_item.name,
-                "protein": item.protein.name if item.protein else None,
-                "extras": [e.name for e in item.extras],
+                **order_item_names(item),
                 "unit_price": item.unit_price,
                 "quantity": item.quantity,
                 "item_total": item.subtotal
@@ -254,3 +543,27 @@ def _format_order(order: Order) -> dict:
         ],
         "created_at": order.created_at,
     }
+
+
+def format_archived_order(order: ArchivedOrder) -> dict:
+    # Same shape as _format_order, built from an orders_archive row
+    return {
+        "order_id": order.id,
+        "status": order.current_status,
+        "payment_status": order.payment_status,
+        "subtotal": order.subtotal,
+        "delivery_fee": order.delivery_fee,
+        "service_fee": order.service_fee,
+        "tax": order.tax,
+        "total": order.total,
+        "instructions": order.special_instructions,
+        "items": [
+            {
+                **snapshot_names(item["snapshot"]),
+                "unit_price": item["unit_price"],
+                "quantity": item["quantity"],
+                "item_total": item["subtotal"]
+            } for item in order.items
+        ],
+        "created_at": order.created_at,
+    }
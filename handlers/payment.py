@@ -1,26 +1,33 @@
+import asyncio
 import hashlib
 import hmac
 import json
 import logging
+import time
 from datetime import datetime
 from typing import Optional
 
-import httpx
+import redis
+
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from redis.exceptions import LockError
+from redis.lock import Lock
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 from config import settings
 from database.models import Order, Payment, User
 from database.schemas import PaymentStatus
+from handlers.analytics import apply_order_delta
+from handlers.paystack import PaystackUnavailable, get_async_paystack_client
+from handlers.user import redis_client
+from utils.events import publish_order_event
 
 logger = logging.getLogger(__name__)
 
+VERIFY_POLL_SECONDS = 0.05
 
-def _paystack_headers() -> dict:
-    return {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json",
-    }
 
 def _naira_to_kobo(amount_ngn: float) -> int:
     return int(amount_ngn * 100)
@@ -29,9 +36,9 @@ def _kobo_to_naira(amount_kobo: int) -> float:
     return amount_kobo / 100
 
 
-def initiate_payment(db: Session, order_id: int, user: User) -> dict:
-    #Create a Paystack transaction for a given order.
-    #Returns the authorization URL to redirect the customer to.
+def _prepare_initiation(db: Session, order_id: int, user: User) -> tuple[dict, float]:
+    # Validates the order and builds the Paystack payload; returns it with the
+    # order total in naira
     order = db.query(Order).filter_by(id=order_id, user_id=user.id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -45,14 +52,11 @@ def initiate_payment(db: Session, order_id: int, user: User) -> dict:
             detail="A verified email address is required to make payments"
         )
 
-    amount_kobo = _naira_to_kobo(order.total)
-    reference = f"ORE-{order.id}-{int(datetime.utcnow().timestamp())}"
-
     payload = {
         "email": user.email,
-        "amount": amount_kobo,
+        "amount": _naira_to_kobo(order.total),
         "currency": "NGN",
-        "reference": reference,
+        "reference": f"ORE-{order.id}-{int(datetime.utcnow().timestamp())}",
         "metadata": {
             "order_id": order.id,
             "user_id": user.id,
@@ -60,52 +64,105 @@ def initiate_payment(db: Session, order_id: int, user: User) -> dict:
         },
         "callback_url": f"{settings.FRONTEND_URL}/payment/callback",
     }
+    amount_ngn = order.total
+
+    # Don't hold a pooled DB connection while waiting on the gateway
+    db.close()
+    return payload, amount_ngn
 
-    try:
-        with httpx.Client(timeout=30) as client:
-            response = client.post(
-                f"{settings.PAYSTACK_BASE_URL}/transaction/initialize",
-                headers=_paystack_headers(),
-                json=payload,
-            )
-        resp_data = response.json()
-    except httpx.RequestError as e:
-        logger.error(f"[PAYMENT] Paystack API unreachable: {e}")
-        raise HTTPException(status_code=503, detail="Payment gateway unavailable, try again")
 
+def _record_initiation(db: Session, payload: dict, amount_ngn: float, resp_data: dict) -> dict:
     if not resp_data.get("status"):
         logger.error(f"[PAYMENT] Paystack init failed: {resp_data}")
         raise HTTPException(status_code=400, detail=resp_data.get("message", "Payment initiation failed"))
 
     data = resp_data["data"]
+    order_id = payload["metadata"]["order_id"]
+    reference = payload["reference"]
 
     # Persist payment record
     payment = Payment(
-        order_id=order.id,
+        order_id=order_id,
         reference=reference,
-        amount=order.total,
-        amount_kobo=amount_kobo,
+        amount=amount_ngn,
+        amount_kobo=payload["amount"],
         currency="NGN",
         status=PaymentStatus.PENDING,
         gateway="paystack",
     )
     db.add(payment)
     db.commit()
-    db.refresh(payment)
 
-    logger.info(f"[PAYMENT] Initiated payment ref={reference} order={order_id} amount=₦{order.total}")
+    logger.info(f"[PAYMENT] Initiated payment ref={reference} order={order_id} amount=₦{amount_ngn}")
 
     return {
         "authorization_url": data["authorization_url"],
         "reference": reference,
-        "order_id": order.id,
-        "amount_ngn": order.total,
+        "order_id": order_id,
+        "amount_ngn": amount_ngn,
+    }
+
+
+async def initiate_payment_async(db: Session, order_id: int, user: User) -> dict:
+    # Creates a Paystack transaction for the order and returns the
+    # authorization URL to redirect the customer to. The gateway call runs on
+    # the event loop and only the DB work uses the threadpool.
+    payload, amount_ngn = await run_in_threadpool(_prepare_initiation, db, order_id, user)
+    try:
+        resp_data = await get_async_paystack_client().initialize_transaction(payload)
+    except PaystackUnavailable as e:
+        logger.error(f"[PAYMENT] Paystack API unreachable: {e}")
+        raise HTTPException(status_code=503, detail="Payment gateway unavailable, try again")
+    return await run_in_threadpool(_record_initiation, db, payload, amount_ngn, resp_data)
+
+
+TERMINAL_STATUSES = (PaymentStatus.SUCCESS, PaymentStatus.FAILED, PaymentStatus.REFUNDED)
+
+
+def _payment_result(payment: Payment) -> dict:
+    return {
+        "reference": payment.reference,
+        "status": payment.status.value,
+        "amount_ngn": payment.amount,
+        "channel": payment.channel,
+        "paid_at": payment.paid_at,
+        "order_id": payment.order_id,
     }
 
 
-def verify_payment(db: Session, reference: str, user: Optional[User] = None) -> dict:
-    #Verify a payment with Paystack and update DB accordingly.
-    #Can be called by the user or internally from the webhook handler.
+def _mark_order_paid(db: Session, order_id: int) -> bool:
+    # One conditional UPDATE, so when a webhook, a verify and the reconciliation
+    # sweep settle payments for the same order at once, only the transaction
+    # that actually flips it to paid counts it in the sales rollups
+    row = db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.payment_status != "paid")
+        .values(payment_status="paid", updated_at=datetime.utcnow())
+        .returning(Order.created_at, Order.total)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return False
+    if row.created_at:
+        apply_order_delta(db, row.created_at, row.total, paid=1)
+    return True
+
+
+def _locked_payment(db: Session, reference: str) -> Optional[Payment]:
+    # Settlements of the same reference wait for each other here, so the
+    # status check after it sees whatever the previous one committed
+    return (
+        db.query(Payment)
+        .filter_by(reference=reference)
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+
+
+def _load_for_verify(db: Session, reference: str, user: Optional[User]) -> Optional[dict]:
+    # Returns the stored result for a settled payment, which Paystack can no
+    # longer change, or None when the gateway has to be asked
     payment = db.query(Payment).filter_by(reference=reference).first()
     if not payment:
         raise HTTPException(status_code=404, detail="Payment record not found")
@@ -115,20 +172,29 @@ def verify_payment(db: Session, reference: str, user: Optional[User] = None) ->
         if not order:
             raise HTTPException(status_code=403, detail="Access denied")
 
-    try:
-        with httpx.Client(timeout=30) as client:
-            response = client.get(
-                f"{settings.PAYSTACK_BASE_URL}/transaction/verify/{reference}",
-                headers=_paystack_headers(),
-            )
-        resp_data = response.json()
-    except httpx.RequestError as e:
-        logger.error(f"[PAYMENT] Paystack verify API unreachable: {e}")
-        raise HTTPException(status_code=503, detail="Payment gateway unavailable")
+    if payment.status in TERMINAL_STATUSES:
+        return _payment_result(payment)
+
+    db.close()
+    return None
 
+
+def apply_verification(db: Session, reference: str, resp_data: dict) -> dict:
+    # Stores a Paystack verify response on the payment and marks the order paid.
+    # Shared by the verify endpoint and the reconciliation sweep.
     if not resp_data.get("status"):
         raise HTTPException(status_code=400, detail=resp_data.get("message", "Verification failed"))
 
+    payment = _locked_payment(db, reference)
+    if not payment:
+        raise HTTPException(status_code=404, detail="Payment record not found")
+
+    # Settled by a webhook or another verify while this response was in flight
+    if payment.status in TERMINAL_STATUSES:
+        result = _payment_result(payment)
+        db.rollback()  # nothing to write, release the row lock
+        return result
+
     data = resp_data["data"]
     ps_status = data.get("status")
 
@@ -150,8 +216,10 @@ def verify_payment(db: Session, reference: str, user: Optional[User] = None) ->
         # Mark order as paid
         order = db.query(Order).filter_by(id=payment.order_id).first()
         if order:
-            order.payment_status = "paid"
+            marked = _mark_order_paid(db, order.id)
             db.commit()
+            if marked:
+                publish_order_event(order.id, order.user_id, "payment", order.current_status.value, order.payment_status)
             logger.info(f"[PAYMENT] Payment verified ref={reference} order={payment.order_id}")
     elif ps_status == "failed":
         payment.status = PaymentStatus.FAILED
@@ -159,15 +227,114 @@ def verify_payment(db: Session, reference: str, user: Optional[User] = None) ->
 
     db.commit()
     db.refresh(payment)
+    return _payment_result(payment)
 
-    return {
-        "reference": payment.reference,
-        "status": payment.status.value,
-        "amount_ngn": payment.amount,
-        "channel": payment.channel,
-        "paid_at": payment.paid_at,
-        "order_id": payment.order_id,
-    }
+
+# Verify lookups for a pending payment are cached for a few seconds and
+# single-flighted: one caller per reference asks Paystack, the others wait for
+# its answer in the cache. A Redis outage only disables this, not verification.
+
+def _verify_cache_key(reference: str) -> str:
+    return f"paystack:verify:{reference}"
+
+
+def _claim_verify(reference: str, lock_seconds: float) -> tuple[Optional[dict], Optional[Lock], bool]:
+    # (cached response, None, False), (None, lock, False) when this caller
+    # should ask Paystack, (None, None, True) while another caller is asking,
+    # (None, None, False) when Redis is unavailable. lock_seconds must cover
+    # the owner's whole gateway call, retries included, or a second caller
+    # would ask Paystack while the first is still retrying.
+    key = _verify_cache_key(reference)
+    try:
+        cached = redis_client.get(key)
+        if cached:
+            return json.loads(cached), None, False
+
+        lock = redis_client.lock(
+            f"{key}:lock",
+            timeout=lock_seconds,
+            # Released from whichever threadpool thread runs _release_verify
+            thread_local=False,
+        )
+        if not lock.acquire(blocking=False):
+            return None, None, True
+
+        cached = redis_client.get(key)
+        if cached:
+            _release_verify(lock)
+            return json.loads(cached), None, False
+        return None, lock, False
+    except redis.RedisError as e:
+        logger.error(f"[PAYMENT] Redis unavailable, verifying ref={reference} without cache: {e}")
+        return None, None, False
+
+
+def _store_verify(reference: str, resp_data: dict) -> None:
+    if not resp_data.get("status"):
+        return
+    try:
+        redis_client.setex(_verify_cache_key(reference), settings.PAYSTACK_VERIFY_CACHE_SECONDS, json.dumps(resp_data))
+    except redis.RedisError:
+        pass
+
+
+def _release_verify(lock: Optional[Lock]) -> None:
+    if lock is None:
+        return
+    try:
+        lock.release()
+    except (LockError, redis.RedisError):
+        pass
+
+
+def _current_result(db: Session, reference: str) -> dict:
+    payment = db.query(Payment).filter_by(reference=reference).first()
+    if not payment:
+        raise HTTPException(status_code=404, detail="Payment record not found")
+    return _payment_result(payment)
+
+
+async def _gateway_verify_async(reference: str) -> Optional[dict]:
+    # Paystack's verify response, or None when another caller's verify of the
+    # same reference was still running at the deadline. Waiters get at least
+    # one read timeout, so an answer that is merely slow still reaches them.
+    client = get_async_paystack_client()
+    deadline = time.monotonic() + max(settings.PAYSTACK_VERIFY_WAIT_SECONDS, client.read_timeout)
+    lock_seconds = client.call_budget_seconds() + 1
+    while True:
+        cached, lock, busy = await run_in_threadpool(_claim_verify, reference, lock_seconds)
+        if cached:
+            return cached
+        if not busy:
+            break
+        if time.monotonic() > deadline:
+            logger.warning(f"[PAYMENT] Gave up waiting for the in-flight verify of ref={reference}")
+            return None
+        await asyncio.sleep(VERIFY_POLL_SECONDS)
+
+    try:
+        resp_data = await client.verify_transaction(reference)
+        await run_in_threadpool(_store_verify, reference, resp_data)
+        return resp_data
+    finally:
+        await run_in_threadpool(_release_verify, lock)
+
+
+async def verify_payment_async(db: Session, reference: str, user: Optional[User] = None) -> dict:
+    # Verifies a payment with Paystack and updates the DB accordingly.
+    # Settled payments are answered from the database, and so is a caller that
+    # waited out another caller's verify: the gateway is answering, just slowly.
+    settled = await run_in_threadpool(_load_for_verify, db, reference, user)
+    if settled:
+        return settled
+    try:
+        resp_data = await _gateway_verify_async(reference)
+    except PaystackUnavailable as e:
+        logger.error(f"[PAYMENT] Paystack verify API unreachable: {e}")
+        raise HTTPException(status_code=503, detail="Payment gateway unavailable")
+    if resp_data is None:
+        return await run_in_threadpool(_current_result, db, reference)
+    return await run_in_threadpool(apply_verification, db, reference, resp_data)
 
 def verify_paystack_signature(payload_bytes: bytes, signature: str) -> bool:
     # Validate the HMAC-SHA512 signature from Paystack.
@@ -180,19 +347,17 @@ def verify_paystack_signature(payload_bytes: bytes, signature: str) -> bool:
     return hmac.compare_digest(expected, signature)
 
 
-def handle_webhook(db: Session, payload: dict, raw_body: bytes, signature: str) -> dict:
-    if not verify_paystack_signature(raw_body, signature):
-        logger.warning("[WEBHOOK] Invalid Paystack signature — request rejected")
-        raise HTTPException(status_code=400, detail="Invalid webhook signature")
-
+def apply_webhook_event(db: Session, payload: dict) -> dict:
+    # Applies a Paystack event whose signature was checked when it reached the
+    # inbox (handlers/webhooks.py). Safe to run more than once per event.
     event = payload.get("event")
     data = payload.get("data", {})
     reference = data.get("reference")
 
-    logger.info(f"[WEBHOOK] Received event={event} ref={reference}")
+    logger.info(f"[WEBHOOK] Processing event={event} ref={reference}")
 
     if event == "charge.success":
-        payment = db.query(Payment).filter_by(reference=reference).first()
+        payment = _locked_payment(db, reference)
         if not payment:
             logger.warning(f"[WEBHOOK] No payment found for ref={reference}")
             return {"status": "ignored", "reason": "unknown reference"}
@@ -216,8 +381,10 @@ def handle_webhook(db: Session, payload: dict, raw_body: bytes, signature: str)
         # Mark order paid
         order = db.query(Order).filter_by(id=payment.order_id).first()
         if order:
-            order.payment_status = "paid"
+            marked = _mark_order_paid(db, order.id)
             db.commit()
+            if marked:
+                publish_order_event(order.id, order.user_id, "payment", order.current_status.value, order.payment_status)
 
             # Dispatch confirmation email via Celery task
             try:
@@ -242,11 +409,15 @@ def handle_webhook(db: Session, payload: dict, raw_body: bytes, signature: str)
         return {"status": "ok"}
 
     elif event == "charge.failed":
-        payment = db.query(Payment).filter_by(reference=reference).first()
-        if payment:
+        payment = _locked_payment(db, reference)
+        # Events can arrive or be retried out of order; never undo a success
+        if payment and payment.status != PaymentStatus.SUCCESS:
             payment.status = PaymentStatus.FAILED
             payment.gateway_response = json.dumps(data)
             db.commit()
+            order = payment.order
+            if order:
+                publish_order_event(order.id, order.user_id, "payment_failed", order.current_status.value, order.payment_status)
         return {"status": "ok"}
 
     # Acknowledge all other events silently
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+import httpx
+
+from config import settings
+from utils.metrics import observe_external_call
+
+logger = logging.getLogger(__name__)
+
+# Errors raised before the request reached Paystack, so even a non-idempotent
+# call can be retried safely
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class PaystackUnavailable(Exception):
+    # Paystack could not be reached or answered with a server error
+    pass
+
+
+def _client_options(
+    base_url: str = None,
+    secret_key: str = None,
+    connect_timeout: float = None,
+    read_timeout: float = None,
+    max_connections: int = None,
+    max_keepalive: int = None,
+) -> dict:
+    connect_timeout = connect_timeout or settings.PAYSTACK_CONNECT_TIMEOUT
+    return {
+        "base_url": base_url or settings.PAYSTACK_BASE_URL,
+        "headers": {
+            "Authorization": f"Bearer {secret_key or settings.PAYSTACK_SECRET_KEY}",
+            "Content-Type": "application/json",
+        },
+        "timeout": httpx.Timeout(read_timeout or settings.PAYSTACK_READ_TIMEOUT, connect=connect_timeout, pool=connect_timeout),
+        "limits": httpx.Limits(
+            max_connections=max_connections or settings.PAYSTACK_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive or settings.PAYSTACK_MAX_KEEPALIVE,
+            keepalive_expiry=settings.PAYSTACK_KEEPALIVE_SECONDS,
+        ),
+    }
+
+
+def _retry_transport_error(e: httpx.TransportError, idempotent: bool) -> bool:
+    if isinstance(e, httpx.LocalProtocolError):
+        return False
+    return idempotent or isinstance(e, _NOT_SENT_ERRORS)
+
+
+def _is_server_error(response: httpx.Response) -> bool:
+    return response.status_code in _RETRY_STATUS_CODES or response.status_code >= 500
+
+
+def _parse(response: httpx.Response) -> dict:
+    try:
+        return response.json()
+    except ValueError as e:
+        raise PaystackUnavailable(f"Invalid JSON from Paystack (HTTP {response.status_code})") from e
+
+
+class AsyncPaystackClient:
+    # One long-lived client per event loop: pooled keep-alive connections to the
+    # gateway, separate connect and read timeouts, and jittered retries. A
+    # semaphore caps the gateway calls in flight per process; when all slots
+    # stay busy for PAYSTACK_QUEUE_TIMEOUT the call fails fast instead of
+    # piling up behind a slow gateway.
+
+    def __init__(
+        self,
+        base_url: str = None,
+        secret_key: str = None,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+        max_connections: int = None,
+        max_keepalive: int = None,
+        retries: int = None,
+        retry_backoff: float = None,
+        max_in_flight: int = None,
+        queue_timeout: float = None,
+    ):
+        self.retries = settings.PAYSTACK_RETRIES if retries is None else retries
+        self.retry_backoff = settings.PAYSTACK_RETRY_BACKOFF_SECONDS if retry_backoff is None else retry_backoff
+        self.queue_timeout = settings.PAYSTACK_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self._in_flight = asyncio.Semaphore(max_in_flight or settings.PAYSTACK_MAX_IN_FLIGHT)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = httpx.AsyncClient(**_client_options(
+            base_url, secret_key, connect_timeout, read_timeout, max_connections, max_keepalive,
+        ))
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter, so clients retrying together don't hit the gateway in lockstep
+        return random.uniform(0, self.retry_backoff * 2 ** attempt)
+
+    @property
+    def read_timeout(self) -> float:
+        return self._client.timeout.read
+
+    def call_budget_seconds(self) -> float:
+        # Longest a retried call can take: waiting for an in-flight slot, the
+        # connect and read timeouts on every attempt and the largest jittered
+        # backoff between them. max_in_flight keeps calls from also waiting on
+        # the connection pool.
+        timeout = self._client.timeout
+        backoff = sum(self.retry_backoff * 2 ** attempt for attempt in range(self.retries))
+        return self.queue_timeout + (1 + self.retries) * (timeout.connect + self.read_timeout) + backoff
+
+    async def _request(self, method: str, path: str, operation: str, idempotent: bool, **kwargs) -> dict:
+        try:
+            await asyncio.wait_for(self._in_flight.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[PAYSTACK] {operation} rejected: too many gateway calls in flight")
+            raise PaystackUnavailable("Too many payment gateway calls in flight")
+
+        try:
+            attempts = 1 + self.retries
+            for attempt in range(attempts):
+                last = attempt + 1 == attempts
+                started = time.perf_counter()
+                try:
+                    response = await self._client.request(method, path, **kwargs)
+                except httpx.TransportError as e:
+                    observe_external_call("paystack", operation, "error", started)
+                    if last or not _retry_transport_error(e, idempotent):
+                        logger.error(f"[PAYSTACK] {operation} failed: {e!r}")
+                        raise PaystackUnavailable(str(e)) from e
+                    logger.warning(f"[PAYSTACK] {operation} attempt {attempt + 1} failed: {e!r}, retrying")
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                if _is_server_error(response):
+                    observe_external_call("paystack", operation, "error", started)
+                    if last or not idempotent:
+                        raise PaystackUnavailable(f"Paystack returned HTTP {response.status_code}")
+                    logger.warning(f"[PAYSTACK] {operation} returned {response.status_code}, retrying")
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                observe_external_call("paystack", operation, "success", started)
+                return _parse(response)
+        finally:
+            self._in_flight.release()
+
+    async def initialize_transaction(self, payload: dict) -> dict:
+        return await self._request("POST", "/transaction/initialize", "initialize", idempotent=False, json=payload)
+
+    async def verify_transaction(self, reference: str) -> dict:
+        return await self._request("GET", f"/transaction/verify/{reference}", "verify", idempotent=True)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_async_client: Optional[AsyncPaystackClient] = None
+
+
+def get_async_paystack_client() -> AsyncPaystackClient:
+    # Pooled connections belong to the event loop that opened them, so a new
+    # loop (e.g. asyncio.run() in a worker) gets its own client
+    global _async_client
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.loop is not loop:
+        _async_client = AsyncPaystackClient()
+        _async_client.loop = loop
+    return _async_client
+
+
+async def close_async_paystack_client() -> None:
+    global _async_client
+    if _async_client is not None and _async_client.loop is asyncio.get_running_loop():
+        client, _async_client = _async_client, None
+        await client.close()
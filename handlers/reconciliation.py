@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database.models import Payment
+from database.schemas import PaymentStatus
+from handlers.payment import apply_verification
+from handlers.paystack import PaystackUnavailable, close_async_paystack_client, get_async_paystack_client
+from handlers.user import redis_client
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = {"success": "succeeded", "failed": "failed"}
+
+
+async def _wait_for_rate_slot(per_second: int) -> None:
+    # One-second windows counted in Redis, so the limit holds across every
+    # worker running the sweep
+    while True:
+        window = int(time.time())
+        pipe = redis_client.pipeline()
+        pipe.incr(f"paystack:verify:rate:{window}")
+        pipe.expire(f"paystack:verify:rate:{window}", 2)
+        count, _ = await asyncio.to_thread(pipe.execute)
+        if count <= per_second:
+            return
+        await asyncio.sleep(max(window + 1 - time.time(), 0))
+
+
+async def _verify_references(references: list[str], concurrency: int, per_second: int) -> list[tuple]:
+    # (reference, Paystack response or PaystackUnavailable) in input order
+    client = get_async_paystack_client()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def verify(reference: str) -> tuple:
+        async with slots:
+            await _wait_for_rate_slot(per_second)
+            try:
+                return reference, await client.verify_transaction(reference)
+            except PaystackUnavailable as e:
+                return reference, e
+
+    return await asyncio.gather(*(verify(reference) for reference in references))
+
+
+def reconcile_payments(
+    db: Session,
+    older_than_seconds: int = None,
+    batch_size: int = None,
+    max_batches: int = None,
+) -> dict:
+    # Verifies payments still pending after older_than_seconds (closed tab,
+    # missed webhook) and applies the result like GET /payments/{ref}/verify.
+    # Payments older than RECONCILE_MAX_AGE_HOURS are left alone.
+    started = time.perf_counter()
+    older_than_seconds = settings.RECONCILE_AFTER_SECONDS if older_than_seconds is None else older_than_seconds
+    batch_size = batch_size or settings.RECONCILE_BATCH_SIZE
+    max_batches = max_batches or settings.RECONCILE_MAX_BATCHES
+    now = datetime.utcnow()
+    newest = now - timedelta(seconds=older_than_seconds)
+    oldest = now - timedelta(hours=settings.RECONCILE_MAX_AGE_HOURS)
+
+    counts = {"checked": 0, "succeeded": 0, "failed": 0, "pending": 0, "errors": 0}
+
+    async def run() -> None:
+        # The DB work is synchronous and runs between gateway rounds, when
+        # nothing else is waiting on the loop
+        try:
+            last_id = 0
+            for _ in range(max_batches):
+                rows = db.execute(
+                    select(Payment.id, Payment.reference)
+                    .where(
+                        Payment.status == PaymentStatus.PENDING,
+                        Payment.created_at < newest,
+                        Payment.created_at >= oldest,
+                        Payment.id > last_id,
+                    )
+                    .order_by(Payment.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    return
+                last_id = rows[-1].id
+                # Don't hold a DB connection while the gateway calls are in flight
+                db.close()
+
+                results = await _verify_references(
+                    [row.reference for row in rows], settings.RECONCILE_CONCURRENCY, settings.RECONCILE_RATE_PER_SECOND,
+                )
+                for reference, result in results:
+                    counts["checked"] += 1
+                    if isinstance(result, Exception):
+                        counts["errors"] += 1
+                        continue
+                    try:
+                        outcome = apply_verification(db, reference, result)["status"]
+                    except HTTPException as e:
+                        db.rollback()
+                        counts["errors"] += 1
+                        logger.warning(f"[RECONCILE] ref={reference} not reconciled: {e.detail}")
+                        continue
+                    counts[OUTCOMES.get(outcome, "pending")] += 1
+
+                if len(rows) < batch_size:
+                    return
+        finally:
+            # The pooled client belongs to this asyncio.run() loop, which closes next
+            await close_async_paystack_client()
+
+    asyncio.run(run())
+
+    duration = time.perf_counter() - started
+    logger.info(
+        f"[RECONCILE] checked={counts['checked']} succeeded={counts['succeeded']} failed={counts['failed']} "
+        f"still_pending={counts['pending']} errors={counts['errors']} in {duration:.2f}s"
+    )
+    return {**counts, "duration_seconds": round(duration, 3)}
@@ -12,13 +12,17 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from config import settings
-from database.db import get_db
+from database.db import SessionLocal, get_db, get_read_db
 from database.models import User
 from database.schemas import TokenData, UserCreate, UserRole
+from utils.metrics import InstrumentedRedis
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+redis_client = (InstrumentedRedis if settings.METRICS_ENABLED else redis.Redis).from_url(
+    settings.REDIS_URL, decode_responses=True
+)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -134,15 +138,15 @@ def revoke_refresh_token(raw_token: str) -> None:
     token_hash = hashlib.sha256(raw_token.encode()).hexdigest()
     redis_client.delete(f"refresh_token:{token_hash}")
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _token_data(token: str) -> TokenData:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
@@ -150,15 +154,42 @@ def get_current_user(
         role: str = payload.get("role")
 
         if email is None or token_type != "access":
-            raise credentials_exception
+            raise _credentials_exception()
 
-        token_data = TokenData(email=email, role=role)
+        return TokenData(email=email, role=role)
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
 
-    user = get_user_by_email_or_phone(db, email=token_data.email)
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    with span("auth", phase="auth"):
+        token_data = _token_data(token)
+        user = get_user_by_email_or_phone(db, email=token_data.email)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user
+
+
+def get_current_reader(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db)
+) -> User:
+    # get_current_user for read-only routes. A user the replica doesn't have
+    # yet, or still shows as unverified, is looked up again on the primary.
+    with span("auth", phase="auth"):
+        token_data = _token_data(token)
+        user = get_user_by_email_or_phone(db, email=token_data.email)
+        if (user is None or not user.is_active) and db.info.get("replica"):
+            primary = SessionLocal()
+            try:
+                user = get_user_by_email_or_phone(primary, email=token_data.email)
+            finally:
+                primary.close()
+    if user is None:
+        raise _credentials_exception()
     return user
 
 
@@ -171,6 +202,10 @@ def get_active_user(user: User = Depends(get_current_user)) -> User:
     return user
 
 
+def get_active_reader(user: User = Depends(get_current_reader)) -> User:
+    return get_active_user(user)
+
+
 def customer_only(user: User = Depends(get_active_user)) -> User:
     if user.role != UserRole.CUSTOMER.value:
         raise HTTPException(
@@ -179,6 +214,10 @@ def customer_only(user: User = Depends(get_active_user)) -> User:
         )
     return user
 
+
+def customer_reader(user: User = Depends(get_active_reader)) -> User:
+    return customer_only(user)
+
 def get_user_by_email_or_phone(
     db: Session,
     email: str = None,
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database.db import dialect_insert
+from database.models import WebhookEvent
+from handlers.payment import apply_webhook_event, verify_paystack_signature
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_dedupe_key(payload: dict, raw_body: bytes) -> str:
+    # Paystack resends the same event with the same transaction id and
+    # reference; events carrying neither are deduplicated on the raw body
+    event = str(payload.get("event") or "unknown")[:64]
+    data = payload.get("data") or {}
+    event_id, reference = data.get("id"), data.get("reference")
+    if event_id is None and reference is None:
+        return f"{event}:sha256:{hashlib.sha256(raw_body).hexdigest()}"
+    return f"{event}:{event_id}:{reference}"[:255]
+
+
+def enqueue_webhook_event(db: Session, payload: dict, raw_body: bytes) -> bool:
+    # Stores a verified event in the inbox. Returns False for a duplicate.
+    data = payload.get("data") or {}
+    table = WebhookEvent.__table__
+    stmt = (
+        dialect_insert(db)(table)
+        .values(
+            dedupe_key=webhook_dedupe_key(payload, raw_body),
+            event=str(payload.get("event") or "unknown")[:64],
+            reference=data.get("reference"),
+            payload=payload,
+        )
+        .on_conflict_do_nothing(index_elements=["dedupe_key"])
+        .returning(table.c.id)
+    )
+    event_id = db.execute(stmt).scalar()
+    db.commit()
+
+    if event_id is None:
+        logger.info(f"[WEBHOOK] Duplicate event={payload.get('event')} ref={data.get('reference')} ignored")
+        return False
+
+    logger.info(f"[WEBHOOK] Queued event={payload.get('event')} ref={data.get('reference')} inbox_id={event_id}")
+    _queue_webhook_processing()
+    return True
+
+
+def receive_webhook(db: Session, raw_body: bytes, signature: str) -> dict:
+    # The webhook endpoint: verify, store, acknowledge
+    if not verify_paystack_signature(raw_body, signature):
+        logger.warning("[WEBHOOK] Invalid Paystack signature — request rejected")
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
+
+    try:
+        payload = json.loads(raw_body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    created = enqueue_webhook_event(db, payload, raw_body)
+    return {"status": "queued" if created else "duplicate"}
+
+
+def _queue_webhook_processing() -> None:
+    # The periodic sweep picks the event up if the broker is unavailable
+    try:
+        from workers.tasks import process_webhook_events_task
+        process_webhook_events_task.delay()
+    except Exception as e:
+        logger.error(f"[WEBHOOK] Failed to queue inbox processing: {e}")
+
+
+def claim_webhook_events(db: Session, batch_size: int, claimed_before: datetime = None) -> list:
+    # Marks up to batch_size events as processing and returns them. Pending
+    # events wait for their next_attempt_at; events left in processing by a
+    # worker that died are claimed again after WEBHOOK_CLAIM_TIMEOUT_SECONDS.
+    # With claimed_before, events claimed since then (earlier in the same run)
+    # are left alone. SKIP LOCKED lets workers claim disjoint batches
+    # concurrently.
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.WEBHOOK_CLAIM_TIMEOUT_SECONDS)
+    claimable = (
+        select(WebhookEvent.id)
+        .where(or_(
+            and_(
+                WebhookEvent.status == "pending",
+                or_(WebhookEvent.next_attempt_at.is_(None), WebhookEvent.next_attempt_at <= now),
+            ),
+            and_(WebhookEvent.status == "processing", WebhookEvent.claimed_at < stale),
+        ))
+        .order_by(WebhookEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    if claimed_before:
+        claimable = claimable.where(or_(WebhookEvent.claimed_at.is_(None), WebhookEvent.claimed_at < claimed_before))
+    rows = db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id.in_(claimable))
+        .values(status="processing", attempts=WebhookEvent.attempts + 1, claimed_at=now)
+        .returning(WebhookEvent.id, WebhookEvent.payload, WebhookEvent.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted(rows, key=lambda row: row.id)
+
+
+def _finish(db: Session, event_id: int, **values) -> None:
+    db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id == event_id, WebhookEvent.status == "processing")
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    # Exponential backoff after the given number of failed attempts, so a
+    # transient outage doesn't use up WEBHOOK_MAX_ATTEMPTS within seconds
+    seconds = settings.WEBHOOK_RETRY_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.WEBHOOK_RETRY_MAX_BACKOFF_SECONDS))
+
+
+def process_webhook_events(db: Session, batch_size: int = None, max_batches: int = None) -> dict:
+    # Applies inbox events in id order, one transaction per event, so one bad
+    # event doesn't hold back the rest of its batch. An event is tried at most
+    # once per run.
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    max_batches = max_batches or settings.WEBHOOK_MAX_BATCHES
+    started = datetime.utcnow()
+
+    processed = retried = failed = 0
+    for _ in range(max_batches):
+        rows = claim_webhook_events(db, batch_size, claimed_before=started)
+        for row in rows:
+            try:
+                apply_webhook_event(db, row.payload)
+            except Exception as e:
+                db.rollback()
+                final = row.attempts >= settings.WEBHOOK_MAX_ATTEMPTS
+                logger.error(f"[WEBHOOK] Event inbox_id={row.id} attempt {row.attempts} failed: {e!r}")
+                _finish(
+                    db, row.id,
+                    status="failed" if final else "pending",
+                    last_error=repr(e)[:1000],
+                    next_attempt_at=None if final else datetime.utcnow() + retry_delay(row.attempts),
+                )
+                if final:
+                    failed += 1
+                else:
+                    retried += 1
+                continue
+            _finish(db, row.id, status="processed", processed_at=datetime.utcnow(), last_error=None)
+            processed += 1
+
+        if len(rows) < batch_size:
+            break
+
+    if processed or retried or failed:
+        logger.info(f"[WEBHOOK] Inbox run processed={processed} retried={retried} failed={failed}")
+    return {"processed": processed, "retried": retried, "failed": failed}
+
+
+def purge_webhook_events(db: Session, older_than_days: int = None, limit: int = 5000) -> int:
+    # Processed events are only kept as long as duplicates need to be detected
+    older_than_days = older_than_days or settings.WEBHOOK_RETENTION_DAYS
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    expired = (
+        select(WebhookEvent.id)
+        .where(WebhookEvent.status == "processed", WebhookEvent.processed_at < cutoff)
+        .limit(limit)
+    )
+    purged = db.execute(
+        delete(WebhookEvent)
+        .where(WebhookEvent.id.in_(expired))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return purged
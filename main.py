@@ -1,18 +1,30 @@
+import bootstrap  # first: starts the import clock for the [INIT] log line
+
 import logging
+import os
+import time
 import uuid
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest, multiprocess
 from pythonjsonlogger import jsonlogger
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
 from config import settings
-from database.db import Base, engine
+from database.db import engine
+from database.instrumentation import record_request_stats
+from database.schema import check_schema
+from handlers.paystack import close_async_paystack_client
 from transport import routes
+from utils.metrics import build_registry, observe_http_request, observe_threadpool
+from utils.serialization import FastJSONResponse
+from utils.tracing import TraceLogFilter, end_trace, finish_trace, server_timing, start_trace
 
 
 def setup_logging():
@@ -23,6 +35,7 @@ def setup_logging():
         datefmt="%Y-%m-%dT%H:%M:%S",
     )
     handler.setFormatter(formatter)
+    handler.addFilter(TraceLogFilter())
     logger.handlers = [handler]
     logger.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
 
@@ -40,11 +53,23 @@ limiter = Limiter(
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    #Run on startup: create tables, log startup info.
+    #Run on startup: check the schema version, log startup info.
     logger.info(f"[STARTUP] {settings.APP_NAME} starting in {settings.APP_ENV} mode")
-    Base.metadata.create_all(bind=engine)
-    logger.info("[STARTUP] Database tables verified/created")
+    phases = {}
+
+    started = time.perf_counter()
+    check_schema(engine, settings.schema_check_mode)
+    phases["schema_check"] = time.perf_counter() - started
+
+    timings = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in phases.items())
+    logger.info(
+        f"[STARTUP] Ready in {sum(phases.values()) * 1000:.1f}ms ({timings}, schema_check_mode={settings.schema_check_mode})",
+        extra={"phases_ms": {name: round(seconds * 1000, 1) for name, seconds in phases.items()}},
+    )
     yield
+    await close_async_paystack_client()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
     logger.info(f"[SHUTDOWN] {settings.APP_NAME} shutting down")
 
 
@@ -56,6 +81,7 @@ app = FastAPI(
     docs_url="/docs" if settings.DEBUG else None,        
     redoc_url="/redoc" if settings.DEBUG else None,
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -73,14 +99,33 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 @app.middleware("http")
 async def add_request_id(request: Request, call_next):
     request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-    response = await call_next(request)
+    request.state.request_id = request_id
+    trace, token = start_trace(request_id, "request", scope=request.scope)
+    started = time.perf_counter()
+    if settings.METRICS_ENABLED:
+        observe_threadpool()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        total = time.perf_counter() - started
+        if trace.endpoint_finished is not None:
+            trace.add("render", time.perf_counter() - trace.endpoint_finished)
+        record_request_stats(trace)
+        if settings.METRICS_ENABLED:
+            observe_http_request(request.scope, status_code, started)
+        finish_trace(trace, str(status_code), total)
+        end_trace(token)
     response.headers["X-Request-ID"] = request_id
+    if settings.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = server_timing(trace, total)
     return response
 
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    request_id = request.headers.get("X-Request-ID", "unknown")
+    request_id = getattr(request.state, "request_id", None) or request.headers.get("X-Request-ID", "unknown")
     logger.error(
         f"[ERROR] Unhandled exception on {request.method} {request.url.path}",
         exc_info=exc,
@@ -105,6 +150,19 @@ def health_check():
     }
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["System"], include_in_schema=False)
+    async def metrics():
+        # With PROMETHEUS_MULTIPROC_DIR set (uvicorn --workers), every worker
+        # serves the samples of all of them
+        observe_threadpool()
+        body = await run_in_threadpool(generate_latest, build_registry())
+        return Response(body, media_type=CONTENT_TYPE_LATEST)
+
+
 app.include_router(routes.router)
 
-logger.info(f"[INIT] {settings.APP_NAME} API initialized with {len(app.routes)} routes")
\ No newline at end of file
+logger.info(
+    f"[INIT] {settings.APP_NAME} API initialized with {len(app.routes)} routes "
+    f"in {(time.perf_counter() - bootstrap.IMPORT_STARTED) * 1000:.0f}ms"
+)
\ No newline at end of file
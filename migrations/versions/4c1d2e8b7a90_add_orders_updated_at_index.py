@@ -0,0 +1,32 @@
+"""add orders updated_at index
+
+Revision ID: 4c1d2e8b7a90
+Revises: 979ab723a6e0
+Create Date: 2026-10-19 10:12:40.118392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1d2e8b7a90'
+down_revision: Union[str, Sequence[str], None] = '979ab723a6e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows created before updated_at was always set would otherwise never show up in the change feed
+    op.execute(sa.text("UPDATE orders SET updated_at = created_at WHERE updated_at IS NULL"))
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_updated_at_id', ['updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_updated_at_id')
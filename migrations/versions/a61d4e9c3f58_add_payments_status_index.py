@@ -0,0 +1,31 @@
+"""add payments status index
+
+Revision ID: a61d4e9c3f58
+Revises: f3a9c6d1b2e4
+Create Date: 2026-10-19 19:02:37.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61d4e9c3f58'
+down_revision: Union[str, Sequence[str], None] = 'f3a9c6d1b2e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Lets the reconciliation sweep find stale pending payments without a scan
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_status_created_at', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('ix_payments_status_created_at')
@@ -0,0 +1,30 @@
+"""add webhook event next attempt at
+
+Revision ID: b4e9d2c7a815
+Revises: d8b3f5a2c417
+Create Date: 2026-10-19 21:02:37.815240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e9d2c7a815'
+down_revision: Union[str, Sequence[str], None] = 'd8b3f5a2c417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('webhook_events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('webhook_events', schema=None) as batch_op:
+        batch_op.drop_column('next_attempt_at')
@@ -0,0 +1,103 @@
+"""add order item snapshot
+
+Revision ID: b7e3f19a2c54
+Revises: 4c1d2e8b7a90
+Create Date: 2026-10-19 11:40:02.551207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3f19a2c54'
+down_revision: Union[str, Sequence[str], None] = '4c1d2e8b7a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+order_items = sa.table(
+    'order_items',
+    sa.column('id', sa.Integer),
+    sa.column('food_item_id', sa.Integer),
+    sa.column('protein_id', sa.Integer),
+    sa.column('snapshot', sa.JSON),
+)
+order_item_extras = sa.table(
+    'order_item_extras',
+    sa.column('order_item_id', sa.Integer),
+    sa.column('extra_id', sa.Integer),
+)
+food_items = sa.table('food_items', sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('price', sa.Float))
+proteins = sa.table('proteins', sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('price', sa.Float))
+extras = sa.table('extras', sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('price', sa.Float))
+
+
+def _backfill_snapshots(bind) -> None:
+    # Existing rows only have links to the live menu, so their snapshot uses the
+    # names and prices as they are today. Runs in id-ordered batches to keep each
+    # read and update small on large order tables.
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                order_items.c.id,
+                food_items.c.name.label('food'), food_items.c.price.label('food_price'),
+                proteins.c.name.label('protein'), proteins.c.price.label('protein_price'),
+            )
+            .select_from(order_items)
+            .outerjoin(food_items, food_items.c.id == order_items.c.food_item_id)
+            .outerjoin(proteins, proteins.c.id == order_items.c.protein_id)
+            .where(order_items.c.id > last_id)
+            .order_by(order_items.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        ids = [row.id for row in rows]
+        item_extras: dict[int, list] = {}
+        for order_item_id, name, price in bind.execute(
+            sa.select(order_item_extras.c.order_item_id, extras.c.name, extras.c.price)
+            .join(extras, extras.c.id == order_item_extras.c.extra_id)
+            .where(order_item_extras.c.order_item_id.in_(ids))
+            .order_by(order_item_extras.c.order_item_id, extras.c.id)
+        ):
+            item_extras.setdefault(order_item_id, []).append([name, price])
+
+        bind.execute(
+            order_items.update()
+            .where(order_items.c.id == sa.bindparam('item_id'))
+            .values(snapshot=sa.bindparam('item_snapshot')),
+            [
+                {
+                    'item_id': row.id,
+                    'item_snapshot': {
+                        'food': [row.food, row.food_price],
+                        'protein': [row.protein, row.protein_price] if row.protein is not None else None,
+                        'extras': item_extras.get(row.id, []),
+                    },
+                } for row in rows
+            ],
+        )
+        last_id = ids[-1]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('snapshot', sa.JSON(), nullable=True))
+
+    _backfill_snapshots(op.get_bind())
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.alter_column('snapshot', existing_type=sa.JSON(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_column('snapshot')
@@ -0,0 +1,103 @@
+"""add cart item snapshot
+
+Revision ID: c5d7e2a1f830
+Revises: a61d4e9c3f58
+Create Date: 2026-10-19 19:20:41.108395
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d7e2a1f830'
+down_revision: Union[str, Sequence[str], None] = 'a61d4e9c3f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+cart_items = sa.table(
+    'cart_items',
+    sa.column('id', sa.Integer),
+    sa.column('food_item_id', sa.Integer),
+    sa.column('protein_id', sa.Integer),
+    sa.column('unit_price', sa.Float),
+    sa.column('snapshot', sa.JSON),
+)
+cart_item_extras = sa.table(
+    'cart_item_extras',
+    sa.column('cart_item_id', sa.Integer),
+    sa.column('extra_id', sa.Integer),
+)
+food_items = sa.table('food_items', sa.column('id', sa.Integer), sa.column('name', sa.String))
+proteins = sa.table('proteins', sa.column('id', sa.Integer), sa.column('name', sa.String))
+extras = sa.table('extras', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def _backfill_snapshots(bind) -> None:
+    # Existing cart rows only recorded their total unit price, so the whole of
+    # it is put against the food (names come from the current menu). Receipts
+    # for these lines still add up to what was charged.
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                cart_items.c.id, cart_items.c.unit_price,
+                food_items.c.name.label('food'), proteins.c.name.label('protein'),
+            )
+            .select_from(cart_items)
+            .outerjoin(food_items, food_items.c.id == cart_items.c.food_item_id)
+            .outerjoin(proteins, proteins.c.id == cart_items.c.protein_id)
+            .where(cart_items.c.id > last_id)
+            .order_by(cart_items.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        ids = [row.id for row in rows]
+        item_extras: dict[int, list] = {}
+        for cart_item_id, name in bind.execute(
+            sa.select(cart_item_extras.c.cart_item_id, extras.c.name)
+            .join(extras, extras.c.id == cart_item_extras.c.extra_id)
+            .where(cart_item_extras.c.cart_item_id.in_(ids))
+            .order_by(cart_item_extras.c.cart_item_id, extras.c.id)
+        ):
+            item_extras.setdefault(cart_item_id, []).append([name, 0])
+
+        bind.execute(
+            cart_items.update()
+            .where(cart_items.c.id == sa.bindparam('item_id'))
+            .values(snapshot=sa.bindparam('item_snapshot')),
+            [
+                {
+                    'item_id': row.id,
+                    'item_snapshot': {
+                        'food': [row.food, row.unit_price],
+                        'protein': [row.protein, 0] if row.protein is not None else None,
+                        'extras': item_extras.get(row.id, []),
+                    },
+                } for row in rows
+            ],
+        )
+        last_id = ids[-1]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('snapshot', sa.JSON(), nullable=True))
+
+    _backfill_snapshots(op.get_bind())
+
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.alter_column('snapshot', existing_type=sa.JSON(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.drop_column('snapshot')
@@ -0,0 +1,59 @@
+"""add sales rollup tables
+
+Revision ID: d52a8c0e6f13
+Revises: b7e3f19a2c54
+Create Date: 2026-10-19 14:05:27.310844
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd52a8c0e6f13'
+down_revision: Union[str, Sequence[str], None] = 'b7e3f19a2c54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _counter_columns() -> list:
+    return [
+        sa.Column('orders_placed', sa.Integer(), nullable=False),
+        sa.Column('orders_paid', sa.Integer(), nullable=False),
+        sa.Column('orders_cancelled', sa.Integer(), nullable=False),
+        sa.Column('placed_total', sa.Float(), nullable=False),
+        sa.Column('paid_total', sa.Float(), nullable=False),
+        sa.Column('cancelled_total', sa.Float(), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    *_counter_columns(),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('sales_hourly',
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    *_counter_columns(),
+    sa.PrimaryKeyConstraint('hour')
+    )
+    op.create_table('sales_items_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('food_item_id', sa.Integer(), nullable=False),
+    sa.Column('food_name', sa.String(length=200), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('sales', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'food_item_id')
+    )
+    # Existing orders are not counted until rebuild_rollups.py has been run once
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('sales_items_daily')
+    op.drop_table('sales_hourly')
+    op.drop_table('sales_daily')
@@ -0,0 +1,33 @@
+"""add orders archive keys
+
+Revision ID: d8b3f5a2c417
+Revises: c5d7e2a1f830
+Create Date: 2026-10-19 19:48:09.377512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8b3f5a2c417'
+down_revision: Union[str, Sequence[str], None] = 'c5d7e2a1f830'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('orders_archive_keys',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO orders_archive_keys (id, created_at) SELECT id, created_at FROM orders_archive")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('orders_archive_keys')
@@ -0,0 +1,55 @@
+"""add orders archive
+
+Revision ID: e8f41b6d9a27
+Revises: d52a8c0e6f13
+Create Date: 2026-10-19 16:32:51.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8f41b6d9a27'
+down_revision: Union[str, Sequence[str], None] = 'd52a8c0e6f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Partitioned by month on PostgreSQL; monthly partitions are created by the
+    # archival job as it needs them (handlers/archive.py)
+    op.create_table('orders_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('delivery_address_id', sa.Integer(), nullable=True),
+    sa.Column('subtotal', sa.Float(), nullable=False),
+    sa.Column('delivery_fee', sa.Float(), nullable=False),
+    sa.Column('service_fee', sa.Float(), nullable=False),
+    sa.Column('tax', sa.Float(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('special_instructions', sa.Text(), nullable=True),
+    sa.Column('payment_status', sa.String(length=20), nullable=True),
+    sa.Column('current_status', sa.String(length=20), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('items', sa.JSON(), nullable=False),
+    sa.Column('payments', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)',
+    )
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_archive_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_archive_user_id_created_at')
+
+    # Dropping the parent also drops its monthly partitions on PostgreSQL
+    op.drop_table('orders_archive')
@@ -0,0 +1,34 @@
+import argparse
+import sys
+from datetime import date
+
+if sys.stdout.encoding != "utf-8":
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+
+sys.path.insert(0, ".")
+
+from database.db import SessionLocal
+from handlers.analytics import rebuild_rollups
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recompute the sales rollup tables from order history.")
+    parser.add_argument("--since", type=date.fromisoformat, help="only rebuild buckets from this UTC day (YYYY-MM-DD) on")
+    parser.add_argument("--batch-size", type=int, default=1000, help="orders read per batch")
+    args = parser.parse_args()
+
+    print(f"\n[*] Rebuilding sales rollups{f' since {args.since}' if args.since else ''}")
+    db = SessionLocal()
+    try:
+        scanned = rebuild_rollups(db, since=args.since, batch_size=args.batch_size)
+        print(f"[OK] Rollups rebuilt from {scanned} orders.\n")
+    except Exception as e:
+        db.rollback()
+        print(f"[ERROR] Rebuild failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
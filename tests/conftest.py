@@ -0,0 +1,32 @@
+import os
+
+# Settings are read at import time, so point them at local stand-ins before any
+# app module is imported
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("PAYSTACK_SECRET_KEY", "sk_test_local")
+os.environ.setdefault("SCHEMA_CHECK_MODE", "off")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.stubs import FakePaystack
+from database.db import Base
+
+
+@pytest.fixture
+def fake_paystack():
+    stub = FakePaystack().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def db(tmp_path):
+    # A session on a throwaway SQLite file with the full schema
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
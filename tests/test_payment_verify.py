@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+import handlers.payment as payment
+from config import settings
+from database.models import Order, Payment, User
+from database.schemas import PaymentStatus
+from handlers.paystack import AsyncPaystackClient, close_async_paystack_client
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(payment, "redis_client", client)
+    return client
+
+
+@pytest.fixture
+def gateway(fake_paystack, monkeypatch):
+    monkeypatch.setattr(settings, "PAYSTACK_BASE_URL", fake_paystack.url)
+    monkeypatch.setattr(settings, "PAYSTACK_RETRY_BACKOFF_SECONDS", 0)
+    return fake_paystack
+
+
+@pytest.fixture
+def pending_payment(db):
+    db.add(User(email="customer@example.com", hashed_password="x", is_active=True))
+    db.flush()
+    order = Order(user_id=1, subtotal=1500, delivery_fee=0, service_fee=0, tax=0, total=1500)
+    db.add(order)
+    db.flush()
+    db.add(Payment(order_id=order.id, reference="ref-1", amount=1500, amount_kobo=150000, status=PaymentStatus.PENDING))
+    db.commit()
+    return "ref-1"
+
+
+def _verify(db, reference: str) -> dict:
+    async def run():
+        try:
+            return await payment.verify_payment_async(db, reference)
+        finally:
+            await close_async_paystack_client()
+
+    return asyncio.run(run())
+
+
+def test_call_budget_covers_every_attempt_and_backoff():
+    client = AsyncPaystackClient(
+        base_url="http://127.0.0.1:9", connect_timeout=3, read_timeout=15,
+        retries=2, retry_backoff=0.5, queue_timeout=2,
+    )
+    asyncio.run(client.close())
+
+    # queue + 3 attempts x (connect + read) + 0.5 + 1.0 of backoff
+    assert client.call_budget_seconds() == 2 + 3 * (3 + 15) + 1.5
+
+
+def test_verify_lock_lasts_for_the_whole_call_budget(fake_redis):
+    cached, lock, busy = payment._claim_verify("ref-1", lock_seconds=57.5)
+
+    assert (cached, busy) == (None, False)
+    assert 57_000 < fake_redis.pttl("paystack:verify:ref-1:lock") <= 57_500
+
+
+def test_waiter_answers_from_the_database_instead_of_503(db, gateway, pending_payment, fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "PAYSTACK_VERIFY_WAIT_SECONDS", 0)
+    monkeypatch.setattr(settings, "PAYSTACK_READ_TIMEOUT", 0.3)
+    # Another caller is verifying this reference and doesn't finish in time
+    fake_redis.set("paystack:verify:ref-1:lock", "other-caller", px=60_000)
+
+    started = time.monotonic()
+    result = _verify(db, pending_payment)
+
+    assert result["status"] == "pending"
+    assert time.monotonic() - started >= 0.3
+    assert gateway.faults.requests == 0
+
+
+def test_waiter_gets_the_answer_of_the_verify_in_flight(db, gateway, pending_payment, fake_redis):
+    fake_redis.set("paystack:verify:ref-1:lock", "other-caller", px=60_000)
+    gateway.transactions["ref-1"] = {"amount": 150000}
+
+    async def finish_other_verify():
+        await asyncio.sleep(0.2)
+        response = await payment.get_async_paystack_client().verify_transaction("ref-1")
+        payment._store_verify("ref-1", response)
+
+    async def run():
+        try:
+            other = asyncio.create_task(finish_other_verify())
+            result = await payment.verify_payment_async(db, "ref-1")
+            await other
+            return result
+        finally:
+            await close_async_paystack_client()
+
+    result = asyncio.run(run())
+
+    assert result["status"] == "success"
+    assert gateway.faults.requests == 1
@@ -0,0 +1,151 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from benchmarks.stubs import FakePaystack
+from handlers.paystack import AsyncPaystackClient, PaystackUnavailable
+
+
+def _client(stub: FakePaystack, **options) -> AsyncPaystackClient:
+    options.setdefault("retry_backoff", 0)
+    return AsyncPaystackClient(base_url=stub.url, **options)
+
+
+def _run(client: AsyncPaystackClient, *calls):
+    # Runs the calls one after another on a fresh loop, then closes the client
+    async def run():
+        try:
+            return [await call(client) for call in calls]
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def _call_count(operation: str, status: str) -> float:
+    return REGISTRY.get_sample_value(
+        "delifoods_external_call_duration_seconds_count",
+        {"service": "paystack", "operation": operation, "status": status},
+    ) or 0.0
+
+
+def _initialize(reference: str):
+    return lambda client: client.initialize_transaction({"reference": reference, "amount": 150000, "email": "a@b.io"})
+
+
+def _verify(reference: str):
+    return lambda client: client.verify_transaction(reference)
+
+
+def test_calls_reuse_one_connection(fake_paystack):
+    results = _run(_client(fake_paystack), _initialize("ref-reuse"), *[_verify("ref-reuse")] * 5)
+
+    assert results[0]["data"]["reference"] == "ref-reuse"
+    assert all(result["data"]["status"] == "success" for result in results[1:])
+    assert fake_paystack.faults.requests == 6
+    assert fake_paystack.connections == 1
+
+
+def test_connect_and_read_timeouts_are_separate(fake_paystack):
+    client = _client(fake_paystack, connect_timeout=1.5, read_timeout=7.0)
+    timeout = client._client.timeout
+    asyncio.run(client.close())
+
+    assert timeout.connect == 1.5
+    assert timeout.pool == 1.5
+    assert timeout.read == 7.0
+
+
+def test_slow_response_hits_the_read_timeout():
+    stub = FakePaystack(latency_ms=300).start()
+    try:
+        client = _client(stub, connect_timeout=1.0, read_timeout=0.05, retries=0)
+        with pytest.raises(PaystackUnavailable) as raised:
+            _run(client, _verify("ref-slow"))
+    finally:
+        stub.stop()
+
+    assert isinstance(raised.value.__cause__, httpx.ReadTimeout)
+
+
+def test_verify_is_retried_on_server_errors():
+    stub = FakePaystack(error_rate=1.0).start()
+    try:
+        with pytest.raises(PaystackUnavailable, match="503"):
+            _run(_client(stub, retries=2), _verify("ref-5xx"))
+    finally:
+        stub.stop()
+
+    assert stub.faults.requests == 3
+
+
+def test_initialize_is_never_retried_on_server_errors():
+    stub = FakePaystack(error_rate=1.0).start()
+    try:
+        with pytest.raises(PaystackUnavailable, match="503"):
+            _run(_client(stub, retries=2), _initialize("ref-5xx"))
+    finally:
+        stub.stop()
+
+    assert stub.faults.requests == 1
+
+
+def test_initialize_is_not_retried_after_a_read_timeout():
+    # The request may already have created the transaction
+    stub = FakePaystack(latency_ms=300).start()
+    try:
+        with pytest.raises(PaystackUnavailable) as raised:
+            _run(_client(stub, read_timeout=0.05, retries=2), _initialize("ref-timeout"))
+    finally:
+        stub.stop()
+
+    assert isinstance(raised.value.__cause__, httpx.ReadTimeout)
+
+    assert stub.faults.requests == 1
+
+
+class _InvalidJSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = b"<html>Bad gateway page</html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_invalid_json_raises_paystack_unavailable():
+    stub = FakePaystack()
+    stub._server.RequestHandlerClass = _InvalidJSONHandler
+    stub.start()
+    try:
+        with pytest.raises(PaystackUnavailable, match="Invalid JSON"):
+            _run(_client(stub), _verify("ref-html"))
+    finally:
+        stub.stop()
+
+
+def test_every_attempt_is_recorded_in_the_metrics(fake_paystack):
+    before = {
+        (operation, status): _call_count(operation, status)
+        for operation in ("initialize", "verify") for status in ("success", "error")
+    }
+    _run(_client(fake_paystack), _initialize("ref-metrics"), _verify("ref-metrics"), _verify("ref-metrics"))
+
+    assert _call_count("initialize", "success") - before["initialize", "success"] == 1
+    assert _call_count("verify", "success") - before["verify", "success"] == 2
+
+    fake_paystack.faults.error_rate = 1.0
+    with pytest.raises(PaystackUnavailable):
+        _run(_client(fake_paystack, retries=2), _verify("ref-metrics"))
+
+    assert _call_count("verify", "error") - before["verify", "error"] == 3
+    assert _call_count("initialize", "error") == before["initialize", "error"]
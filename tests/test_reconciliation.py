@@ -0,0 +1,288 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import handlers.payment as payment
+import handlers.paystack as paystack
+import handlers.reconciliation as reconciliation
+import utils.events as events
+from benchmarks.stubs import FakePaystack
+from config import settings
+from database.models import DailySales, Order, Payment, User
+from database.schemas import PaymentStatus
+from handlers.payment import apply_webhook_event
+from handlers.reconciliation import reconcile_payments
+
+
+class _OutcomePaystack(FakePaystack):
+    # Verifies each reference as the outcome it was opened with
+    def open(self, reference: str, outcome: str = "success", amount: int = 150000) -> None:
+        self.transactions[reference] = {"reference": reference, "amount": amount, "outcome": outcome}
+
+    def transaction_status(self, reference: str) -> str:
+        return self.transactions[reference]["outcome"]
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    stub = _OutcomePaystack().start()
+    monkeypatch.setattr(settings, "PAYSTACK_BASE_URL", stub.url)
+    monkeypatch.setattr(settings, "PAYSTACK_RETRIES", 0)
+    monkeypatch.setattr(settings, "PAYSTACK_RETRY_BACKOFF_SECONDS", 0)
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(reconciliation, "redis_client", client)
+    monkeypatch.setattr(events, "redis_client", client)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def customer(db):
+    db.add(User(email="customer@example.com", hashed_password="x", is_active=True))
+    db.commit()
+
+
+def _payment(db, reference: str, age: timedelta) -> None:
+    created_at = datetime.utcnow() - age
+    order = Order(
+        user_id=1, subtotal=1500, delivery_fee=0, service_fee=0, tax=0, total=1500, created_at=created_at,
+    )
+    db.add(order)
+    db.flush()
+    db.add(Payment(
+        order_id=order.id, reference=reference, amount=1500, amount_kobo=150000,
+        status=PaymentStatus.PENDING, created_at=created_at,
+    ))
+    db.commit()
+
+
+def _status(db, reference: str) -> PaymentStatus:
+    db.expire_all()
+    return db.query(Payment).filter_by(reference=reference).one().status
+
+
+def test_stale_payments_are_reconciled(db, gateway):
+    _payment(db, "ref-paid", timedelta(hours=1))
+    _payment(db, "ref-declined", timedelta(hours=2))
+    _payment(db, "ref-abandoned", timedelta(hours=3))
+    gateway.open("ref-paid", "success")
+    gateway.open("ref-declined", "failed")
+    gateway.open("ref-abandoned", "abandoned")
+
+    result = reconcile_payments(db)
+
+    assert {key: result[key] for key in ("checked", "succeeded", "failed", "pending", "errors")} == {
+        "checked": 3, "succeeded": 1, "failed": 1, "pending": 1, "errors": 0,
+    }
+    assert _status(db, "ref-paid") == PaymentStatus.SUCCESS
+    assert _status(db, "ref-declined") == PaymentStatus.FAILED
+    assert _status(db, "ref-abandoned") == PaymentStatus.PENDING
+    assert db.query(Order).join(Payment).filter(Payment.reference == "ref-paid").one().payment_status == "paid"
+
+
+def test_recent_and_expired_payments_are_skipped(db, gateway):
+    _payment(db, "ref-recent", timedelta(seconds=settings.RECONCILE_AFTER_SECONDS - 60))
+    _payment(db, "ref-expired", timedelta(hours=settings.RECONCILE_MAX_AGE_HOURS + 1))
+    _payment(db, "ref-stale", timedelta(hours=1))
+    for reference in ("ref-recent", "ref-expired", "ref-stale"):
+        gateway.open(reference, "success")
+
+    result = reconcile_payments(db)
+
+    assert result["checked"] == 1
+    assert gateway.faults.requests == 1
+    assert _status(db, "ref-recent") == PaymentStatus.PENDING
+    assert _status(db, "ref-expired") == PaymentStatus.PENDING
+    assert _status(db, "ref-stale") == PaymentStatus.SUCCESS
+
+
+def test_unknown_references_are_counted_as_errors(db, gateway):
+    _payment(db, "ref-unknown", timedelta(hours=1))
+    _payment(db, "ref-known", timedelta(hours=1))
+    gateway.open("ref-known", "success")
+
+    result = reconcile_payments(db)
+
+    assert result["checked"] == 2
+    assert result["errors"] == 1
+    assert result["succeeded"] == 1
+    assert _status(db, "ref-unknown") == PaymentStatus.PENDING
+
+
+def test_gateway_outages_are_counted_as_errors(db, gateway):
+    _payment(db, "ref-outage", timedelta(hours=1))
+    gateway.open("ref-outage", "success")
+    gateway.faults.error_rate = 1.0
+
+    result = reconcile_payments(db)
+
+    assert result["errors"] == 1
+    assert _status(db, "ref-outage") == PaymentStatus.PENDING
+
+
+def _record_verify_calls(monkeypatch) -> dict:
+    # Wraps the client's verify to record when each call started and the most
+    # calls in flight at once
+    calls = {"in_flight": 0, "max_in_flight": 0, "started": []}
+    verify = paystack.AsyncPaystackClient.verify_transaction
+
+    async def recording_verify(self, reference):
+        calls["started"].append(time.time())
+        calls["in_flight"] += 1
+        calls["max_in_flight"] = max(calls["max_in_flight"], calls["in_flight"])
+        try:
+            return await verify(self, reference)
+        finally:
+            calls["in_flight"] -= 1
+
+    monkeypatch.setattr(paystack.AsyncPaystackClient, "verify_transaction", recording_verify)
+    return calls
+
+
+def test_concurrency_cap_is_respected(db, gateway, monkeypatch):
+    gateway.faults.latency_ms = 50
+    monkeypatch.setattr(settings, "RECONCILE_CONCURRENCY", 3)
+    monkeypatch.setattr(settings, "RECONCILE_RATE_PER_SECOND", 1000)
+    calls = _record_verify_calls(monkeypatch)
+    for n in range(10):
+        _payment(db, f"ref-{n}", timedelta(hours=1))
+        gateway.open(f"ref-{n}", "success")
+
+    result = reconcile_payments(db)
+
+    assert result["succeeded"] == 10
+    assert calls["max_in_flight"] == 3
+
+
+def test_rate_cap_is_respected(db, gateway, monkeypatch):
+    monkeypatch.setattr(settings, "RECONCILE_CONCURRENCY", 10)
+    monkeypatch.setattr(settings, "RECONCILE_RATE_PER_SECOND", 4)
+    calls = _record_verify_calls(monkeypatch)
+    for n in range(9):
+        _payment(db, f"ref-{n}", timedelta(hours=1))
+        gateway.open(f"ref-{n}", "success")
+
+    result = reconcile_payments(db)
+
+    assert result["succeeded"] == 9
+    per_second: dict[int, int] = {}
+    for started in calls["started"]:
+        per_second[int(started)] = per_second.get(int(started), 0) + 1
+    assert max(per_second.values()) <= 4
+    assert len(per_second) >= 3
+
+
+def test_paystack_client_is_closed_after_the_run(db, gateway):
+    _payment(db, "ref-paid", timedelta(hours=1))
+    gateway.open("ref-paid", "success")
+
+    reconcile_payments(db)
+
+    assert paystack._async_client is None
+
+
+def test_paystack_client_is_closed_when_the_run_fails(db, gateway, monkeypatch):
+    _payment(db, "ref-paid", timedelta(hours=1))
+    gateway.open("ref-paid", "success")
+
+    def broken_apply(*args):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(reconciliation, "apply_verification", broken_apply)
+    with pytest.raises(RuntimeError):
+        reconcile_payments(db)
+
+    assert paystack._async_client is None
+
+
+def _serialize_writers(engine) -> None:
+    # SQLite has no row locks. Starting every transaction with BEGIN IMMEDIATE
+    # makes a second writer wait for the first to commit, as SELECT ... FOR
+    # UPDATE on the payment row does on PostgreSQL.
+    @event.listens_for(engine, "connect")
+    def autocommit_driver(dbapi_connection, record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    engine.dispose()
+
+
+def test_payment_settled_by_a_webhook_during_reconciliation_is_counted_once(db, gateway, monkeypatch):
+    _payment(db, "ref-race", timedelta(hours=1))
+    gateway.open("ref-race", "success")
+    _serialize_writers(db.get_bind())
+    WebhookSession = sessionmaker(bind=db.get_bind())
+
+    receipts, order_events = [], []
+    monkeypatch.setattr("utils.email.send_payment_receipt", lambda to_email, payment_data: receipts.append(payment_data["reference"]))
+    monkeypatch.setattr(payment, "publish_order_event", lambda order_id, user_id, event, *args: order_events.append(event))
+
+    # The webhook locks the payment and holds it for a moment before settling it
+    webhook_locked = threading.Event()
+    locked_payment = payment._locked_payment
+
+    def slow_locked_payment(session, reference):
+        row = locked_payment(session, reference)
+        if threading.current_thread() is webhook:
+            webhook_locked.set()
+            time.sleep(0.3)
+        return row
+
+    def apply_webhook():
+        session = WebhookSession()
+        try:
+            apply_webhook_event(session, {
+                "event": "charge.success",
+                "data": {"reference": "ref-race", "status": "success", "channel": "card"},
+            })
+        finally:
+            session.close()
+
+    webhook = threading.Thread(target=apply_webhook)
+    monkeypatch.setattr(payment, "_locked_payment", slow_locked_payment)
+
+    # Once the sweep has Paystack's answer, the webhook for the same reference
+    # starts; the sweep then applies its answer while the webhook is mid-way
+    verify_references = reconciliation._verify_references
+
+    async def verify_then_race(*args):
+        results = await verify_references(*args)
+        webhook.start()
+        await asyncio.to_thread(webhook_locked.wait, 5)
+        return results
+
+    applied_during_webhook = []
+    apply_verification = reconciliation.apply_verification
+
+    def recording_apply(session, reference, resp_data):
+        applied_during_webhook.append(webhook.is_alive())
+        return apply_verification(session, reference, resp_data)
+
+    monkeypatch.setattr(reconciliation, "_verify_references", verify_then_race)
+    monkeypatch.setattr(reconciliation, "apply_verification", recording_apply)
+
+    result = reconcile_payments(db)
+    webhook.join(5)
+
+    assert applied_during_webhook == [True]
+    assert result["succeeded"] == 1
+    assert result["errors"] == 0
+    assert _status(db, "ref-race") == PaymentStatus.SUCCESS
+    sales = db.query(DailySales).one()
+    assert (sales.orders_paid, sales.paid_total) == (1, 1500)
+    assert receipts == ["ref-race"]
+    assert order_events == ["payment"]
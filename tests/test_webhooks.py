@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import handlers.webhooks as webhooks
+from config import settings
+from database.models import WebhookEvent
+from handlers.webhooks import claim_webhook_events, process_webhook_events, retry_delay
+
+
+@pytest.fixture(autouse=True)
+def no_task_queue(monkeypatch):
+    monkeypatch.setattr(webhooks, "_queue_webhook_processing", lambda: None)
+
+
+@pytest.fixture
+def failing_apply(monkeypatch):
+    calls = []
+
+    def apply(db, payload):
+        calls.append(payload["data"]["reference"])
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(webhooks, "apply_webhook_event", apply)
+    return calls
+
+
+def _event(db, reference: str) -> WebhookEvent:
+    payload = {"event": "charge.success", "data": {"id": 1, "reference": reference}}
+    webhooks.enqueue_webhook_event(db, payload, b"{}")
+    return db.query(WebhookEvent).filter_by(reference=reference).one()
+
+
+def _reload(db, event: WebhookEvent) -> WebhookEvent:
+    db.expire_all()
+    return db.get(WebhookEvent, event.id)
+
+
+def test_retry_delay_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_BACKOFF_SECONDS", 60)
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_MAX_BACKOFF_SECONDS", 300)
+
+    assert [retry_delay(attempts).total_seconds() for attempts in range(1, 6)] == [60, 120, 240, 300, 300]
+
+
+def test_failed_event_is_tried_once_per_run_and_backs_off(db, failing_apply):
+    event = _event(db, "ref-1")
+
+    result = process_webhook_events(db, batch_size=1, max_batches=5)
+
+    assert failing_apply == ["ref-1"]
+    assert result == {"processed": 0, "retried": 1, "failed": 0}
+    event = _reload(db, event)
+    assert event.status == "pending"
+    assert event.attempts == 1
+    assert event.next_attempt_at >= datetime.utcnow() + retry_delay(1) - timedelta(seconds=5)
+
+
+def test_event_is_not_claimed_twice_in_one_run_even_without_backoff(db, failing_apply, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_BACKOFF_SECONDS", 0)
+    _event(db, "ref-1")
+
+    process_webhook_events(db, batch_size=1, max_batches=5)
+
+    assert failing_apply == ["ref-1"]
+
+
+def test_backed_off_event_waits_for_its_next_attempt(db, failing_apply):
+    event = _event(db, "ref-1")
+    process_webhook_events(db)
+
+    assert claim_webhook_events(db, batch_size=10) == []
+
+    event = _reload(db, event)
+    event.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert [row.id for row in claim_webhook_events(db, batch_size=10)] == [event.id]
+
+
+def test_event_is_marked_failed_after_the_last_attempt(db, failing_apply, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 2)
+    event = _event(db, "ref-1")
+
+    process_webhook_events(db)
+    _reload(db, event).next_attempt_at = None
+    db.commit()
+    result = process_webhook_events(db)
+
+    assert result == {"processed": 0, "retried": 0, "failed": 1}
+    event = _reload(db, event)
+    assert event.status == "failed"
+    assert event.next_attempt_at is None
+    assert "database went away" in event.last_error
+
+
+def test_other_events_are_processed_while_one_backs_off(db, monkeypatch):
+    def apply(db, payload):
+        if payload["data"]["reference"] == "ref-bad":
+            raise RuntimeError("bad event")
+        return {"status": "ok"}
+
+    monkeypatch.setattr(webhooks, "apply_webhook_event", apply)
+    bad, good = _event(db, "ref-bad"), _event(db, "ref-good")
+
+    result = process_webhook_events(db)
+
+    assert result == {"processed": 1, "retried": 1, "failed": 0}
+    assert _reload(db, good).status == "processed"
+    assert _reload(db, bad).status == "pending"
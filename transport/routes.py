@@ -1,14 +1,16 @@
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from database.db import get_db
+from database.db import get_db, get_read_db
 from database.models import User
 from database.schemas import (
-    AddressCreate, AddressResponse,
-    CartItemCreate, ExtrasCreate,
+    AddressCreate, AddressResponse, BulkOrderStatusRequest,
+    CartBatchRequest, CartItemCreate, ExtrasCreate,
     FoodItemCreate, FoodItemUpdate,
     PaymentInitiateRequest,
     ProteinCreate,
@@ -20,27 +22,36 @@ from handlers.address import (
     add_address, delete_address, get_user_addresses, set_default_address
 )
 from handlers.admins import (
-    add_extras, add_food_item, add_protein,
-    get_all_orders, get_all_users,
-    mark_food_item_availability, require_admin,
+    add_extras, add_food_item, add_protein, bulk_update_order_status,
+    get_all_orders, get_all_users, get_orders_changed_since,
+    admin_reader, mark_food_item_availability, require_admin,
     update_food_item, update_order_status
 )
+from handlers.analytics import get_sales_analytics
+from handlers.catalog import get_menu_body
 from handlers.food import (
-    clear_cart, fetch_extras, fetch_food_items,
+    apply_cart_operations, clear_cart, fetch_extras,
     add_to_cart, fetch_proteins, get_cart,
-    get_order_by_id, get_user_orders,
+    get_order_by_id, get_order_status, get_user_orders, order_item_names,
     place_order, remove_cart_item,
 )
-from handlers.payment import handle_webhook, initiate_payment, verify_payment
+from handlers.payment import initiate_payment_async, verify_payment_async
 from handlers.user import (
     create_access_token, create_refresh_token, create_user,
-    customer_only, get_active_user,
+    customer_only, customer_reader, get_active_reader, get_active_user,
     get_user_by_email_or_phone,
     resend_otp, revoke_refresh_token, verify_password,
     verify_refresh_token, verify_user_email,
 )
+from handlers.webhooks import receive_webhook
+from utils.events import close_subscription, order_channel, stream_channel, subscribe, user_orders_channel
+from utils.idempotency import request_fingerprint, run_idempotent, run_idempotent_async
+from utils.serialization import EncodedJSONResponse, FastJSONResponse
+from utils.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 
 @router.post("/auth/signup", status_code=status.HTTP_201_CREATED, tags=["Auth"])
@@ -126,8 +137,18 @@ def get_my_profile(current_user: User = Depends(get_active_user)):
 
 
 @router.get("/users/me/orders", tags=["Users"])
-def get_my_orders(current_user: User = Depends(get_active_user), db: Session = Depends(get_db)):
-    return get_user_orders(db, user_id=current_user.id)
+def get_my_orders(current_user: User = Depends(get_active_reader), db: Session = Depends(get_read_db)):
+    return FastJSONResponse(get_user_orders(db, user_id=current_user.id))
+
+
+@router.get("/users/me/orders/events", tags=["Users"])
+async def stream_my_order_events(request: Request, current_user: User = Depends(get_active_user)):
+    # Server-Sent Events for every status or payment change on the user's orders
+    return StreamingResponse(
+        stream_channel(request, await subscribe(user_orders_channel(current_user.id))),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 @router.post("/users/addresses", response_model=AddressResponse, status_code=201, tags=["Addresses"])
@@ -166,8 +187,8 @@ def remove_delivery_address(
 
 
 @router.get("/foods", tags=["Menu"])
-def get_foods(db: Session = Depends(get_db)):
-    return fetch_food_items(db)
+def get_foods(db: Session = Depends(get_read_db)):
+    return EncodedJSONResponse(get_menu_body(db))
 
 
 @router.get("/proteins", tags=["Menu"])
@@ -183,7 +204,7 @@ def get_extras(db: Session = Depends(get_db)):
 
 @router.get("/cart", tags=["Cart"])
 def view_cart(user: User = Depends(customer_only), db: Session = Depends(get_db)):
-    return get_cart(db=db, user_id=user.id)
+    return FastJSONResponse(get_cart(db=db, user_id=user.id))
 
 
 @router.post("/cart/add", tags=["Cart"])
@@ -201,16 +222,16 @@ def add_to_cart_route(
         extras_ids=cart_item.extras_id,
         instructions=cart_item.instructions
     )
-    return {
-        "message": "Item added to cart",
-        "cart_item_id": item.id,
-        "food": item.food_item.name,
-        "protein": item.protein.name if item.protein else None,
-        "extras": [e.name for e in item.extras],
-        "quantity": item.quantity,
-        "unit_price": item.unit_price,
-        "subtotal": item.subtotal
-    }
+    return {"message": "Item added to cart", **item}
+
+
+@router.post("/cart/batch", tags=["Cart"])
+def batch_update_cart(
+    batch: CartBatchRequest,
+    user: User = Depends(customer_only),
+    db: Session = Depends(get_db)
+):
+    return apply_cart_operations(db=db, user_id=user.id, operations=batch.operations)
 
 
 @router.delete("/cart/items/{cart_item_id}", tags=["Cart"])
@@ -231,62 +252,98 @@ def clear_user_cart(user: User = Depends(customer_only), db: Session = Depends(g
 def create_order(
     instructions: Optional[str] = None,
     delivery_address_id: Optional[int] = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
     current_user: User = Depends(customer_only)
 ):
-    order = place_order(db, current_user, instructions, delivery_address_id)
+    def _place():
+        order = place_order(db, current_user, instructions, delivery_address_id)
+
+        return {
+            "order_id": order.id,
+            "status": order.current_status.value,
+            "payment_status": order.payment_status,
+            "subtotal": order.subtotal,
+            "delivery_fee": order.delivery_fee,
+            "service_fee": order.service_fee,
+            "tax": order.tax,
+            "total": order.total,
+            "instructions": order.special_instructions,
+            "items": [
+                {
+                    **order_item_names(item),
+                    "unit_price": item.unit_price,
+                    "quantity": item.quantity,
+                    "item_total": item.subtotal
+                } for item in order.order_items
+            ],
+            "created_at": order.created_at,
+            "next_step": "Call POST /payments/initiate to pay for this order"
+        }
 
-    return {
-        "order_id": order.id,
-        "status": order.current_status.value,
-        "payment_status": order.payment_status,
-        "subtotal": order.subtotal,
-        "delivery_fee": order.delivery_fee,
-        "service_fee": order.service_fee,
-        "tax": order.tax,
-        "total": order.total,
-        "instructions": order.special_instructions,
-        "items": [
-            {
-                "food": item.food_item.name,
-                "protein": item.protein.name if item.protein else None,
-                "extras": [e.name for e in item.extras],
-                "unit_price": item.unit_price,
-                "quantity": item.quantity,
-                "item_total": item.subtotal
-            } for item in order.order_items
-        ],
-        "created_at": order.created_at,
-        "next_step": "Call POST /payments/initiate to pay for this order"
-    }
+    return run_idempotent(
+        idempotency_key,
+        scope=f"orders:{current_user.id}",
+        fingerprint=request_fingerprint(instructions, delivery_address_id),
+        handler=_place,
+    )
 
 
 @router.get("/orders/{order_id}", tags=["Orders"])
 def fetch_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(customer_only)
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(customer_reader)
 ):
     return get_order_by_id(db, user_id=current_user.id, order_id=order_id)
 
 
 
+@router.get("/orders/{order_id}/events", tags=["Orders"])
+async def stream_order_events(
+    order_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(customer_only)
+):
+    # The first event is the current state, so clients don't need a separate GET.
+    # Subscribing first means a change made while the snapshot is read still
+    # arrives as an event.
+    pubsub = await subscribe(order_channel(order_id))
+    try:
+        snapshot = await run_in_threadpool(get_order_status, db, current_user.id, order_id)
+    except BaseException:
+        await close_subscription(pubsub)
+        raise
+    return StreamingResponse(
+        stream_channel(request, pubsub, initial=snapshot),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 @router.post("/payments/initiate", tags=["Payments"])
-def initiate_payment_route(
+async def initiate_payment_route(
     data: PaymentInitiateRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(customer_only),
     db: Session = Depends(get_db)
 ):
-    return initiate_payment(db=db, order_id=data.order_id, user=current_user)
+    return await run_idempotent_async(
+        idempotency_key,
+        scope=f"payments:initiate:{current_user.id}",
+        fingerprint=request_fingerprint(data.order_id),
+        handler=lambda: initiate_payment_async(db=db, order_id=data.order_id, user=current_user),
+    )
 
 
 @router.get("/payments/{reference}/verify", tags=["Payments"])
-def verify_payment_route(
+async def verify_payment_route(
     reference: str,
     current_user: User = Depends(customer_only),
     db: Session = Depends(get_db)
 ):
-    return verify_payment(db=db, reference=reference, user=current_user)
+    return await verify_payment_async(db=db, reference=reference, user=current_user)
 
 
 @router.post("/payments/webhook", tags=["Payments"])
@@ -295,22 +352,13 @@ async def paystack_webhook(
     db: Session = Depends(get_db),
     x_paystack_signature: str = Header(None)
 ):
+    # Paystack retries slow replies, so only verify and store the event here;
+    # workers.tasks.process_webhook_events_task applies it
     raw_body = await request.body()
-    try:
-        import json
-        payload = json.loads(raw_body)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid JSON payload")
-
     if not x_paystack_signature:
         raise HTTPException(status_code=400, detail="Missing Paystack signature header")
 
-    return handle_webhook(
-        db=db,
-        payload=payload,
-        raw_body=raw_body,
-        signature=x_paystack_signature
-    )
+    return await run_in_threadpool(receive_webhook, db, raw_body, x_paystack_signature)
 
 
 @router.post("/admin/foods", tags=["Admin"])
@@ -381,10 +429,29 @@ def route_mark_availability(
 
 @router.get("/admin/orders", tags=["Admin"])
 def route_get_all_orders(
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(admin_reader)
+):
+    return FastJSONResponse(get_all_orders(db))
+
+
+@router.get("/admin/orders/changes", tags=["Admin"])
+def route_get_order_changes(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=None, ge=1),
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin)
 ):
-    return get_all_orders(db)
+    return get_orders_changed_since(db, cursor=cursor, limit=limit)
+
+
+@router.patch("/admin/orders/status", tags=["Admin"])
+def route_bulk_update_order_status(
+    status_update: BulkOrderStatusRequest,
+    db: Session = Depends(get_db),
+    admin: User = Depends(require_admin)
+):
+    return bulk_update_order_status(db=db, order_ids=status_update.order_ids, new_status=status_update.new_status)
 
 
 @router.patch("/admin/orders/{order_id}/status", tags=["Admin"])
@@ -397,10 +464,21 @@ def route_update_order_status(
     return update_order_status(db=db, order_id=order_id, new_status=status_update.new_status)
 
 
-@router.get("/admin/users", tags=["Admin"])
-def route_get_all_users(
+@router.get("/admin/analytics", tags=["Admin"])
+def route_get_sales_analytics(
+    days: int = Query(default=7, ge=1, le=366),
+    hours: int = Query(default=24, ge=1, le=168),
+    top: int = Query(default=10, ge=1, le=50),
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin)
+):
+    return get_sales_analytics(db, days=days, hours=hours, top=top)
+
+
+@router.get("/admin/users", tags=["Admin"])
+def route_get_all_users(
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(admin_reader)
 ):
     users = get_all_users(db)
     return [
@@ -1,11 +1,13 @@
 import smtplib
 import logging
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from typing import Optional
 from jinja2 import Template
 from config import settings
+from utils.metrics import observe_external_call
 
 logger = logging.getLogger(__name__)
 
@@ -182,6 +184,7 @@ STATUS_MESSAGES = {
 
 
 def _send_via_smtp(to_email: str, subject: str, html_body: str) -> bool:
+    started = time.perf_counter()
     try:
         msg = MIMEMultipart("alternative")
         msg["Subject"] = subject
@@ -196,14 +199,17 @@ def _send_via_smtp(to_email: str, subject: str, html_body: str) -> bool:
                 server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
             server.sendmail(settings.FROM_EMAIL, to_email, msg.as_string())
 
+        observe_external_call("smtp", "send", "success", started)
         logger.info(f"[EMAIL-SMTP] Sent to {to_email}: {subject}")
         return True
     except Exception as e:
+        observe_external_call("smtp", "send", "error", started)
         logger.error(f"[EMAIL-SMTP] Failed to send to {to_email}: {e}")
         return False
 
 
 def _send_via_sendgrid(to_email: str, subject: str, html_body: str) -> bool:
+    started = time.perf_counter()
     try:
         from sendgrid import SendGridAPIClient
         from sendgrid.helpers.mail import Mail
@@ -214,11 +220,14 @@ def _send_via_sendgrid(to_email: str, subject: str, html_body: str) -> bool:
             subject=subject,
             html_content=html_body
         )
-        sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
+        sg = SendGridAPIClient(settings.SENDGRID_API_KEY, host=settings.SENDGRID_API_HOST)
         response = sg.send(message)
+        sent = response.status_code in (200, 202)
+        observe_external_call("sendgrid", "send", "success" if sent else "error", started)
         logger.info(f"[EMAIL-SENDGRID] Sent to {to_email}: {subject} | status={response.status_code}")
-        return response.status_code in (200, 202)
+        return sent
     except Exception as e:
+        observe_external_call("sendgrid", "send", "error", started)
         logger.error(f"[EMAIL-SENDGRID] Failed to send to {to_email}: {e}")
         return False
 
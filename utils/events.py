@@ -0,0 +1,100 @@
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+import redis
+import redis.asyncio as aioredis
+from fastapi import Request
+
+from config import settings
+from handlers.user import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Order updates are fanned out through Redis pub/sub so every API worker can
+# push them to the clients it holds open, whichever worker made the change.
+async_redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+def order_channel(order_id: int) -> str:
+    return f"events:orders:{order_id}"
+
+
+def user_orders_channel(user_id: int) -> str:
+    return f"events:users:{user_id}:orders"
+
+
+def publish_order_event(
+    order_id: int,
+    user_id: Optional[int],
+    event: str,
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+) -> None:
+    publish_order_events([(order_id, user_id, event, status, payment_status)])
+
+
+def publish_order_events(events: list[tuple]) -> None:
+    # (order_id, user_id, event, status, payment_status) tuples, sent in one round trip.
+    # Best effort: a lost event only delays the client until its next reconnect snapshot
+    if not events:
+        return
+    at = datetime.utcnow().isoformat()
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for order_id, user_id, event, status, payment_status in events:
+            message = json.dumps({
+                "event": event,
+                "order_id": order_id,
+                "status": status,
+                "payment_status": payment_status,
+                "at": at,
+            })
+            pipe.publish(order_channel(order_id), message)
+            if user_id is not None:
+                pipe.publish(user_orders_channel(user_id), message)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"[EVENTS] Failed to publish {len(events)} order event(s): {e}")
+
+
+def format_sse(data: str, event: str = "order") -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def subscribe(channel: str) -> aioredis.client.PubSub:
+    pubsub = async_redis.pubsub()
+    await pubsub.subscribe(channel)
+    return pubsub
+
+
+async def close_subscription(pubsub: aioredis.client.PubSub) -> None:
+    await pubsub.unsubscribe()
+    await pubsub.aclose()
+
+
+async def stream_channel(
+    request: Request, pubsub: aioredis.client.PubSub, initial: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    # Yields Server-Sent Events from an already subscribed channel until the
+    # client goes away. Callers subscribe before reading any snapshot they pass
+    # as `initial`, so a change made in between is delivered rather than lost.
+    # A comment line is sent every SSE_HEARTBEAT_SECONDS to keep proxies from
+    # closing an idle connection.
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        if initial is not None:
+            yield format_sse(json.dumps(initial, default=str))
+
+        while not await request.is_disconnected():
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=settings.SSE_HEARTBEAT_SECONDS,
+            )
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(message["data"])
+    finally:
+        await close_subscription(pubsub)
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+import redis
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from redis.exceptions import LockError
+from redis.lock import Lock
+
+from config import settings
+from handlers.user import redis_client
+
+logger = logging.getLogger(__name__)
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def request_fingerprint(*parts: Any) -> str:
+    # Identifies the request payload so a key can't be reused for a different request
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(stored: str, fingerprint: str) -> JSONResponse:
+    record = json.loads(stored)
+    if record["fingerprint"] != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    return JSONResponse(
+        content=record["body"],
+        status_code=record["status_code"],
+        headers={REPLAY_HEADER: "true"},
+    )
+
+
+def _claim(key: str, scope: str, fingerprint: str) -> tuple[Optional[JSONResponse], Optional[Lock]]:
+    # (replay, None) when a stored response exists, (None, lock) when this
+    # request should run the handler, (None, None) when Redis is unavailable
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+
+    response_key = f"idempotency:{scope}:{key}"
+    try:
+        stored = redis_client.get(response_key)
+        if stored:
+            return _replay(stored, fingerprint), None
+
+        lock = redis_client.lock(
+            f"{response_key}:lock",
+            timeout=settings.IDEMPOTENCY_LOCK_SECONDS,
+            blocking_timeout=settings.IDEMPOTENCY_WAIT_SECONDS,
+            # run_idempotent_async may release from another threadpool thread
+            thread_local=False,
+        )
+        acquired = lock.acquire()
+    except redis.RedisError as e:
+        # Don't turn a Redis outage into a checkout outage
+        logger.error(f"[IDEMPOTENCY] Redis unavailable, running {scope} without idempotency: {e}")
+        return None, None
+
+    if not acquired:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed",
+        )
+
+    try:
+        stored = redis_client.get(response_key)
+    except redis.RedisError:
+        stored = None
+    if stored:
+        _release(lock)
+        return _replay(stored, fingerprint), None
+    return None, lock
+
+
+def _store(key: str, scope: str, fingerprint: str, result: Any, status_code: int) -> JSONResponse:
+    body = jsonable_encoder(result)
+    try:
+        redis_client.setex(
+            f"idempotency:{scope}:{key}",
+            settings.IDEMPOTENCY_TTL_SECONDS,
+            json.dumps({"fingerprint": fingerprint, "status_code": status_code, "body": body}),
+        )
+    except redis.RedisError as e:
+        # The handler has already committed; failing here would invite a retry
+        # that repeats it. Return the result, a retry just won't be replayed.
+        logger.error(f"[IDEMPOTENCY] Could not store the {scope} response for replay: {e}")
+    return JSONResponse(content=body, status_code=status_code)
+
+
+def _release(lock: Lock) -> None:
+    try:
+        lock.release()
+    except (LockError, redis.RedisError):
+        pass
+
+
+def run_idempotent(
+    key: Optional[str],
+    scope: str,
+    fingerprint: str,
+    handler: Callable[[], Any],
+    status_code: int = status.HTTP_200_OK,
+):
+    # Runs handler() at most once per (scope, key) within IDEMPOTENCY_TTL_SECONDS.
+    # The first successful response is stored in Redis and replayed for retries;
+    # concurrent duplicates wait on a lock and then replay it. Errors are not
+    # stored, so a failed request can be retried with the same key.
+    if not key:
+        return handler()
+
+    replay, lock = _claim(key, scope, fingerprint)
+    if replay is not None:
+        return replay
+    if lock is None:
+        return handler()
+
+    try:
+        return _store(key, scope, fingerprint, handler(), status_code)
+    finally:
+        _release(lock)
+
+
+async def run_idempotent_async(
+    key: Optional[str],
+    scope: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int = status.HTTP_200_OK,
+):
+    # run_idempotent() for async handlers; the blocking Redis calls run in the threadpool
+    if not key:
+        return await handler()
+
+    replay, lock = await run_in_threadpool(_claim, key, scope, fingerprint)
+    if replay is not None:
+        return replay
+    if lock is None:
+        return await handler()
+
+    try:
+        result = await handler()
+        return await run_in_threadpool(_store, key, scope, fingerprint, result, status_code)
+    finally:
+        await run_in_threadpool(_release, lock)
@@ -0,0 +1,210 @@
+import os
+import time
+
+import anyio.to_thread
+import redis
+from prometheus_client import REGISTRY, CollectorRegistry, Gauge, Histogram, multiprocess
+
+from utils.tracing import add_phase, record_span, route_template
+
+# Shared label scheme for every process (API and Celery workers):
+#   - the unit of work is identified by one label (`route` for HTTP, `task` for Celery)
+#   - its outcome is always reported in a `status` label
+#   - calls to third parties use `service` / `operation` / `status`
+# Set PROMETHEUS_MULTIPROC_DIR when running several processes per host
+# (uvicorn --workers, celery prefork) so samples are aggregated on scrape.
+
+NAMESPACE = "delifoods"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RETRY_BUCKETS = (0, 1, 2, 3, 5, 10)
+DB_STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+REDIS_BUCKETS = (0.0002, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+
+TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time a task spent in the broker between publish (or ETA) and execution",
+    ["task"],
+    namespace=NAMESPACE,
+    buckets=QUEUE_WAIT_BUCKETS,
+)
+
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Task execution time",
+    ["task", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+TASK_RETRIES = Histogram(
+    "celery_task_retries",
+    "Number of retries a task needed before reaching a final state",
+    ["task", "status"],
+    namespace=NAMESPACE,
+    buckets=RETRY_BUCKETS,
+)
+
+EXTERNAL_CALL_LATENCY = Histogram(
+    "external_call_duration_seconds",
+    "Latency of calls to third-party services (email providers, payment gateway, ...)",
+    ["service", "operation", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Time spent in the database driver per SQL statement",
+    ["operation"],
+    namespace=NAMESPACE,
+    buckets=DB_STATEMENT_BUCKETS,
+)
+
+DB_REQUEST_QUERIES = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed while handling one HTTP request",
+    ["route"],
+    namespace=NAMESPACE,
+    buckets=QUERY_COUNT_BUCKETS,
+)
+
+DB_REQUEST_TIME = Histogram(
+    "db_time_per_request_seconds",
+    "Total time spent in SQL statements while handling one HTTP request",
+    ["route"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response starts, per route template (its _count is the request rate)",
+    ["method", "route", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the SQLAlchemy pool",
+    ["pool"],
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections open beyond pool_size (bounded by max_overflow)",
+    ["pool"],
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    ["pool"],
+    namespace=NAMESPACE,
+    buckets=DB_STATEMENT_BUCKETS,
+)
+
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trip per command (PIPELINE for a whole pipeline)",
+    ["command", "status"],
+    namespace=NAMESPACE,
+    buckets=REDIS_BUCKETS,
+)
+
+THREADPOOL_BUSY = Gauge(
+    "threadpool_busy_threads",
+    "Worker threads running sync endpoints and dependencies",
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+
+THREADPOOL_WAITING = Gauge(
+    "threadpool_waiting_tasks",
+    "Calls queued for a worker thread; above zero the threadpool is saturated",
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+
+THREADPOOL_SIZE = Gauge(
+    "threadpool_size_threads",
+    "Worker thread limit",
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+
+
+def observe_http_request(scope: dict, status_code: int, started: float) -> None:
+    HTTP_REQUEST_DURATION.labels(scope.get("method", ""), route_template(scope), str(status_code)).observe(
+        time.perf_counter() - started
+    )
+
+
+def observe_threadpool() -> None:
+    # Must run on the event loop; cheap enough to sample on every request
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    THREADPOOL_BUSY.set(statistics.borrowed_tokens)
+    THREADPOOL_WAITING.set(statistics.tasks_waiting)
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error=True):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = super().execute(raise_on_error)
+            status = "success"
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            REDIS_COMMAND_DURATION.labels("PIPELINE", status).observe(elapsed)
+            add_phase("redis", elapsed)
+
+
+class InstrumentedRedis(redis.Redis):
+    # redis.Redis that times every command; use InstrumentedRedis.from_url
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = super().execute_command(*args, **options)
+            status = "success"
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            command = args[0] if isinstance(args[0], str) else args[0].decode()
+            REDIS_COMMAND_DURATION.labels(command.upper(), status).observe(elapsed)
+            add_phase("redis", elapsed)
+
+    def pipeline(self, transaction=True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+EXTERNAL_PHASES = {"paystack": "gateway", "smtp": "email", "sendgrid": "email"}
+
+
+def observe_external_call(service: str, operation: str, status: str, started: float) -> None:
+    # `started` is a time.perf_counter() reading taken before the call
+    EXTERNAL_CALL_LATENCY.labels(service, operation, status).observe(time.perf_counter() - started)
+    record_span(f"{service}.{operation}", EXTERNAL_PHASES.get(service, service), started)
+
+
+def build_registry() -> CollectorRegistry:
+    # In multi-process mode every process writes its samples to PROMETHEUS_MULTIPROC_DIR
+    # and the exporter has to merge them; otherwise the default registry is enough.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
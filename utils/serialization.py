@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+
+
+def _default(obj):
+    # orjson already handles datetime, date, enums, UUIDs and dataclasses
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    # The app's default response class. FastAPI still runs jsonable_encoder
+    # over whatever an endpoint returns; endpoints that return plain dicts and
+    # lists can return a FastJSONResponse themselves to skip that pass.
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class EncodedJSONResponse(Response):
+    # For bodies that were encoded ahead of time (and cached)
+    media_type = "application/json"
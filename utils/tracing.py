@@ -0,0 +1,281 @@
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi.routing import APIRoute
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lightweight tracing: one Trace per HTTP request or Celery task. Hot paths
+# (SQL statements, Redis commands) only add to per-phase totals; spans are
+# kept for the coarse steps (auth, gateway calls, email sends).
+# The request id is the trace id, and Celery tasks carry it in their headers.
+
+TRACE_ID_HEADER = "trace_id"
+PARENT_SPAN_HEADER = "parent_span_id"
+
+# Server-Timing order; anything else recorded follows in insertion order
+PHASE_ORDER = ("auth", "db", "redis", "gateway", "email", "app", "render")
+
+
+def _new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def route_template(scope: dict) -> str:
+    # The matched route's path ("/orders/{order_id}"), so raw paths never
+    # become label values
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+@dataclass
+class Trace:
+    # Mutated in place. Sync endpoints and dependencies run in the threadpool
+    # with a copy of the request's context, so the object is shared rather
+    # than the ContextVar being set again.
+    trace_id: str
+    kind: str                        # "request" or "task"
+    name: str = ""                   # task name; requests use their route template
+    parent_id: Optional[str] = None  # the span that published a task
+    scope: Optional[dict] = field(default=None, repr=False)
+    span_id: str = field(default_factory=_new_span_id)
+    started: float = field(default_factory=time.perf_counter)
+    start_time: float = field(default_factory=time.time)
+    phases: dict = field(default_factory=dict)   # phase -> [seconds, count]
+    spans: list = field(default_factory=list)
+    endpoint_finished: Optional[float] = None
+
+    @property
+    def route(self) -> str:
+        # The router fills in scope["route"] after the middleware has started
+        return route_template(self.scope) if self.scope is not None else self.name
+
+    @property
+    def method(self) -> Optional[str]:
+        return self.scope.get("method") if self.scope is not None else None
+
+    def add(self, phase: str, seconds: float) -> None:
+        entry = self.phases.get(phase)
+        if entry is None:
+            self.phases[phase] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def phase_seconds(self, phase: str) -> float:
+        return self.phases.get(phase, (0.0, 0))[0]
+
+    def phase_count(self, phase: str) -> int:
+        return self.phases.get(phase, (0.0, 0))[1]
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("trace_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def start_trace(
+    trace_id: str, kind: str, name: str = "", parent_id: str = None, scope: dict = None,
+) -> tuple[Trace, Token]:
+    trace = Trace(trace_id=trace_id, kind=kind, name=name, parent_id=parent_id, scope=scope)
+    return trace, _current.set(trace)
+
+
+def end_trace(token: Token) -> None:
+    _current.reset(token)
+
+
+def add_phase(phase: str, seconds: float) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.add(phase, seconds)
+
+
+@contextmanager
+def span(name: str, phase: str = None):
+    # A timed child span of the current trace; a no-op outside one
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+
+    span_id = _new_span_id()
+    parent_id = _current_span.get() or trace.span_id
+    token = _current_span.set(span_id)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_span.reset(token)
+        trace.spans.append({
+            "name": name,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "offset_ms": round((started - trace.started) * 1000, 3),
+            "duration_ms": round(elapsed * 1000, 3),
+        })
+        if phase:
+            trace.add(phase, elapsed)
+
+
+def record_span(name: str, phase: str, started: float) -> None:
+    # For calls already timed by their caller (`started` from time.perf_counter())
+    trace = _current.get()
+    if trace is None:
+        return
+    elapsed = time.perf_counter() - started
+    trace.spans.append({
+        "name": name,
+        "span_id": _new_span_id(),
+        "parent_id": _current_span.get() or trace.span_id,
+        "offset_ms": round((started - trace.started) * 1000, 3),
+        "duration_ms": round(elapsed * 1000, 3),
+    })
+    trace.add(phase, elapsed)
+
+
+def propagation_headers() -> dict:
+    # Headers for a Celery message published from inside a trace
+    trace = _current.get()
+    if trace is None:
+        return {}
+    return {TRACE_ID_HEADER: trace.trace_id, PARENT_SPAN_HEADER: _current_span.get() or trace.span_id}
+
+
+def _ordered_phases(trace: Trace) -> list[str]:
+    return [p for p in PHASE_ORDER if p in trace.phases] + [p for p in trace.phases if p not in PHASE_ORDER]
+
+
+def server_timing(trace: Trace, total: float) -> str:
+    entries = []
+    for phase in _ordered_phases(trace):
+        seconds, count = trace.phases[phase]
+        entry = f"{phase};dur={seconds * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="{count}x"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def finish_trace(trace: Trace, status: str, total: float) -> None:
+    # Logs the phase breakdown (INFO at TRACE_LOG_THRESHOLD_MS, DEBUG below)
+    # and hands the trace to the file exporter
+    phases = {
+        phase: {"ms": round(trace.phases[phase][0] * 1000, 3), "count": trace.phases[phase][1]}
+        for phase in _ordered_phases(trace)
+    }
+    total_ms = total * 1000
+    label = f"{trace.method} {trace.route}" if trace.kind == "request" else trace.route
+    level = logging.INFO if total_ms >= settings.TRACE_LOG_THRESHOLD_MS else logging.DEBUG
+    if logger.isEnabledFor(level):
+        breakdown = " ".join(f"{phase}={values['ms']:.1f}ms" for phase, values in phases.items())
+        logger.log(
+            level,
+            f"[TRACE] {label} {status} in {total_ms:.1f}ms ({breakdown or 'no phases'})",
+            extra={"duration_ms": round(total_ms, 3), "phases": phases, "parent_span_id": trace.parent_id},
+        )
+
+    if settings.TRACE_EXPORT_PATH:
+        _exporter.write({
+            "trace_id": trace.trace_id,
+            "span_id": trace.span_id,
+            "parent_id": trace.parent_id,
+            "kind": trace.kind,
+            "name": label,
+            "status": status,
+            "start": datetime.fromtimestamp(trace.start_time, timezone.utc).isoformat(),
+            "duration_ms": round(total_ms, 3),
+            "phases": phases,
+            "spans": trace.spans,
+        })
+
+
+class FileExporter:
+    # Appends one JSON line per finished trace; every process (API workers,
+    # Celery children) can share one file, joined on trace_id
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, default=str) + "\n"
+        try:
+            with self._lock:
+                if self._file is None or self._path != settings.TRACE_EXPORT_PATH:
+                    self._path = settings.TRACE_EXPORT_PATH
+                    self._file = open(self._path, "a", encoding="utf-8", buffering=1)
+                self._file.write(line)
+        except OSError as e:
+            logger.warning(f"[TRACE] Could not export trace {record['trace_id']}: {e}")
+
+
+_exporter = FileExporter()
+
+
+class TraceLogFilter(logging.Filter):
+    # Adds request_id and span_id to every record logged inside a trace
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = _current.get()
+        if trace is not None:
+            if not hasattr(record, "request_id"):
+                record.request_id = trace.trace_id
+            if not hasattr(record, "span_id"):
+                record.span_id = _current_span.get() or trace.span_id
+        return True
+
+
+def _endpoint_finished(started: float) -> None:
+    trace = _current.get()
+    if trace is not None:
+        now = time.perf_counter()
+        trace.add("app", now - started)
+        trace.endpoint_finished = now
+
+
+class TracedRoute(APIRoute):
+    # Times the endpoint function itself, so the middleware can tell the
+    # handler's time apart from response validation and serialization
+    # ("render")
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if not getattr(call, "_traced", False):
+            if asyncio.iscoroutinefunction(call):
+                @functools.wraps(call)
+                async def timed(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return await call(*args, **kwargs)
+                    finally:
+                        _endpoint_finished(started)
+            else:
+                @functools.wraps(call)
+                def timed(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return call(*args, **kwargs)
+                    finally:
+                        _endpoint_finished(started)
+            timed._traced = True
+            self.dependant.call = timed
+        return super().get_route_handler()
@@ -31,4 +31,24 @@ celery_app.conf.update(
 
     # Suppress Celery 6.0 deprecation warning
     broker_connection_retry_on_startup=True,
-)
\ No newline at end of file
+
+    # Periodic jobs (run with: celery -A workers.celery_app beat)
+    beat_schedule={
+        "archive-finished-orders": {
+            "task": "workers.tasks.archive_orders_task",
+            "schedule": settings.ARCHIVE_INTERVAL_SECONDS,
+        },
+        "process-webhook-inbox": {
+            "task": "workers.tasks.process_webhook_events_task",
+            "schedule": settings.WEBHOOK_SWEEP_INTERVAL_SECONDS,
+            "kwargs": {"purge": True},
+        },
+        "reconcile-pending-payments": {
+            "task": "workers.tasks.reconcile_payments_task",
+            "schedule": settings.RECONCILE_INTERVAL_SECONDS,
+        },
+    },
+)
+
+# Signal handlers for task metrics (publish side and worker side)
+import workers.instrumentation  # noqa: E402,F401
@@ -0,0 +1,134 @@
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+
+from celery import signals
+from prometheus_client import multiprocess, start_http_server
+
+from config import settings
+from utils.metrics import TASK_DURATION, TASK_QUEUE_WAIT, TASK_RETRIES, build_registry
+from utils.tracing import (
+    PARENT_SPAN_HEADER, TRACE_ID_HEADER, TraceLogFilter, current_trace, end_trace, finish_trace,
+    propagation_headers, start_trace,
+)
+
+logger = logging.getLogger(__name__)
+
+ENQUEUED_AT_HEADER = "enqueued_at"
+
+# task_id -> perf_counter() at task_prerun, only ever touched by the executing process
+_task_started: dict[str, float] = {}
+
+# task_id -> (Trace, ContextVar token), same lifetime as _task_started
+_task_traces: dict = {}
+
+
+def _ready_at(request) -> float | None:
+    # A task is "ready" when it is published, or when its ETA/countdown expires
+    enqueued_at = getattr(request, ENQUEUED_AT_HEADER, None)
+    if enqueued_at is None:
+        return None
+
+    ready_at = float(enqueued_at)
+    eta = getattr(request, "eta", None)
+    if eta:
+        try:
+            eta_ts = (eta if isinstance(eta, datetime) else datetime.fromisoformat(eta)).timestamp()
+            ready_at = max(ready_at, eta_ts)
+        except (TypeError, ValueError):
+            pass
+    return ready_at
+
+
+@signals.before_task_publish.connect
+def stamp_enqueue_time(headers=None, **kwargs):
+    # Retries are re-published with the original headers, so always overwrite
+    # the enqueue time but keep the original trace
+    if headers is not None:
+        headers[ENQUEUED_AT_HEADER] = time.time()
+        for key, value in propagation_headers().items():
+            headers.setdefault(key, value)
+
+
+@signals.task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    if not settings.METRICS_ENABLED or task is None:
+        return
+
+    ready_at = _ready_at(task.request)
+    if ready_at is not None:
+        TASK_QUEUE_WAIT.labels(task.name).observe(max(0.0, time.time() - ready_at))
+
+    _task_started[task_id] = time.perf_counter()
+
+
+@signals.task_prerun.connect
+def start_task_trace(task_id=None, task=None, **kwargs):
+    if task is None:
+        return
+    trace_id = getattr(task.request, TRACE_ID_HEADER, None)
+    parent_id = getattr(task.request, PARENT_SPAN_HEADER, None)
+    if trace_id is None:
+        # Eager tasks run inline, inside the caller's trace
+        parent = current_trace()
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        parent_id = propagation_headers().get(PARENT_SPAN_HEADER)
+    _task_traces[task_id] = start_trace(trace_id, "task", name=task.name, parent_id=parent_id)
+
+
+@signals.task_postrun.connect
+def finish_task_trace(task_id=None, task=None, state=None, **kwargs):
+    entry = _task_traces.pop(task_id, None)
+    if entry is None:
+        return
+    trace, token = entry
+    finish_trace(trace, (state or "unknown").lower(), time.perf_counter() - trace.started)
+    end_trace(token)
+
+
+@signals.after_setup_logger.connect
+@signals.after_setup_task_logger.connect
+def add_trace_log_filter(logger=None, **kwargs):
+    # Puts request_id (the trace id) on every record logged while a task runs
+    for handler in (logger.handlers if logger else []):
+        handler.addFilter(TraceLogFilter())
+
+
+@signals.task_postrun.connect
+def record_task_end(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is None or task is None:
+        return
+
+    status = (state or "unknown").lower()
+    TASK_DURATION.labels(task.name, status).observe(time.perf_counter() - started)
+
+    # A RETRY state is an intermediate attempt; retries are counted once the task settles
+    if status != "retry":
+        TASK_RETRIES.labels(task.name, status).observe(task.request.retries or 0)
+
+
+@signals.worker_init.connect
+def start_metrics_server(**kwargs):
+    if not settings.METRICS_ENABLED or not settings.WORKER_METRICS_PORT:
+        return
+
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        logger.warning(
+            "[METRICS] PROMETHEUS_MULTIPROC_DIR is not set — samples recorded in "
+            "prefork child processes will not be visible on the worker endpoint"
+        )
+
+    try:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=build_registry())
+        logger.info(f"[METRICS] Worker metrics exposed on :{settings.WORKER_METRICS_PORT}/metrics")
+    except OSError as e:
+        logger.error(f"[METRICS] Could not start worker metrics server: {e}")
+
+
+@signals.worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
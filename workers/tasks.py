@@ -97,6 +97,36 @@ def send_status_update_task(self, email: str, order_id: int, new_status: str):
         raise self.retry(exc=exc)
 
 
+@celery_app.task(
+    name="workers.tasks.send_status_updates_task",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+)
+def send_status_updates_task(self, notifications: list[dict]):
+    # Batch of {"email", "order_id", "new_status"} from a bulk status change.
+    # A retry only resends the emails that failed.
+    from utils.email import send_order_status_update
+
+    failed = []
+    for notification in notifications:
+        try:
+            if not send_order_status_update(
+                to_email=notification["email"],
+                order_id=notification["order_id"],
+                new_status=notification["new_status"],
+            ):
+                failed.append(notification)
+        except Exception as exc:
+            logger.error(f"[TASK:STATUS] Failed for {notification['email']} order=#{notification['order_id']}: {exc}")
+            failed.append(notification)
+
+    logger.info(f"[TASK:STATUS] Batch status updates sent={len(notifications) - len(failed)} failed={len(failed)}")
+    if failed:
+        raise self.retry(args=[failed])
+    return {"status": "sent", "count": len(notifications)}
+
+
 @celery_app.task(
     name="workers.tasks.send_email_task",
     bind=True,
@@ -111,3 +141,84 @@ def send_email_task(self, to_email: str, subject: str, html_body: str):
     except Exception as exc:
         logger.error(f"[TASK:EMAIL] Generic send failed to {to_email}: {exc}")
         raise self.retry(exc=exc)
+
+
+@celery_app.task(name="workers.tasks.archive_orders_task")
+def archive_orders_task():
+    from redis.exceptions import LockError
+
+    from config import settings
+    from database.db import SessionLocal
+    from handlers.archive import archive_orders
+    from handlers.user import redis_client
+
+    # Runs are bounded, but a slow one could still overlap the next beat tick
+    lock = redis_client.lock("archive:orders:lock", timeout=settings.ARCHIVE_INTERVAL_SECONDS)
+    if not lock.acquire(blocking=False):
+        logger.info("[TASK:ARCHIVE] Previous archival run still in progress, skipping")
+        return {"status": "skipped"}
+
+    db = SessionLocal()
+    try:
+        moved = archive_orders(db)
+        return {"status": "ok", "moved": moved}
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"[TASK:ARCHIVE] Archival run failed: {exc}")
+        raise
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except LockError:
+            pass
+
+
+@celery_app.task(name="workers.tasks.process_webhook_events_task")
+def process_webhook_events_task(purge: bool = False):
+    # Queued by the webhook endpoint for each new event and run periodically
+    # (with purge=True) to pick up anything a queued run missed
+    from database.db import SessionLocal
+    from handlers.webhooks import process_webhook_events, purge_webhook_events
+
+    db = SessionLocal()
+    try:
+        result = process_webhook_events(db)
+        if purge:
+            result["purged"] = purge_webhook_events(db)
+        return {"status": "ok", **result}
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"[TASK:WEBHOOK] Inbox run failed: {exc}")
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="workers.tasks.reconcile_payments_task")
+def reconcile_payments_task():
+    from redis.exceptions import LockError
+
+    from config import settings
+    from database.db import SessionLocal
+    from handlers.reconciliation import reconcile_payments
+    from handlers.user import redis_client
+
+    lock = redis_client.lock("reconcile:payments:lock", timeout=settings.RECONCILE_INTERVAL_SECONDS)
+    if not lock.acquire(blocking=False):
+        logger.info("[TASK:RECONCILE] Previous reconciliation run still in progress, skipping")
+        return {"status": "skipped"}
+
+    db = SessionLocal()
+    try:
+        return {"status": "ok", **reconcile_payments(db)}
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"[TASK:RECONCILE] Reconciliation run failed: {exc}")
+        raise
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except LockError:
+            pass